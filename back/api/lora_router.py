@@ -1,100 +1,204 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from peft import PeftModel
-import os
-from typing import Optional
+from typing import List, Optional
 import asyncio
+import threading
+import time
 from db.connect import supabase
+from lora_core.config import DiaryGenerationConfig
+from lora_core.engine import create_generator, GenerationError
+from lora_core.cache import GenerationCache
+from lora_core.jobs import GenerationJobQueue, GenerationJob, QueueFullError
+from lora_core.lifecycle import ModelLifecycle
+from lora_core.fast_path import RetrievalDraftGenerator, LoadMonitor
 
 router = APIRouter()
 
-model = None
-tokenizer = None
-is_model_loaded = False
+gen_config = DiaryGenerationConfig()
+generator = create_generator(gen_config)  # LORA_MODEL_BACKEND에 따라 프로세스 내 모델 또는 모델 워커 클라이언트
+# 모델 로드는 시작 시 백그라운드에서 한 번만 (실패하면 백오프 재시도). 요청 처리 중에는 로드하지 않음
+model_lifecycle = ModelLifecycle(
+    "lora",
+    generator,
+    backoff_base_sec=gen_config.MODEL_LOAD_BACKOFF_BASE_SEC,
+    backoff_max_sec=gen_config.MODEL_LOAD_BACKOFF_MAX_SEC
+)
+generation_cache = GenerationCache(max_size=gen_config.CACHE_MAX_SIZE, ttl_sec=gen_config.CACHE_TTL_SEC)
+job_queue = GenerationJobQueue(
+    num_workers=gen_config.JOB_WORKERS,
+    max_queue_size=gen_config.JOB_QUEUE_MAX_SIZE,
+    result_ttl_sec=gen_config.JOB_RESULT_TTL_SEC
+)
+
+def fetch_user_snippets(user_id: str) -> List[str]:
+    """빠른 초안 색인용: 사용자의 최근 카드 텍스트(text_final, content)를 가져옵니다."""
+    result = supabase.table('cards') \
+        .select('content, text_final, diaries!inner(user_id)') \
+        .eq('diaries.user_id', user_id) \
+        .order('created_at', desc=True) \
+        .limit(gen_config.FAST_PATH_INDEX_SIZE) \
+        .execute()
+    return [text for row in result.data for text in (row.get('text_final'), row.get('content')) if text]
+
+draft_generator = RetrievalDraftGenerator(
+    fetch_user_snippets,
+    max_users=gen_config.FAST_PATH_MAX_USERS,
+    ttl_sec=gen_config.FAST_PATH_INDEX_TTL_SEC,
+    max_sentences=gen_config.FAST_PATH_MAX_SENTENCES,
+    min_score=gen_config.FAST_PATH_MIN_SCORE,
+    fallback_suffix=gen_config.FALLBACK_SUFFIX
+)
+# 이 프로세스에서 보낸 생성 호출만 추적 (모델 워커를 여러 API 워커가 공유하면 근사치)
+load_monitor = LoadMonitor(budget_sec=gen_config.FAST_PATH_LATENCY_BUDGET_SEC)
+# 초안 응답의 model_version (캐시/저장 대상이 아님)
+FAST_PATH_VERSIONS = {"model_not_loaded": "fallback_model_not_loaded", "over_budget": "fast_path_draft"}
 
 class DiaryGenerationRequest(BaseModel):
     original_text: str
     user_id: str
     diary_id: str
+    persist_result: bool = False  # True이면 생성 결과를 diaries 행에 저장하고, 저장된 결과가 있으면 재사용
+
+class GenerationJobRequest(DiaryGenerationRequest):
+    priority: int = 0  # 클수록 먼저 처리
 
 class DiaryGenerationResponse(BaseModel):
     generated_text: str
     original_length: int
     generated_length: int
     model_version: str
+    cache_status: Optional[str] = None  # "hit", "coalesced", "miss", "persisted"
 
-async def load_lora_model():
-    global model, tokenizer, is_model_loaded
-    if is_model_loaded and model is not None and tokenizer is not None:
-        print("🤖 LoRA 모델이 이미 로드되어 있습니다.")
-        return
-
-    try:
-        print("🤖 LoRA 모델 로딩 시작...")
-        base_model_name = "EleutherAI/polyglot-ko-1.3b"
-        lora_model_path = os.path.join(os.path.dirname(__file__), "..", "..", "lora", "models")
-
-        tokenizer = AutoTokenizer.from_pretrained(base_model_name)
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
-        tokenizer.padding_side = "left"
-
-        compute_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-        base_model = AutoModelForCausalLM.from_pretrained(
-            base_model_name,
-            torch_dtype=compute_dtype,
-            device_map="auto" if torch.cuda.is_available() else None
-        )
-        print("✅ 베이스 모델 로드 완료.")
+class CardText(BaseModel):
+    card_id: str
+    original_text: str
 
-        try:
-            model = PeftModel.from_pretrained(base_model, lora_model_path)
-            print("✅ LoRA 모델 로드 성공!")
-        except Exception as e:
-            print(f"❌ LoRA 가중치 로딩 실패: {e}")
-            model = base_model
-            is_model_loaded = False
-            return
+class DiaryBatchGenerationRequest(BaseModel):
+    user_id: str
+    diary_id: str
+    cards: List[CardText]
 
-        model.eval()
-        is_model_loaded = True
-        print("✅ LoRA 모델 준비 완료!")
+class CardGenerationResult(DiaryGenerationResponse):
+    card_id: str
 
-    except Exception as e:
-        print(f"❌ 모델 전체 로딩 실패: {e}")
-        model = None
-        tokenizer = None
-        is_model_loaded = False
+class DiaryBatchGenerationResponse(BaseModel):
+    results: List[CardGenerationResult]
+    model_version: str
+    generated_count: int  # 캐시에 없어서 이번에 모델로 생성한 카드 수
 
 @router.post("/lora/generate", response_model=DiaryGenerationResponse)
 async def generate_diary_with_lora(request: DiaryGenerationRequest):
+    # 같은 일기/원문/어댑터/샘플링 설정이면 같은 키 → 재시도나 재렌더링 시 모델을 다시 돌리지 않음
+    model_version = generator.adapter_version(request.user_id)
+    cache_key = GenerationCache.make_key(
+        request.diary_id, request.original_text, model_version, gen_config.SAMPLING_PARAMS
+    )
+
+    if request.persist_result:
+        persisted = load_persisted_generation(request.diary_id, cache_key, len(request.original_text), model_version)
+        if persisted is not None:
+            print(f"💾 저장된 생성 결과 사용: diary={request.diary_id}")
+            return persisted.model_copy(update={"cache_status": "persisted"})
+
+    response, cache_status = await generation_cache.get_or_create(
+        cache_key,
+        lambda: _generate_response(request, model_version),
+        should_cache=lambda r: r.model_version == model_version
+    )
+
+    if request.persist_result and cache_status == "miss" and response.model_version == model_version:
+        persist_generation(request.diary_id, cache_key, response.generated_text)
+
+    return response.model_copy(update={"cache_status": cache_status})
+
+@router.post("/lora/generate/batch", response_model=DiaryBatchGenerationResponse)
+async def generate_diary_cards_with_lora(request: DiaryBatchGenerationRequest):
+    """
+    한 일기의 여러 카드 텍스트를 한 번에 생성합니다.
+    캐시에 없는 카드만 모아 왼쪽 패딩된 배치 하나로 생성하므로, 카드마다 /lora/generate를 호출하는 것보다
+    모델 호출 오버헤드가 적습니다. 결과는 요청한 카드 순서대로 반환합니다.
+    """
+    model_version = generator.adapter_version(request.user_id)
+    cache_keys = [
+        GenerationCache.make_key(
+            f"{request.diary_id}:{card.card_id}", card.original_text, model_version, gen_config.SAMPLING_PARAMS
+        )
+        for card in request.cards
+    ]
+    results: List[Optional[CardGenerationResult]] = [None] * len(request.cards)
+    pending = []
+    for i, (card, cache_key) in enumerate(zip(request.cards, cache_keys)):
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            results[i] = CardGenerationResult(card_id=card.card_id, **cached.model_dump(exclude={"cache_status"}),
+                                              cache_status="hit")
+        else:
+            pending.append(i)
+
+    if pending:
+        print(f"🤖 배치 텍스트 생성 요청: user={request.user_id}, diary={request.diary_id}, "
+              f"cards={len(pending)}/{len(request.cards)}")
+        texts = [request.cards[i].original_text for i in pending]
+        reason = fast_path_reason()
+        if reason is None:
+            try:
+                generated_texts = await asyncio.to_thread(generate_personalized_texts_sync, texts, request.user_id)
+                card_version = model_version
+            except Exception as e:
+                # /lora/generate와 같은 대체 응답 (model_version이 달라 캐시되지 않음)
+                print(f"❌ 배치 텍스트 생성 오류: {e}")
+                generated_texts = [text + "\n" + gen_config.FALLBACK_SUFFIX for text in texts]
+                card_version = "fallback_exception"
+        else:
+            print(f"⚡ 빠른 초안으로 응답: {reason}")
+            generated_texts = await asyncio.to_thread(
+                lambda: [draft_text(text, request.user_id, reason) for text in texts]
+            )
+            card_version = FAST_PATH_VERSIONS[reason]
+
+        for i, generated_text in zip(pending, generated_texts):
+            card = request.cards[i]
+            response = DiaryGenerationResponse(
+                generated_text=generated_text,
+                original_length=len(card.original_text),
+                generated_length=len(generated_text),
+                model_version=card_version
+            )
+            if card_version == model_version:
+                generation_cache.set(cache_keys[i], response)
+            results[i] = CardGenerationResult(card_id=card.card_id, **response.model_dump(exclude={"cache_status"}),
+                                              cache_status="miss")
+
+    return DiaryBatchGenerationResponse(results=results, model_version=model_version, generated_count=len(pending))
+
+async def _generate_response(request: DiaryGenerationRequest, model_version: str) -> DiaryGenerationResponse:
     try:
         print(f"🤖 텍스트 생성 요청: user={request.user_id}, length={len(request.original_text)}")
-        if not is_model_loaded or model is None or tokenizer is None:
-            await load_lora_model()
-            if not is_model_loaded:
-                fallback_text = request.original_text + "\n오늘 하루도 행복한 하루였다."
-                return DiaryGenerationResponse(
-                    generated_text=fallback_text,
-                    original_length=len(request.original_text),
-                    generated_length=len(fallback_text),
-                    model_version="fallback_model_not_loaded"
-                )
-
-        generated_text = await generate_personalized_text(request.original_text)
+        reason = fast_path_reason()
+        if reason is not None:
+            # 모델 로드 중이거나 대기가 길면 요청을 붙잡지 않고 바로 초안 반환 (캐시하지 않음)
+            print(f"⚡ 빠른 초안으로 응답: {reason} (lifecycle={model_lifecycle.state})")
+            draft = await asyncio.to_thread(draft_text, request.original_text, request.user_id, reason)
+            return DiaryGenerationResponse(
+                generated_text=draft,
+                original_length=len(request.original_text),
+                generated_length=len(draft),
+                model_version=FAST_PATH_VERSIONS[reason]
+            )
+
+        generated_text = await generate_personalized_text(request.original_text, request.user_id)
         print(f"✅ 생성 완료: {generated_text}")
         return DiaryGenerationResponse(
             generated_text=generated_text,
             original_length=len(request.original_text),
             generated_length=len(generated_text),
-            model_version="lora-v1.0"
+            model_version=model_version
         )
 
     except Exception as e:
         print(f"❌ 텍스트 생성 오류: {e}")
-        fallback_text = request.original_text + "\n오늘 하루도 행복한 하루였다."
+        fallback_text = request.original_text + "\n" + gen_config.FALLBACK_SUFFIX
         return DiaryGenerationResponse(
             generated_text=fallback_text,
             original_length=len(request.original_text),
@@ -102,91 +206,207 @@ async def generate_diary_with_lora(request: DiaryGenerationRequest):
             model_version="fallback_exception"
         )
 
-async def generate_personalized_text(original_text: str) -> str:
+def load_persisted_generation(diary_id: str,
+                              cache_key: str,
+                              original_length: int,
+                              model_version: str) -> Optional[DiaryGenerationResponse]:
+    """diaries 행에 같은 키로 저장된 생성 결과가 있으면 응답으로 변환해 반환합니다."""
     try:
-        if model is None or tokenizer is None:
-            return original_text + "\n행복한 하루였다."
+        result = supabase.table('diaries').select('generated_text, generated_cache_key').eq('id', diary_id).limit(1).execute()
+        if not result.data:
+            return None
+        row = result.data[0]
+        if row.get('generated_cache_key') != cache_key or not row.get('generated_text'):
+            return None
+        return DiaryGenerationResponse(
+            generated_text=row['generated_text'],
+            original_length=original_length,
+            generated_length=len(row['generated_text']),
+            model_version=model_version
+        )
+    except Exception as e:
+        print(f"⚠️ 저장된 생성 결과 조회 실패: {e}")
+        return None
+
+def persist_generation(diary_id: str, cache_key: str, generated_text: str):
+    """생성 결과를 diaries 행에 저장하여 이후 조회 시 모델을 거치지 않도록 합니다."""
+    try:
+        supabase.table('diaries').update({
+            'generated_text': generated_text,
+            'generated_cache_key': cache_key
+        }).eq('id', diary_id).execute()
+        print(f"💾 생성 결과 저장 완료: diary={diary_id}")
+    except Exception as e:
+        print(f"⚠️ 생성 결과 저장 실패: {e}")
+
+async def generate_personalized_text(original_text: str, user_id: Optional[str] = None) -> str:
+    # 모델 추론은 CPU를 오래 점유하므로 이벤트 루프 밖(스레드)에서 실행
+    return await asyncio.to_thread(generate_personalized_text_sync, original_text, None, user_id)
 
-        prompt = f"""다음은 일기를 감성적인 문체로 개선하는 예시야:
+def generate_personalized_text_sync(original_text: str,
+                                    cancel_event: Optional[threading.Event] = None,
+                                    user_id: Optional[str] = None) -> str:
+    with load_monitor.track():
+        return generator.generate(original_text, cancel_event=cancel_event, user_id=user_id)
 
-입력: 오늘 기분이 좋았다.
-출력: 햇살이 비추는 아침, 마음까지 따뜻해지는 하루의 시작이었다.
+def generate_personalized_texts_sync(original_texts: List[str], user_id: Optional[str] = None) -> List[str]:
+    with load_monitor.track():
+        return generator.generate_batch(original_texts, None, user_id)
 
-입력: {original_text}
-출력:"""
+def fast_path_reason(queued: int = 0) -> Optional[str]:
+    """모델 대신 빠른 초안으로 응답해야 하면 그 이유, 아니면 None. queued: 이 요청보다 먼저 처리될 대기 작업 수"""
+    if not model_lifecycle.is_ready:
+        return "model_not_loaded"
+    if gen_config.FAST_PATH_ENABLED and load_monitor.over_budget(queued):
+        return "over_budget"
+    return None
 
-        inputs = tokenizer(
-            prompt,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
-            padding=True
+def draft_text(original_text: str, user_id: Optional[str], reason: str) -> str:
+    """빠른 초안 (첫 호출 시 사용자 색인을 만들기 위해 DB를 조회하므로 이벤트 루프 밖에서 호출)"""
+    if not gen_config.FAST_PATH_ENABLED:
+        return original_text + "\n" + gen_config.FALLBACK_SUFFIX
+    return draft_generator.compose(original_text, user_id, reason)
+
+def _run_generation_job(job: GenerationJob) -> dict:
+    """워커 스레드에서 실행되는 작업 핸들러. 결과는 DiaryGenerationResponse 형태의 dict."""
+    request: GenerationJobRequest = job.payload
+    # 사용자 어댑터가 새로 게시되면 버전이 바뀌므로 이전 결과는 자연스럽게 캐시에서 빠짐
+    model_version = generator.adapter_version(request.user_id)
+    cache_key = GenerationCache.make_key(
+        request.diary_id, request.original_text, model_version, gen_config.SAMPLING_PARAMS
+    )
+
+    # 비동기 작업은 응답을 기다리는 사람이 없으므로 모델이 준비될 때까지 잠시 기다림
+    if not model_lifecycle.wait_ready(gen_config.JOB_MODEL_WAIT_SEC):
+        draft = draft_text(request.original_text, request.user_id, "model_not_loaded")
+        response = DiaryGenerationResponse(
+            generated_text=draft,
+            original_length=len(request.original_text),
+            generated_length=len(draft),
+            model_version=FAST_PATH_VERSIONS["model_not_loaded"]
         )
-        inputs = {k: v.to(model.device) for k, v in inputs.items()}
-
-        with torch.no_grad():
-            generated_ids = model.generate(
-                inputs["input_ids"],
-                attention_mask=inputs["attention_mask"],
-                do_sample=True,
-                top_k=50,
-                top_p=0.95,
-                temperature=0.8,
-                max_new_tokens=200,
-                pad_token_id=tokenizer.pad_token_id,
-                eos_token_id=tokenizer.eos_token_id,
-                no_repeat_ngram_size=3,
-                repetition_penalty=1.15,
-                length_penalty=1.2,
-                early_stopping=True
-            )
+        return response.model_dump()
 
-        generated_text = tokenizer.decode(generated_ids[0], skip_special_tokens=True)
+    try:
+        generated_text = generate_personalized_text_sync(
+            request.original_text, cancel_event=job.cancel_event, user_id=request.user_id
+        )
+    except GenerationError as e:
+        # 실패 결과는 캐시/저장하지 않음 (다음 요청에서 다시 생성)
+        print(f"❌ 작업 {job.id} 생성 실패: {e}")
+        fallback_text = request.original_text + "\n" + gen_config.FALLBACK_SUFFIX
+        response = DiaryGenerationResponse(
+            generated_text=fallback_text,
+            original_length=len(request.original_text),
+            generated_length=len(fallback_text),
+            model_version="fallback_exception"
+        )
+        return response.model_dump()
+    response = DiaryGenerationResponse(
+        generated_text=generated_text,
+        original_length=len(request.original_text),
+        generated_length=len(generated_text),
+        model_version=model_version
+    )
+    if not job.cancel_event.is_set():
+        generation_cache.set(cache_key, response)
+        if request.persist_result:
+            persist_generation(request.diary_id, cache_key, generated_text)
+    return response.model_dump()
 
-        # 출력 파싱
-        idx = generated_text.rfind("출력:")
-        if idx != -1:
-            generated_text = generated_text[idx + len("출력:"):].strip()
-        else:
-            if original_text in generated_text:
-                generated_text = generated_text.split(original_text)[-1].strip()
+def _job_status(job: GenerationJob) -> dict:
+    status = job.to_dict()
+    status["queue_position"] = job_queue.queue_position(job.id)
+    return status
 
-        # 긍정 문장 하드코딩
-        generated_text = post_process_text(generated_text, original_text)
-        return generated_text + "\n행복한 하루였다."
+@router.post("/lora/jobs", status_code=202)
+async def submit_generation_job(request: GenerationJobRequest):
+    """생성 작업을 대기열에 넣고 job id를 즉시 반환합니다. 대기열이 가득 차면 429."""
+    # 사용자 어댑터가 새로 게시되면 버전이 바뀌므로 이전 결과는 자연스럽게 캐시에서 빠짐
+    model_version = generator.adapter_version(request.user_id)
+    cache_key = GenerationCache.make_key(
+        request.diary_id, request.original_text, model_version, gen_config.SAMPLING_PARAMS
+    )
+    cached = generation_cache.get(cache_key)
+    if cached is not None:
+        job = job_queue.complete(request, cached.model_copy(update={"cache_status": "hit"}).model_dump(), request.priority)
+        return _job_status(job)
 
-    except Exception as e:
-        print(f"❌ 추론 실패: {e}")
-        return original_text + "\n행복한 하루였다."
+    # 대기열 전체를 기다리면 지연 예산을 넘는 경우 대기열에 넣지 않고 초안으로 완료
+    # (모델 로드 중일 때는 작업 워커가 준비될 때까지 기다리므로 대기열에 넣음)
+    if model_lifecycle.is_ready and fast_path_reason(queued=job_queue.stats()["queued"]) == "over_budget":
+        draft = await asyncio.to_thread(draft_text, request.original_text, request.user_id, "over_budget")
+        response = DiaryGenerationResponse(
+            generated_text=draft,
+            original_length=len(request.original_text),
+            generated_length=len(draft),
+            model_version=FAST_PATH_VERSIONS["over_budget"]
+        )
+        job = job_queue.complete(request, response.model_dump(), request.priority)
+        print(f"⚡ 생성 작업을 빠른 초안으로 완료: job={job.id}, diary={request.diary_id}")
+        return _job_status(job)
 
-def post_process_text(generated_text: str, original_text: str) -> str:
     try:
-        text = generated_text.strip()
+        job = job_queue.submit(request, priority=request.priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
 
-        lines = text.split('\n')
-        cleaned_lines = []
-        seen = set()
-        for line in lines:
-            line = line.strip()
-            if line and line not in seen:
-                cleaned_lines.append(line)
-                seen.add(line)
-        text = '\n'.join(cleaned_lines)
+    print(f"📥 생성 작업 등록: job={job.id}, diary={request.diary_id}, priority={request.priority}")
+    return _job_status(job)
 
+@router.get("/lora/jobs/{job_id}")
+async def get_generation_job(job_id: str, wait: float = 0.0):
+    """
+    작업 상태/결과를 조회합니다.
+    wait(초)를 주면 작업이 끝나거나 시간이 다 될 때까지 기다린 뒤 응답합니다 (long-poll).
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
 
-        if len(text) < 10:  # 최소 10자 이상이면 사용
-            print(f"⚠️ 생성된 텍스트가 너무 짧습니다: {len(text)}자. 원본 반환.")
-            return original_text
+    deadline = time.monotonic() + min(max(wait, 0.0), gen_config.JOB_MAX_WAIT_SEC)
+    while not job.is_finished and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+    return _job_status(job)
 
-        return text
-    except Exception as e:
-        print(f"❌ 후처리 실패: {e}")
-        return generated_text
+@router.delete("/lora/jobs/{job_id}")
+async def cancel_generation_job(job_id: str):
+    """대기 중인 작업은 취소하고, 실행 중인 작업은 다음 토큰에서 생성을 멈춥니다."""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return _job_status(job)
+
+@router.get("/lora/stats")
+async def get_generation_stats():
+    """생성 토큰 수, tokens/sec, speculative decoding 수락률, 빠른 초안 사용 통계를 반환합니다."""
+    return {
+        "model_backend": gen_config.MODEL_BACKEND,
+        "lifecycle": model_lifecycle.status(),
+        **generator.stats_summary(),
+        "cache": generation_cache.stats(),
+        "jobs": job_queue.stats(),
+        "fast_path": {**draft_generator.stats(), **load_monitor.stats()}
+    }
+
+@router.get("/lora/ready")
+async def get_readiness():
+    """
+    모델 준비 상태. 워밍업까지 끝났으면 200, 아니면 503 (로드 밸런서/배포 readiness probe용).
+    모델별 로드 여부와 단계별 로드 시간, 수명 주기 상태(재시도 횟수, 다음 재시도까지 남은 시간)를 포함합니다.
+    """
+    ready = model_lifecycle.is_ready
+    body = {
+        "ready": ready,
+        "model_backend": gen_config.MODEL_BACKEND,
+        "lifecycle": model_lifecycle.status(),
+        "models": generator.model_status()
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
 
 @router.on_event("startup")
 async def startup_event():
-    print("🚀 서버 시작: 모델 로드 시도")
-    try:
-        await load_lora_model()
-    except Exception as e:
-        print(f"⚠️ 서버 시작 시 모델 로딩 실패: {e}")
+    # 모델 로드를 기다리지 않고 바로 요청을 받음 (준비 여부는 /lora/ready로 확인)
+    print("🚀 서버 시작: 백그라운드 모델 로드 시작")
+    model_lifecycle.start()
+    job_queue.start(_run_generation_job)
@@ -2,6 +2,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+import asyncio
 import sys
 import os
 import torch
@@ -17,9 +18,12 @@ sys.path.insert(0, project_root)
 sys.path.insert(0, parent_dir)
 
 # RL Core 모듈 임포트
-from rl_core.rl_env import RLEnvironment, RLConfig
+from rl_core.rl_env import RLEnvironment, RLConfig, VectorizedRLEnvironment
 from rl_core.rl_model import PPOModel, PPOConfig
+from rl_core.replay_buffer import ReplayBuffer, PendingEpisodes
+from rl_core.preprocess import CardFeatureEncoder, get_card_encoder
 from db.connect import supabase
+from db.log_writer import BufferedLogWriter
 
 # UUID 생성 함수
 def generate_uuid():
@@ -41,18 +45,74 @@ class LayoutResponse(BaseModel):
     layout: Dict[str, Dict[str, int]]  # card_id -> {row, col, order_index}
     message: str
 
+class DiaryCardsRequest(BaseModel):
+    diary_id: str
+    user_id: str
+    selected_card_ids: List[str]
+
+class BatchLayoutRequest(BaseModel):
+    diaries: List[DiaryCardsRequest]
+    mode: Optional[str] = None  # "sample", "greedy", "beam" (기본: PPOConfig.INFERENCE_MODE)
+
+class DiaryLayoutResult(BaseModel):
+    diary_id: str
+    success: bool
+    layout: Dict[str, Dict[str, int]]
+    message: str
+
+class BatchLayoutResponse(BaseModel):
+    results: List[DiaryLayoutResult]
+    processed: int
+
 class FeedbackRequest(BaseModel):
     diary_id: str
     feedback_type: str  # 'save', 'modify', 'regenerate'
     details: Optional[Dict[str, Any]] = None
 
-# 전역 변수로 RL 환경과 모델 초기화
+# 전역 변수로 RL 설정과 모델 초기화
+# (레이아웃 추론은 요청마다 환경 배열을 새로 만들어 공유 상태 없이 수행, rl_env는 보상 계산용)
 rl_config = RLConfig()
 ppo_config = PPOConfig()
 rl_env = RLEnvironment(rl_config)
 
+# 사용자 프로필 데이터 (임시 데이터 사용)
+DEFAULT_USER_PROFILE = {
+    'average_satisfaction': 0.7,  # 기본값
+    'total_diaries': 5  # 기본값
+}
+CARD_FETCH_CHUNK_SIZE = 200  # in_ 조회 한 번에 넣을 카드 ID 수 (URL 길이 제한)
+
+# layout_logs / reward_logs는 요청 안에서 저장하지 않고 버퍼에 모아 백그라운드에서 일괄 저장
+log_writer = BufferedLogWriter(
+    supabase,
+    flush_interval_sec=float(os.getenv("RL_LOG_FLUSH_INTERVAL_SEC", "2.0")),
+    max_batch_size=int(os.getenv("RL_LOG_BATCH_SIZE", "500"))
+)
+
+# 추천한 레이아웃의 스텝 데이터는 피드백이 올 때까지 보관했다가 최종 보상과 함께 리플레이 버퍼에 기록
+replay_buffer: Optional[ReplayBuffer] = None
+if ppo_config.REPLAY_ENABLED:
+    try:
+        replay_buffer = ReplayBuffer(
+            ppo_config.REPLAY_DIR,
+            rl_config.STATE_DIM,
+            rl_config.ACTION_SPACE_SIZE,
+            segment_size=ppo_config.REPLAY_SEGMENT_SIZE,
+            max_segments=ppo_config.REPLAY_MAX_SEGMENTS
+        )
+        print(f"✅ 리플레이 버퍼 로드 완료: {replay_buffer.stats()}")
+    except OSError as e:
+        print(f"⚠️ 리플레이 버퍼를 열 수 없어 경험을 기록하지 않습니다: {e}")
+# 추천과 피드백을 서로 다른 워커가 처리할 수 있으므로 피드백 대기 데이터도 디스크(REPLAY_DIR/pending)에 보관
+pending_episodes = PendingEpisodes(
+    ppo_config.REPLAY_PENDING_SIZE,
+    ppo_config.REPLAY_PENDING_TTL_SEC,
+    root=os.path.join(ppo_config.REPLAY_DIR, "pending") if replay_buffer is not None else None
+)
+
 # 모델 로드 (체크포인트가 있으면 로드, 없으면 새로 생성)
-model_path = os.path.join(project_root, "back/rl_core/checkpoints/best_model.pth")
+# 카드 특징 구성(RL_CARD_FEATURES)마다 입력 차원이 달라 체크포인트를 따로 사용 (basic: best_model.pth)
+model_path = os.path.join(project_root, "back/rl_core/checkpoints", CardFeatureEncoder.checkpoint_name("best_model"))
 ppo_model = PPOModel(rl_config.STATE_DIM, rl_config.ACTION_SPACE_SIZE, ppo_config)
 
 # 체크포인트 디렉토리 생성
@@ -68,6 +128,48 @@ if os.path.exists(model_path):
 else:
     print("🆕 새로운 RL 모델 초기화")
 
+def fetch_cards_by_ids(card_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """카드 상세 데이터를 ID 묶음 단위로 조회합니다. Dict[card_id, card_data] 형태로 반환."""
+    unique_ids = list(dict.fromkeys(card_ids))
+    cards: Dict[str, Dict[str, Any]] = {}
+    for start in range(0, len(unique_ids), CARD_FETCH_CHUNK_SIZE):
+        response = supabase.table('cards').select('*').in_('id', unique_ids[start:start + CARD_FETCH_CHUNK_SIZE]).execute()
+        cards.update({card['id']: card for card in response.data})
+    return cards
+
+def infer_layouts(diaries_card_ids: List[List[str]],
+                  all_cards_data: Dict[str, Dict[str, Any]],
+                  user_profiles: List[Dict[str, Any]],
+                  mode: Optional[str] = None,
+                  diary_ids: Optional[List[str]] = None) -> List[Dict[str, Dict[str, int]]]:
+    """
+    여러 일기의 레이아웃을 한 번에 추론합니다. 공유 환경(rl_env)을 건드리지 않으므로 동시에 호출해도 안전합니다.
+    - 초기 상태 벡터는 VectorizedRLEnvironment로 모든 일기를 한 번에 구성
+    - 정책은 모든 일기에 대해 카드 수만큼의 배치 순전파로 실행 (PPOModel.predict_layouts)
+    조회되지 않은 카드 ID는 제외하고, 나머지 카드 순서대로 배치합니다.
+    diary_ids가 주어지고 리플레이 버퍼가 켜져 있으면, 스텝 데이터를 피드백 대기 목록에 보관합니다.
+    """
+    if not diaries_card_ids:
+        return []
+    diaries_cards = [[all_cards_data[cid] for cid in card_ids if cid in all_cards_data] for card_ids in diaries_card_ids]
+    env = VectorizedRLEnvironment(rl_config, len(diaries_cards))
+    initial_states = env.reset_from_data(list(zip(diaries_cards, user_profiles)))
+    diaries_cells = ppo_model.predict_layouts(initial_states, env.num_cards, mode)
+
+    if diary_ids is not None and replay_buffer is not None:
+        trajectories = ppo_model.layout_trajectories(initial_states, diaries_cells)
+        for diary_id, trajectory in zip(diary_ids, trajectories):
+            if trajectory:
+                pending_episodes.put(diary_id, trajectory)
+
+    return [
+        {
+            card['id']: {'row': cell // rl_config.MAX_COLS, 'col': cell % rl_config.MAX_COLS, 'order_index': i}
+            for i, (card, cell) in enumerate(zip(cards, cells))
+        }
+        for cards, cells in zip(diaries_cards, diaries_cells)
+    ]
+
 @router.post("/suggest-layout", response_model=LayoutResponse)
 async def suggest_layout(request: LayoutRequest):
     """
@@ -88,55 +190,31 @@ async def suggest_layout(request: LayoutRequest):
         # 카드 데이터를 딕셔너리로 변환
         all_cards_data = {card['id']: card for card in card_data_response.data}
         
-        # 2. 사용자 프로필 데이터 조회 (임시 데이터 사용)
-        user_profile_data = {
-            'average_satisfaction': 0.7,  # 기본값
-            'total_diaries': 5  # 기본값
-        }
-        
-        # 3. RL 환경 초기화
-        print("🎮 RL 환경 초기화 중...")
-        initial_state = rl_env.reset(
-            user_id=request.user_id,
-            selected_card_ids=request.selected_card_ids,
-            all_cards_data_raw=all_cards_data,
-            user_profile_data_raw=user_profile_data
-        )
-        print(f"✅ RL 환경 초기화 완료: state_dim={len(initial_state)}")
-        
-        # 4. 레이아웃 생성
+        # 2~3. 사용자 프로필(임시 데이터)로 초기 상태를 만들고 레이아웃 생성
         print("🤖 AI 레이아웃 생성 중...")
-        layout_result = ppo_model.predict_action(
-            state_vector=initial_state,
-            selected_card_ids=request.selected_card_ids,
-            max_rows=rl_config.MAX_ROWS,
-            max_cols=rl_config.MAX_COLS,
-            grid_state_initial=np.zeros((rl_config.MAX_ROWS, rl_config.MAX_COLS))
-        )
+        layout_result = infer_layouts([request.selected_card_ids], all_cards_data, [DEFAULT_USER_PROFILE],
+                                      diary_ids=[request.diary_id])[0]
         print(f"✅ 레이아웃 생성 완료: {len(layout_result)}개 카드 배치")
         
-        # 4. 레이아웃 로그 저장 (AI 생성 정보)
-        try:
-            # AI가 생성한 레이아웃을 개별 카드별로 저장
-            for card_id, layout_info in layout_result.items():
-                layout_log_data = {
-                    'id': generate_uuid(),  # ID 필드 추가
-                    'diary_id': request.diary_id,
-                    'card_id': card_id,
-                    'prev_row': 0,  # AI 생성이므로 이전 위치는 0
-                    'prev_col': 0,
-                    'new_row': layout_info.get('row', 0),
-                    'new_col': layout_info.get('col', 0),
-                    'step': 1,
-                    'created_at': datetime.now().isoformat(),
-                    'moved_by_user': False  # AI가 생성한 것이므로 False
-                }
-                
-                supabase.table('layout_logs').insert([layout_log_data]).execute()
-            
-            print("✅ AI 레이아웃 로그 저장 완료")
-        except Exception as e:
-            print(f"⚠️ AI 레이아웃 로그 저장 실패: {e}")
+        # 4. 레이아웃 로그 저장 (AI 생성 정보): 카드별 행을 모아 버퍼에 추가 (저장은 백그라운드에서 일괄)
+        created_at = datetime.now().isoformat()
+        layout_log_rows = [
+            {
+                'id': generate_uuid(),  # ID 필드 추가
+                'diary_id': request.diary_id,
+                'card_id': card_id,
+                'prev_row': 0,  # AI 생성이므로 이전 위치는 0
+                'prev_col': 0,
+                'new_row': layout_info.get('row', 0),
+                'new_col': layout_info.get('col', 0),
+                'step': 1,
+                'created_at': created_at,
+                'moved_by_user': False  # AI가 생성한 것이므로 False
+            }
+            for card_id, layout_info in layout_result.items()
+        ]
+        log_writer.enqueue('layout_logs', layout_log_rows)
+        print(f"✅ AI 레이아웃 로그 {len(layout_log_rows)}개 저장 예약")
         
         return LayoutResponse(
             success=True,
@@ -150,6 +228,49 @@ async def suggest_layout(request: LayoutRequest):
         print(f"📋 상세 에러: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"레이아웃 제안 실패: {str(e)}")
 
+@router.post("/suggest-layouts", response_model=BatchLayoutResponse)
+async def suggest_layouts(request: BatchLayoutRequest):
+    """
+    여러 일기의 레이아웃을 한 번에 제안합니다 (예: 기존 일기 전체 재배치 마이그레이션).
+    카드는 묶음 조회로 한꺼번에 가져오고, 모든 일기를 하나의 배치 추론 루프로 처리합니다.
+    레이아웃 로그는 저장하지 않습니다.
+    """
+    try:
+        print(f"🔍 배치 레이아웃 제안 시작: {len(request.diaries)}개 일기")
+        all_card_ids = [card_id for diary in request.diaries for card_id in diary.selected_card_ids]
+        all_cards_data = await asyncio.to_thread(fetch_cards_by_ids, all_card_ids)
+        print(f"✅ 카드 데이터 조회 완료: {len(all_cards_data)}개")
+
+        layouts = await asyncio.to_thread(
+            infer_layouts,
+            [diary.selected_card_ids for diary in request.diaries],
+            all_cards_data,
+            [DEFAULT_USER_PROFILE] * len(request.diaries),
+            request.mode
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        import traceback
+        print(f"❌ 배치 레이아웃 제안 중 오류: {e}")
+        print(f"📋 상세 에러: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"배치 레이아웃 제안 실패: {str(e)}")
+
+    results = []
+    for diary, layout in zip(request.diaries, layouts):
+        missing = len(set(diary.selected_card_ids) - set(all_cards_data))
+        if not layout:
+            results.append(DiaryLayoutResult(diary_id=diary.diary_id, success=False, layout={},
+                                             message="선택된 카드를 찾을 수 없습니다."))
+            continue
+        message = "레이아웃 제안이 완료되었습니다."
+        if missing:
+            message += f" (찾을 수 없는 카드 {missing}개 제외)"
+        results.append(DiaryLayoutResult(diary_id=diary.diary_id, success=True, layout=layout, message=message))
+
+    print(f"✅ 배치 레이아웃 제안 완료: {sum(r.success for r in results)}/{len(results)}개 일기")
+    return BatchLayoutResponse(results=results, processed=len(results))
+
 @router.post("/learn-from-feedback")
 async def learn_from_feedback(request: FeedbackRequest):
     """
@@ -170,28 +291,27 @@ async def learn_from_feedback(request: FeedbackRequest):
                 
                 print(f"📊 사용자 레이아웃 수정 로그 저장 시작: {len(user_layout)}개 카드")
                 
-                # 각 카드의 위치 변경을 개별적으로 로그
-                for card_id, new_pos in user_layout.items():
-                    if card_id in original_layout:
-                        old_pos = original_layout[card_id]
-                        
-                        layout_log_data = {
-                            'id': generate_uuid(),  # ID 필드 추가
-                            'diary_id': request.diary_id,
-                            'card_id': card_id,
-                            'prev_row': old_pos.get('row', 0),
-                            'prev_col': old_pos.get('col', 0),
-                            'new_row': new_pos.get('row', 0),
-                            'new_col': new_pos.get('col', 0),
-                            'step': 1,  # 기본값
-                            'created_at': datetime.now().isoformat(),
-                            'moved_by_user': True
-                        }
-                        
-                        print(f"💾 레이아웃 로그 저장: {card_id} - ({old_pos.get('row', 0)},{old_pos.get('col', 0)}) → ({new_pos.get('row', 0)},{new_pos.get('col', 0)})")
-                        supabase.table('layout_logs').insert([layout_log_data]).execute()
+                # 각 카드의 위치 변경을 행으로 모아 한 번에 버퍼에 추가
+                created_at = datetime.now().isoformat()
+                layout_log_rows = [
+                    {
+                        'id': generate_uuid(),  # ID 필드 추가
+                        'diary_id': request.diary_id,
+                        'card_id': card_id,
+                        'prev_row': original_layout[card_id].get('row', 0),
+                        'prev_col': original_layout[card_id].get('col', 0),
+                        'new_row': new_pos.get('row', 0),
+                        'new_col': new_pos.get('col', 0),
+                        'step': 1,  # 기본값
+                        'created_at': created_at,
+                        'moved_by_user': True
+                    }
+                    for card_id, new_pos in user_layout.items()
+                    if card_id in original_layout
+                ]
+                log_writer.enqueue('layout_logs', layout_log_rows)
                 
-                print("✅ 사용자 레이아웃 수정 로그 저장 완료")
+                print(f"✅ 사용자 레이아웃 수정 로그 {len(layout_log_rows)}개 저장 예약")
             except Exception as e:
                 print(f"⚠️ 사용자 레이아웃 로그 저장 실패: {e}")
                 import traceback
@@ -214,15 +334,23 @@ async def learn_from_feedback(request: FeedbackRequest):
             if request.details and 'related_card_id' in request.details:
                 reward_log_data['related_card_id'] = request.details['related_card_id']
             
-            print(f"💾 보상 로그 저장: {request.feedback_type}, 보상: {reward}")
-            supabase.table('reward_logs').insert([reward_log_data]).execute()
-            print("✅ 보상 로그 저장 완료")
+            print(f"💾 보상 로그 저장 예약: {request.feedback_type}, 보상: {reward}")
+            log_writer.enqueue('reward_logs', [reward_log_data])
         except Exception as e:
             print(f"⚠️ 보상 로그 저장 실패: {e}")
             import traceback
             print(f"📋 상세 에러: {traceback.format_exc()}")
         
-        # 4. 모델 자동 저장 (피드백이 있을 때마다)
+        # 4. 추천 당시의 스텝 데이터가 남아 있으면 최종 보상과 함께 리플레이 버퍼에 기록
+        trajectory = pending_episodes.pop(request.diary_id)
+        if trajectory is not None and replay_buffer is not None:
+            try:
+                replay_buffer.append_episode(final_reward=reward, **trajectory)
+                print(f"💾 리플레이 버퍼 기록: {len(trajectory['actions'])}스텝, 보상: {reward}")
+            except Exception as e:
+                print(f"⚠️ 리플레이 버퍼 기록 실패: {e}")
+
+        # 5. 모델 자동 저장 (피드백이 있을 때마다)
         try:
             ppo_model.save_model(model_path)
             print(f"💾 모델 자동 저장 완료: {model_path}")
@@ -294,13 +422,15 @@ async def batch_train(request: BatchTrainingRequest):
         if training_episodes:
             states = []
             rewards = []
+            actions = []
+            episode_env = RLEnvironment(rl_config)  # 요청마다 별도 환경 (전역 상태 공유 안 함)
             
             for episode in training_episodes:
                 try:
                     # 에피소드 데이터로 환경 초기화
                     user_id = episode.get('user_id', generate_uuid())
                     
-                    initial_state = rl_env.reset(
+                    initial_state = episode_env.reset(
                         user_id=user_id,
                         selected_card_ids=list(episode['layout_data'].keys()),
                         all_cards_data_raw=episode['layout_data'],
@@ -310,8 +440,14 @@ async def batch_train(request: BatchTrainingRequest):
                     # 보상 계산
                     reward = episode['reward']
                     
+                    # 첫 카드를 사용자가 최종적으로 놓은 칸을 이 상태에서의 행동으로 사용
+                    first_pos = next(iter(episode['layout_data'].values()), None)
+                    if first_pos is None or not (0 <= first_pos['row'] < rl_config.MAX_ROWS and 0 <= first_pos['col'] < rl_config.MAX_COLS):
+                        continue
+                    
                     states.append(initial_state)
                     rewards.append(reward)
+                    actions.append(first_pos['row'] * rl_config.MAX_COLS + first_pos['col'])
                         
                 except Exception as e:
                     print(f"⚠️ 에피소드 처리 실패: {e}")
@@ -325,7 +461,7 @@ async def batch_train(request: BatchTrainingRequest):
                     learning_rate = training_config.get('learning_rate', 0.001)
                     epochs = training_config.get('epochs', 3)
                     
-                    avg_loss = ppo_model.simple_update(states, rewards)
+                    avg_loss = ppo_model.simple_update(states, rewards, actions)
                     print(f"✅ 배치 학습 완료: {len(states)}개 에피소드, 평균 손실: {avg_loss:.4f}")
                     
                     # 모델 저장
@@ -366,11 +502,27 @@ async def get_model_status():
             "state_dim": rl_config.STATE_DIM,
             "action_space_size": rl_config.ACTION_SPACE_SIZE,
             "max_rows": rl_config.MAX_ROWS,
-            "max_cols": rl_config.MAX_COLS
+            "max_cols": rl_config.MAX_COLS,
+            "inference_mode": ppo_config.INFERENCE_MODE,
+            "layout_cache": ppo_model.layout_cache.stats(),
+            "card_features": {"feature_set": CardFeatureEncoder.FEATURE_SET, **get_card_encoder().cache_stats()},
+            "replay": {**replay_buffer.stats(), "pending": len(pending_episodes)} if replay_buffer is not None else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"모델 상태 확인 실패: {str(e)}") 
 
+@router.get("/log-writer-status")
+async def get_log_writer_status():
+    """버퍼에 쌓인 로그 행 수와 일괄 저장 결과(저장/버림/실패 배치 수)를 반환합니다."""
+    return log_writer.stats()
+
+@router.on_event("shutdown")
+async def flush_logs_on_shutdown():
+    # 종료 전에 버퍼에 남은 로그와 리플레이 버퍼 내용을 저장
+    await asyncio.to_thread(log_writer.stop)
+    if replay_buffer is not None:
+        replay_buffer.flush()
+
 @router.get("/learning-status")
 async def get_learning_status():
     """
@@ -0,0 +1,134 @@
+# back/db/log_writer.py
+# 로그 행 버퍼링 + 일괄 저장
+# 요청 처리 중에는 행을 메모리 버퍼에 넣기만 하고, 백그라운드 스레드가 주기적으로(또는 버퍼가 차면)
+# 테이블별로 묶어 한 번의 insert로 저장합니다. 실패하면 지수 백오프로 재시도합니다.
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class BufferedLogWriter:
+    """
+    테이블별 로그 행 버퍼와 플러시 스레드.
+    - enqueue()는 DB를 기다리지 않고 즉시 반환
+    - flush_interval_sec마다, 또는 한 테이블에 max_batch_size개 이상 쌓이면 플러시
+    - insert 한 번에 최대 max_batch_size개, 실패 시 retry_backoff_sec * 2^n 간격으로 max_retries번 재시도
+    - 재시도까지 실패한 행은 버퍼 앞쪽으로 되돌려 다음 플러시에서 다시 시도
+    - 버퍼 전체가 max_buffer_size를 넘으면 가장 오래된 행부터 버림 (DB 장애 시 메모리 보호)
+    """
+    def __init__(self,
+                 client,
+                 flush_interval_sec: float = 2.0,
+                 max_batch_size: int = 500,
+                 max_buffer_size: int = 50000,
+                 max_retries: int = 3,
+                 retry_backoff_sec: float = 0.5):
+        self.client = client
+        self.flush_interval_sec = flush_interval_sec
+        self.max_batch_size = max_batch_size
+        self.max_buffer_size = max_buffer_size
+        self.max_retries = max_retries
+        self.retry_backoff_sec = retry_backoff_sec
+        self._buffers: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # 플러시 스레드와 stop()의 마지막 플러시가 겹치지 않도록
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, table: str, rows: List[Dict[str, Any]]):
+        """행들을 버퍼에 추가합니다. 플러시 스레드가 없으면 시작합니다."""
+        if not rows:
+            return
+        self.start()
+        with self._cond:
+            buffer = self._buffers.setdefault(table, deque())
+            buffer.extend(rows)
+            overflow = self._buffered_count() - self.max_buffer_size
+            while overflow > 0 and buffer:
+                buffer.popleft()
+                self.dropped += 1
+                overflow -= 1
+            if len(buffer) >= self.max_batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """버퍼에 있는 모든 행을 지금 저장합니다 (호출한 스레드에서 실행)."""
+        with self._flush_lock:
+            with self._cond:
+                pending = {table: list(buffer) for table, buffer in self._buffers.items() if buffer}
+                for buffer in self._buffers.values():
+                    buffer.clear()
+
+            for table, rows in pending.items():
+                for start in range(0, len(rows), self.max_batch_size):
+                    batch = rows[start:start + self.max_batch_size]
+                    if not self._insert_with_retry(table, batch):
+                        # 남은 행을 순서 그대로 버퍼 앞쪽에 되돌림
+                        with self._cond:
+                            self._buffers[table].extendleft(reversed(rows[start:]))
+                        break
+
+    def stop(self, timeout: float = 10.0):
+        """플러시 스레드를 멈추고 남은 행을 저장합니다 (서버 종료 시)."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+        with self._cond:
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "buffered": {table: len(buffer) for table, buffer in self._buffers.items()},
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed_batches": self.failed_batches,
+                "last_error": self.last_error,
+            }
+
+    def _buffered_count(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def _insert_with_retry(self, table: str, rows: List[Dict[str, Any]]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.table(table).insert(rows).execute()
+                with self._cond:
+                    self.written += len(rows)
+                return True
+            except Exception as e:
+                self.last_error = f"{table}: {e}"
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff_sec * (2 ** attempt))
+        with self._cond:
+            self.failed_batches += 1
+        print(f"⚠️ 로그 일괄 저장 실패 ({table}, {len(rows)}행): {self.last_error}")
+        return False
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval_sec
+                while not self._stopping and time.monotonic() < deadline and \
+                        not any(len(buffer) >= self.max_batch_size for buffer in self._buffers.values()):
+                    self._cond.wait(max(deadline - time.monotonic(), 0.0))
+                if self._stopping:
+                    return
+            self.flush()
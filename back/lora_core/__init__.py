@@ -0,0 +1 @@
+# python 패키지로 인식하게 하기 위함 (LoRA 일기 생성 관련 모듈)
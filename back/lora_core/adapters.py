@@ -0,0 +1,120 @@
+# back/lora_core/adapters.py
+# 사용자별 LoRA 어댑터 버전 관리
+# 증분 학습 스크립트(lora/scripts/train_lora_incremental.py)가 새 버전을 게시하면
+# API는 재시작 없이 다음 요청부터 새 버전을 사용합니다.
+#
+# 디렉토리 구조:
+#   <root>/<user_id>/versions/v0001/   어댑터 가중치 (save_pretrained 결과)
+#   <root>/<user_id>/CURRENT           현재 버전 정보 (JSON, os.replace로 원자적으로 교체)
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, Optional
+
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 3  # API가 아직 이전 버전을 읽는 중일 수 있으므로 최근 몇 개는 남겨둠
+
+_USER_ID_PATTERN = re.compile(r"^[\w-]+$")
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]):
+    """임시 파일에 쓴 뒤 os.replace로 교체하여, 읽는 쪽이 반쯤 쓰인 파일을 보지 않도록 합니다."""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def user_adapter_dir(root: str, user_id: str) -> Optional[str]:
+    """사용자 어댑터 디렉토리 경로. user_id가 경로로 쓸 수 없는 값이면 None."""
+    if not user_id or not _USER_ID_PATTERN.match(user_id):
+        return None
+    return os.path.join(root, user_id)
+
+
+def publish_adapter(root: str, user_id: str, model, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    학습된 PeftModel을 새 버전 디렉토리에 저장하고 CURRENT를 교체합니다.
+    저장은 같은 파일시스템의 임시 디렉토리에 먼저 한 뒤 rename하므로, 반쯤 저장된 버전이 게시되지 않습니다.
+    Returns:
+        str: 게시된 버전 이름 (예: "v0003")
+    """
+    user_dir = user_adapter_dir(root, user_id)
+    if user_dir is None:
+        raise ValueError(f"잘못된 user_id: {user_id!r}")
+    versions_dir = os.path.join(user_dir, "versions")
+    os.makedirs(versions_dir, exist_ok=True)
+
+    staging_dir = os.path.join(versions_dir, f".staging-{os.getpid()}")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    model.save_pretrained(staging_dir)
+
+    existing = sorted(int(name[1:]) for name in os.listdir(versions_dir) if name[:1] == "v" and name[1:].isdigit())
+    version = f"v{(existing[-1] if existing else 0) + 1:04d}"
+    os.rename(staging_dir, os.path.join(versions_dir, version))
+
+    write_json_atomic(os.path.join(user_dir, CURRENT_FILE), {
+        "version": version,
+        "published_at": time.time(),
+        **(metadata or {})
+    })
+
+    # 새 버전을 포함해 최근 KEEP_VERSIONS개만 남김
+    for old in existing[:max(len(existing) - (KEEP_VERSIONS - 1), 0)]:
+        shutil.rmtree(os.path.join(versions_dir, f"v{old:04d}"), ignore_errors=True)
+    return version
+
+
+def read_current(root: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """게시된 현재 버전 정보(+ "path")를 반환합니다. 게시된 버전이 없으면 None."""
+    user_dir = user_adapter_dir(root, user_id)
+    if user_dir is None:
+        return None
+    try:
+        with open(os.path.join(user_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    info["path"] = os.path.join(user_dir, "versions", info["version"])
+    return info
+
+
+class UserAdapterRegistry:
+    """
+    요청마다 사용자 어댑터의 현재 버전을 조회합니다.
+    CURRENT 파일의 mtime이 바뀌었을 때만 다시 읽으므로 요청당 비용은 stat 한 번입니다.
+    """
+    def __init__(self, root: str, base_version: str):
+        self.root = root
+        self.base_version = base_version
+        self._cache: Dict[str, tuple] = {}  # user_id -> (mtime_ns, info)
+        self._lock = threading.Lock()
+
+    def current(self, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        user_dir = user_adapter_dir(self.root, user_id) if user_id else None
+        if user_dir is None:
+            return None
+        try:
+            mtime_ns = os.stat(os.path.join(user_dir, CURRENT_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] == mtime_ns:
+                return cached[1]
+        info = read_current(self.root, user_id)
+        with self._lock:
+            self._cache[user_id] = (mtime_ns, info)
+        return info
+
+    def version_label(self, user_id: Optional[str]) -> str:
+        """응답의 model_version과 캐시 키에 쓰는 버전 문자열 (예: "lora-v1.0+v0003")."""
+        info = self.current(user_id)
+        return f"{self.base_version}+{info['version']}" if info else self.base_version
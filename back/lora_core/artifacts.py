@@ -0,0 +1,126 @@
+# back/lora_core/artifacts.py
+# 베이스 모델 로컬 스냅샷 캐시
+# 첫 실행 때 허브에서 받은 토크나이저/설정/가중치(safetensors)를 버전 디렉토리에 저장하고,
+# 이후 실행에서는 네트워크 없이 그 디렉토리에서만(local_files_only) 로드합니다.
+#
+# 디렉토리 구조:
+#   <root>/<org>--<model>/<version>/      save_pretrained 결과 + manifest.json (파일별 크기, sha256)
+#   <root>/<org>--<model>/CURRENT         사용할 버전 (JSON, os.replace로 원자적으로 교체)
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional
+
+from lora_core.adapters import write_json_atomic
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+def _model_dir(root: str, model_name: str) -> str:
+    return os.path.join(root, model_name.replace("/", "--"))
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_snapshot(root: str, model_name: str) -> Optional[str]:
+    """CURRENT가 가리키는 스냅샷 디렉토리. 없으면 None."""
+    model_dir = _model_dir(root, model_name)
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = json.load(f)["version"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+    path = os.path.join(model_dir, version)
+    return path if os.path.isdir(path) else None
+
+
+def verify_snapshot(path: str, mode: str = "size") -> Optional[str]:
+    """
+    manifest와 실제 파일을 비교합니다. mode="size"는 크기만, "sha256"은 전체 해시까지 확인합니다.
+    Returns:
+        Optional[str]: 문제가 있으면 오류 설명, 정상이면 None
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return f"manifest 읽기 실패: {e}"
+
+    for name, info in manifest["files"].items():
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path):
+            return f"파일 없음: {name}"
+        if os.path.getsize(file_path) != info["bytes"]:
+            return f"크기 불일치: {name}"
+        if mode == "sha256" and _sha256(file_path) != info["sha256"]:
+            return f"체크섬 불일치: {name}"
+    return None
+
+
+def _set_config_dtype(config_path: str, dtype) -> None:
+    """save_pretrained가 기록한 config.json의 dtype을 실제로 저장한 가중치 dtype으로 맞춥니다."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    for key in ("torch_dtype", "dtype"):
+        if key in config:
+            config[key] = str(dtype).replace("torch.", "")
+    write_json_atomic(config_path, config)
+
+
+def save_snapshot(root: str, model_name: str, tokenizer, model, dtype=None) -> str:
+    """
+    로드된 토크나이저와 모델을 새 스냅샷으로 저장하고 CURRENT를 교체합니다.
+    버전은 허브 커밋 해시(config._commit_hash)를 사용하고, 없으면 저장 시각을 사용합니다.
+    여러 프로세스가 동시에 저장해도 임시 디렉토리 → rename 순서라 완성된 스냅샷 하나만 남습니다.
+    dtype (torch.dtype, optional): 저장할 가중치 dtype. CPU에서는 float32로 올려 로드하므로 원본 체크포인트의
+        dtype(예: float16)을 넘겨 스냅샷 크기를 원본과 같게 유지합니다. None이면 로드된 dtype 그대로 저장.
+    """
+    model_dir = _model_dir(root, model_name)
+    os.makedirs(model_dir, exist_ok=True)
+    version = getattr(model.config, "_commit_hash", None) or time.strftime("%Y%m%d-%H%M%S")
+    final_dir = os.path.join(model_dir, version)
+
+    if not os.path.isdir(final_dir) or verify_snapshot(final_dir) is not None:
+        staging_dir = os.path.join(model_dir, f".staging-{os.getpid()}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        tokenizer.save_pretrained(staging_dir)
+        saved_dtype = dtype or model.dtype
+        state_dict = None
+        if saved_dtype != model.dtype:
+            state_dict = {name: tensor.to(saved_dtype) if tensor.is_floating_point() else tensor
+                          for name, tensor in model.state_dict().items()}
+        model.save_pretrained(staging_dir, safe_serialization=True, state_dict=state_dict)
+        if state_dict is not None:
+            _set_config_dtype(os.path.join(staging_dir, "config.json"), saved_dtype)
+
+        files: Dict[str, Dict[str, Any]] = {}
+        for name in sorted(os.listdir(staging_dir)):
+            file_path = os.path.join(staging_dir, name)
+            files[name] = {"bytes": os.path.getsize(file_path), "sha256": _sha256(file_path)}
+        write_json_atomic(os.path.join(staging_dir, MANIFEST_FILE), {
+            "model_name": model_name,
+            "version": version,
+            "torch_dtype": str(saved_dtype).replace("torch.", ""),
+            "created_at": time.time(),
+            "files": files,
+        })
+
+        shutil.rmtree(final_dir, ignore_errors=True)  # 검증에 실패한 이전 스냅샷
+        try:
+            os.rename(staging_dir, final_dir)
+        except OSError:
+            # 다른 프로세스가 먼저 같은 버전을 저장함
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    write_json_atomic(os.path.join(model_dir, CURRENT_FILE), {"version": version})
+    return final_dir
@@ -0,0 +1,114 @@
+# back/lora_core/cache.py
+# 생성 결과 캐시 (TTL + LRU)와 동일 요청 병합(single-flight)
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class GenerationCache:
+    """
+    (diary_id, 원문 해시, 어댑터 버전, 샘플링 설정)을 키로 생성 결과를 저장합니다.
+    - 최대 max_size개까지 LRU 방식으로 보관하고, ttl_sec가 지나면 만료됩니다.
+    - 같은 키로 동시에 들어온 요청은 하나의 생성 작업을 공유합니다.
+    get/set은 워커 스레드에서도 호출할 수 있도록 잠금으로 보호합니다.
+    """
+    def __init__(self, max_size: int = 256, ttl_sec: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(diary_id: str, original_text: str, adapter_version: str, sampling_params: Dict[str, Any]) -> str:
+        """캐시/멱등성 키를 만듭니다. 원문과 샘플링 설정은 해시로만 포함됩니다."""
+        text_hash = hashlib.sha256(original_text.encode("utf-8")).hexdigest()
+        params_hash = hashlib.sha256(json.dumps(sampling_params, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return f"{diary_id}:{text_hash}:{adapter_version}:{params_hash}"
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_sec:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def get_or_create(self,
+                            key: str,
+                            factory: Callable[[], Awaitable[Any]],
+                            should_cache: Callable[[Any], bool] = lambda value: True) -> Tuple[Any, str]:
+        """
+        캐시에 있으면 바로 반환하고, 같은 키의 생성이 진행 중이면 그 결과를 기다립니다.
+        Returns:
+            Tuple[Any, str]: (결과, 상태). 상태는 "hit", "coalesced", "miss" 중 하나.
+        """
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached, "hit"
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight), "coalesced"
+            except asyncio.CancelledError:
+                # 생성을 맡은 요청이 취소된 경우에만 다시 시도 (이 요청 자체가 취소되었으면 그대로 전파)
+                if not inflight.cancelled():
+                    raise
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except Exception as e:
+            future.set_exception(e)
+            # 기다리는 요청이 없으면 "exception was never retrieved" 경고가 뜨지 않도록 소비
+            future.exception()
+            raise
+        except BaseException:
+            # 취소(CancelledError) 등: 기다리는 요청이 영원히 멈추지 않도록 future도 취소
+            future.cancel()
+            raise
+        else:
+            if should_cache(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value, "miss"
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
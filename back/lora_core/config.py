@@ -0,0 +1,116 @@
+# back/lora_core/config.py
+
+import os
+
+
+class DiaryGenerationConfig:
+    """LoRA 일기 생성 관련 설정을 정의하는 클래스"""
+    BASE_MODEL_NAME = "EleutherAI/polyglot-ko-1.3b"
+    LORA_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "lora", "models")
+
+    # 베이스 모델 로컬 스냅샷: 첫 실행 때 토크나이저/설정/가중치(safetensors)를 저장하고 이후에는 디스크에서만 로드
+    # 수 GB 크기이므로 저장소 밖(HF_HOME, 없으면 ~/.cache/huggingface 아래)에 둡니다.
+    MODEL_CACHE_ENABLED = os.getenv("LORA_MODEL_CACHE", "1") == "1"
+    MODEL_CACHE_DIR = os.getenv(
+        "LORA_MODEL_CACHE_DIR",
+        os.path.join(
+            os.getenv("HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface")),
+            "diary-snapshots"
+        )
+    )
+    MODEL_CACHE_VERIFY = os.getenv("LORA_MODEL_CACHE_VERIFY", "size")  # "size": 파일 크기만, "sha256": 전체 체크섬
+
+    # 응답의 model_version 및 캐시 키에 사용되는 어댑터 버전
+    ADAPTER_VERSION = "lora-v1.0"
+
+    # 사용자별 증분 학습 어댑터 (lora/scripts/train_lora_incremental.py가 게시, 게시되면 재시작 없이 사용)
+    # 사용자 어댑터가 있으면 model_version은 "lora-v1.0+v0003"처럼 버전이 붙습니다.
+    USER_ADAPTER_ROOT = os.getenv(
+        "LORA_USER_ADAPTER_ROOT",
+        os.path.join(os.path.dirname(__file__), "..", "..", "lora", "models", "users")
+    )
+    MAX_LOADED_USER_ADAPTERS = int(os.getenv("LORA_MAX_USER_ADAPTERS", "8"))  # 메모리에 함께 올려둘 사용자 어댑터 수
+
+    # 생성 결과 캐시 설정
+    CACHE_MAX_SIZE = int(os.getenv("LORA_CACHE_MAX_SIZE", "256"))
+    CACHE_TTL_SEC = float(os.getenv("LORA_CACHE_TTL_SEC", "3600"))
+
+    # 비동기 생성 작업 설정
+    JOB_WORKERS = int(os.getenv("LORA_JOB_WORKERS", "1"))  # 생성 워커 스레드 수
+    JOB_QUEUE_MAX_SIZE = int(os.getenv("LORA_JOB_QUEUE_MAX_SIZE", "32"))  # 초과 시 429 반환
+    JOB_RESULT_TTL_SEC = float(os.getenv("LORA_JOB_RESULT_TTL_SEC", "600"))  # 완료된 작업 결과 보관 시간
+    JOB_MAX_WAIT_SEC = 30.0  # long-poll 최대 대기 시간
+    JOB_MODEL_WAIT_SEC = float(os.getenv("LORA_JOB_MODEL_WAIT_SEC", "60"))  # 작업 워커가 모델 준비를 기다리는 최대 시간
+
+    # 모델 수명 주기: 백그라운드에서 로드하고, 실패하면 지수 백오프로 재시도, 준비되면 짧은 생성으로 워밍업
+    MODEL_LOAD_BACKOFF_BASE_SEC = 5.0
+    MODEL_LOAD_BACKOFF_MAX_SEC = 300.0
+    WARMUP_TEXT = "오늘은 날씨가 맑았다."
+    WARMUP_NEW_TOKENS = 8
+
+    # 빠른 초안 (lora_core/fast_path.py): 모델 준비 전이거나 예상 지연이 예산을 넘으면
+    # 사용자의 과거 카드 문장 중 원문과 비슷한 문장을 붙여 바로 응답 (model_version="fast_path_draft")
+    FAST_PATH_ENABLED = os.getenv("LORA_FAST_PATH", "1") == "1"
+    FAST_PATH_LATENCY_BUDGET_SEC = float(os.getenv("LORA_FAST_PATH_BUDGET_SEC", "20"))
+    FAST_PATH_INDEX_SIZE = 200  # 색인할 최근 카드 수 (사용자별)
+    FAST_PATH_INDEX_TTL_SEC = 600.0
+    FAST_PATH_MAX_USERS = 256
+    FAST_PATH_MAX_SENTENCES = 2  # 초안에 붙일 과거 문장 수
+    FAST_PATH_MIN_SCORE = 0.1  # 이보다 덜 비슷한 문장은 쓰지 않음
+    FALLBACK_SUFFIX = "오늘 하루도 행복한 하루였다."
+
+    # 모델 실행 위치: "local"은 API 워커 프로세스 안에서 로드, "worker"는 별도 모델 워커 프로세스 하나를 공유
+    MODEL_BACKEND = os.getenv("LORA_MODEL_BACKEND", "local")
+    # 소켓/인증 키/잠금 파일은 실행 사용자만 접근할 수 있는 디렉토리(0700)에 둡니다.
+    # multiprocessing.connection은 메시지를 unpickle하므로, 인증 키가 노출되면 워커에서 임의 코드가 실행될 수 있습니다.
+    MODEL_WORKER_DIR = os.getenv(
+        "LORA_WORKER_DIR",
+        os.path.join(os.getenv("XDG_RUNTIME_DIR") or os.path.join(os.path.expanduser("~"), ".cache"), "untold-lora-worker")
+    )
+    MODEL_WORKER_SOCKET = os.getenv("LORA_WORKER_SOCKET", os.path.join(MODEL_WORKER_DIR, "worker.sock"))
+    # 인증 키: LORA_WORKER_AUTHKEY가 있으면 사용, 없으면 처음 실행될 때 무작위 키를 만들어 이 파일(0600)로 공유
+    MODEL_WORKER_AUTHKEY = os.getenv("LORA_WORKER_AUTHKEY")
+    MODEL_WORKER_AUTHKEY_FILE = os.getenv("LORA_WORKER_AUTHKEY_FILE", os.path.join(MODEL_WORKER_DIR, "authkey"))
+    MODEL_WORKER_SPAWN = os.getenv("LORA_WORKER_SPAWN", "1") == "1"  # 워커가 없으면 API 워커가 직접 실행
+    MODEL_WORKER_HEALTH_INTERVAL_SEC = 10.0
+    MODEL_WORKER_START_TIMEOUT_SEC = 120.0
+    MODEL_WORKER_REQUEST_TIMEOUT_SEC = 300.0
+
+    # 모델 가중치 dtype: "auto"는 CUDA면 float16, CPU면 float32 (그 외 "bfloat16", "float32" 등)
+    TORCH_DTYPE = os.getenv("LORA_TORCH_DTYPE", "auto")
+
+    # 프롬프트 토큰화 시 최대 길이
+    MAX_PROMPT_LENGTH = 512
+
+    # 배치 생성 (한 일기의 카드들을 한 번에 생성) 시 한 배치의 최대 크기
+    BATCH_MAX_SIZE = int(os.getenv("LORA_BATCH_MAX_SIZE", "8"))
+
+    # 샘플링 설정 (speculative 모드에서도 동일하게 사용)
+    SAMPLING_PARAMS = {
+        "do_sample": True,
+        "top_k": 50,
+        "top_p": 0.95,
+        "temperature": 0.8,
+        "max_new_tokens": 200,
+        "no_repeat_ngram_size": 3,
+        "repetition_penalty": 1.15,
+        "length_penalty": 1.2,
+        "early_stopping": True,
+    }
+
+    # 조기 종료 설정
+    # 모델이 다음 예시("입력:")나 또 다른 "출력:"을 생성하기 시작하면 답변이 끝난 것으로 간주
+    STOP_SEQUENCES = ["\n입력:", "출력:"]
+    STOP_ON_REPEATED_LINE = True
+
+    # 입력 길이 기반 토큰 예산: MIN_NEW_TOKENS + 입력 토큰 수 * NEW_TOKENS_PER_INPUT_TOKEN
+    # (SAMPLING_PARAMS["max_new_tokens"]를 상한으로 사용)
+    MIN_NEW_TOKENS = 48
+    NEW_TOKENS_PER_INPUT_TOKEN = 3.0
+
+    # Speculative(assisted) decoding 설정
+    # "off": 사용 안 함, "draft": 별도의 작은 모델 사용, "truncated": 베이스 모델의 앞쪽 레이어만 잘라 draft로 사용
+    SPECULATIVE_MODE = os.getenv("LORA_SPECULATIVE_MODE", "off")
+    DRAFT_MODEL_NAME = os.getenv("LORA_DRAFT_MODEL", "")  # SPECULATIVE_MODE="draft"일 때 사용할 모델 이름/경로
+    DRAFT_NUM_LAYERS = int(os.getenv("LORA_DRAFT_LAYERS", "4"))  # SPECULATIVE_MODE="truncated"일 때 남길 레이어 수
+    NUM_ASSISTANT_TOKENS = int(os.getenv("LORA_NUM_ASSISTANT_TOKENS", "5"))  # 한 번에 draft가 제안할 토큰 수
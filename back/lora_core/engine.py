@@ -0,0 +1,389 @@
+# back/lora_core/engine.py
+# LoRA 모델 로드와 일기 문장 생성 로직 (API 프로세스와 모델 워커 프로세스에서 공통으로 사용)
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForCausalLM, StoppingCriteriaList
+from peft import PeftModel
+
+from lora_core.adapters import UserAdapterRegistry
+from lora_core.artifacts import current_snapshot, verify_snapshot, save_snapshot
+from lora_core.config import DiaryGenerationConfig
+from lora_core.speculative import load_draft_model, count_forward_calls, GenerationStats
+from lora_core.stopping import (
+    DiaryStoppingCriteria, CancellationCriteria, TokenBudgetCriteria, truncate_at_stop_sequences, compute_token_budget
+)
+
+
+class GenerationError(RuntimeError):
+    """모델이 없거나 추론/모델 워커 호출이 실패해 생성 결과가 없음. 호출한 쪽은 캐시/저장하지 말고 대체 응답을 사용."""
+
+
+def build_prompt(original_text: str) -> str:
+    """일기 원문을 few-shot 프롬프트로 감쌉니다."""
+    return f"""다음은 일기를 감성적인 문체로 개선하는 예시야:
+
+입력: 오늘 기분이 좋았다.
+출력: 햇살이 비추는 아침, 마음까지 따뜻해지는 하루의 시작이었다.
+
+입력: {original_text}
+출력:"""
+
+
+def post_process_text(generated_text: str, original_text: str) -> str:
+    try:
+        text = generated_text.strip()
+
+        lines = text.split('\n')
+        cleaned_lines = []
+        seen = set()
+        for line in lines:
+            line = line.strip()
+            if line and line not in seen:
+                cleaned_lines.append(line)
+                seen.add(line)
+        text = '\n'.join(cleaned_lines)
+
+
+        if len(text) < 10:  # 최소 10자 이상이면 사용
+            print(f"⚠️ 생성된 텍스트가 너무 짧습니다: {len(text)}자. 원본 반환.")
+            return original_text
+
+        return text
+    except Exception as e:
+        print(f"❌ 후처리 실패: {e}")
+        return generated_text
+
+
+class DiaryGenerator:
+    """
+    베이스 모델 + LoRA 어댑터(+ 선택적 draft 모델)를 보유하고 일기 문장을 생성합니다.
+    사용자별 어댑터가 게시되어 있으면 요청마다 해당 어댑터로 전환해서 생성합니다.
+    (활성 어댑터는 모델 전체에 적용되므로 생성은 한 번에 하나씩 실행됩니다.)
+    load()와 generate()는 모두 블로킹 함수이므로 이벤트 루프에서는 스레드로 실행해야 합니다.
+    """
+    def __init__(self, config: DiaryGenerationConfig):
+        self.config = config
+        self.model = None
+        self.tokenizer = None
+        self.draft_model = None
+        self.draft_tokenizer = None
+        self.is_loaded = False
+        self.load_error: Optional[str] = None
+        self.load_times: Dict[str, float] = {}  # 단계별 로드 시간(초): snapshot_verify, tokenizer, base_model, snapshot_save, adapter, draft
+        self.stats = GenerationStats()
+        self.adapters = UserAdapterRegistry(config.USER_ADAPTER_ROOT, config.ADAPTER_VERSION)
+        self._user_adapters: "OrderedDict[str, str]" = OrderedDict()  # user_id -> 로드된 어댑터 이름
+        self._load_lock = threading.Lock()
+        self._generate_lock = threading.Lock()
+
+    @property
+    def speculative_mode(self) -> str:
+        return self.config.SPECULATIVE_MODE if self.draft_model is not None else "off"
+
+    def load(self):
+        with self._load_lock:
+            if self.is_loaded and self.model is not None and self.tokenizer is not None:
+                print("🤖 LoRA 모델이 이미 로드되어 있습니다.")
+                return
+
+            self.load_error = None
+            self.load_times = {}
+            try:
+                print("🤖 LoRA 모델 로딩 시작...")
+                base_model_name = self.config.BASE_MODEL_NAME
+                lora_model_path = self.config.LORA_MODEL_PATH
+
+                # 로컬 스냅샷이 있으면 허브 이름 대신 디스크에서만 로드 (오프라인에서도 동일하게 시작)
+                snapshot_dir = None
+                if self.config.MODEL_CACHE_ENABLED:
+                    stage_start = time.perf_counter()
+                    snapshot_dir = current_snapshot(self.config.MODEL_CACHE_DIR, base_model_name)
+                    if snapshot_dir is not None:
+                        error = verify_snapshot(snapshot_dir, self.config.MODEL_CACHE_VERIFY)
+                        if error is not None:
+                            print(f"⚠️ 모델 스냅샷 검증 실패, 허브에서 다시 받습니다: {error}")
+                            snapshot_dir = None
+                    self.load_times["snapshot_verify"] = round(time.perf_counter() - stage_start, 3)
+                model_source = snapshot_dir or base_model_name
+                source_kwargs = {"local_files_only": True} if snapshot_dir else {}
+                print(f"📦 모델 경로: {model_source}")
+
+                stage_start = time.perf_counter()
+                self.tokenizer = AutoTokenizer.from_pretrained(model_source, **source_kwargs)
+                if self.tokenizer.pad_token is None:
+                    self.tokenizer.pad_token = self.tokenizer.eos_token
+                self.tokenizer.padding_side = "left"
+                self.load_times["tokenizer"] = round(time.perf_counter() - stage_start, 3)
+
+                stage_start = time.perf_counter()
+                if self.config.TORCH_DTYPE == "auto":
+                    compute_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+                else:
+                    compute_dtype = getattr(torch, self.config.TORCH_DTYPE)
+                base_model = AutoModelForCausalLM.from_pretrained(
+                    model_source,
+                    torch_dtype=compute_dtype,
+                    device_map="auto" if torch.cuda.is_available() else None,
+                    **source_kwargs
+                )
+                self.load_times["base_model"] = round(time.perf_counter() - stage_start, 3)
+                print("✅ 베이스 모델 로드 완료.")
+
+                if self.config.MODEL_CACHE_ENABLED and snapshot_dir is None:
+                    stage_start = time.perf_counter()
+                    try:
+                        # 런타임 dtype(CPU는 float32)이 아니라 원본 체크포인트 dtype으로 저장 (polyglot-ko는 float16)
+                        source_config = AutoConfig.from_pretrained(model_source, **source_kwargs)
+                        source_dtype = getattr(source_config, "dtype", None) or getattr(source_config, "torch_dtype", None)
+                        if isinstance(source_dtype, str):
+                            source_dtype = getattr(torch, source_dtype, None)
+                        saved_dir = save_snapshot(self.config.MODEL_CACHE_DIR, base_model_name, self.tokenizer, base_model,
+                                                  dtype=source_dtype if isinstance(source_dtype, torch.dtype) else None)
+                        print(f"💾 모델 스냅샷 저장: {saved_dir}")
+                    except Exception as e:
+                        print(f"⚠️ 모델 스냅샷 저장 실패 (다음 실행도 허브에서 로드): {e}")
+                    self.load_times["snapshot_save"] = round(time.perf_counter() - stage_start, 3)
+
+                stage_start = time.perf_counter()
+                try:
+                    self.model = PeftModel.from_pretrained(base_model, lora_model_path)
+                    print("✅ LoRA 모델 로드 성공!")
+                except Exception as e:
+                    print(f"❌ LoRA 가중치 로딩 실패: {e}")
+                    self.model = base_model
+                    self.is_loaded = False
+                    self.load_error = f"LoRA 가중치 로딩 실패: {e}"
+                    return
+                self.load_times["adapter"] = round(time.perf_counter() - stage_start, 3)
+
+                self.model.eval()
+
+                stage_start = time.perf_counter()
+                try:
+                    self.draft_model, self.draft_tokenizer = load_draft_model(self.model, self.tokenizer, self.config)
+                except Exception as e:
+                    print(f"⚠️ Draft 모델 준비 실패, 일반 디코딩 사용: {e}")
+                    self.draft_model, self.draft_tokenizer = None, None
+                if self.draft_model is not None:
+                    self.load_times["draft"] = round(time.perf_counter() - stage_start, 3)
+
+                self.is_loaded = True
+                print("✅ LoRA 모델 준비 완료!")
+
+            except Exception as e:
+                print(f"❌ 모델 전체 로딩 실패: {e}")
+                self.model = None
+                self.tokenizer = None
+                self.is_loaded = False
+                self.load_error = f"모델 전체 로딩 실패: {e}"
+
+    def warmup(self):
+        """
+        짧은 생성을 한 번 실행해 첫 요청에서 생기는 지연(가중치 페이지 인, 커널 선택, KV 캐시 버퍼 할당)을 미리 치릅니다.
+        통계(stats)에는 기록하지 않습니다.
+        """
+        model, tokenizer = self.model, self.tokenizer
+        inputs = tokenizer(build_prompt(self.config.WARMUP_TEXT), return_tensors="pt")
+        inputs = {k: v.to(model.device) for k, v in inputs.items()}
+        with self._generate_lock, torch.no_grad():
+            model.generate(
+                **inputs,
+                max_new_tokens=self.config.WARMUP_NEW_TOKENS,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id,
+                **self._assisted_kwargs()
+            )
+
+    def _assisted_kwargs(self) -> Dict[str, Any]:
+        """draft 모델이 있으면 generate()에 넘길 assisted decoding 인자."""
+        if self.draft_model is None:
+            return {}
+        assisted_kwargs = {"assistant_model": self.draft_model}
+        if self.draft_tokenizer is not None:
+            # 토크나이저가 다른 draft 모델은 두 토크나이저가 모두 필요
+            assisted_kwargs["tokenizer"] = self.tokenizer
+            assisted_kwargs["assistant_tokenizer"] = self.draft_tokenizer
+        return assisted_kwargs
+
+    def model_status(self) -> Dict[str, Any]:
+        """준비 상태 엔드포인트용: 모델별 로드 여부와 단계별 로드 시간."""
+        return {
+            "lora": {
+                "loaded": self.is_loaded,
+                "base_model": self.config.BASE_MODEL_NAME,
+                "adapter_version": self.config.ADAPTER_VERSION,
+                "load_times": {k: v for k, v in self.load_times.items() if k != "draft"},
+                "error": self.load_error,
+            },
+            "draft": {
+                "mode": self.speculative_mode,
+                "loaded": self.draft_model is not None,
+                "load_time_sec": self.load_times.get("draft"),
+            },
+        }
+
+    def adapter_version(self, user_id: Optional[str] = None) -> str:
+        return self.adapters.version_label(user_id)
+
+    def _activate_adapter(self, user_id: Optional[str]) -> str:
+        """
+        사용자의 최신 어댑터를 (필요하면 로드해서) 활성화하고 어댑터 이름을 반환합니다.
+        게시된 버전이 바뀌었으면 이전 버전은 내리고 새 버전을 올립니다. _generate_lock 안에서 호출해야 합니다.
+        """
+        model = self.model
+        info = self.adapters.current(user_id)
+        if info is None or not isinstance(model, PeftModel):
+            if isinstance(model, PeftModel):
+                model.set_adapter("default")
+            return "default"
+
+        adapter_name = f"{user_id}_{info['version']}"
+        if adapter_name not in model.peft_config:
+            stale = self._user_adapters.pop(user_id, None)
+            if stale is not None:
+                model.set_adapter("default")
+                model.delete_adapter(stale)
+            model.load_adapter(info["path"], adapter_name=adapter_name)
+            self._user_adapters[user_id] = adapter_name
+            print(f"🔄 사용자 어댑터 로드: user={user_id}, version={info['version']}")
+
+            while len(self._user_adapters) > self.config.MAX_LOADED_USER_ADAPTERS:
+                _, evicted = self._user_adapters.popitem(last=False)
+                model.set_adapter("default")
+                model.delete_adapter(evicted)
+
+        self._user_adapters.move_to_end(user_id)
+        model.set_adapter(adapter_name)
+        return adapter_name
+
+    def generate(self,
+                 original_text: str,
+                 cancel_event: Optional[threading.Event] = None,
+                 user_id: Optional[str] = None) -> str:
+        return self.generate_batch([original_text], cancel_event=cancel_event, user_id=user_id)[0]
+
+    def generate_batch(self,
+                       original_texts: List[str],
+                       cancel_event: Optional[threading.Event] = None,
+                       user_id: Optional[str] = None) -> List[str]:
+        """
+        여러 원문(예: 한 일기의 카드들)을 왼쪽 패딩된 배치로 한 번에 생성합니다.
+        스텝마다 forward 한 번으로 모든 행을 처리하므로 모델 호출 오버헤드가 카드 수만큼 나뉩니다.
+        BATCH_MAX_SIZE보다 많으면 나누어 처리합니다.
+        """
+        if self.model is None or self.tokenizer is None:
+            raise GenerationError("모델이 로드되지 않았습니다.")
+        with self._generate_lock:
+            try:
+                adapter_name = self._activate_adapter(user_id)
+            except Exception as e:
+                print(f"⚠️ 사용자 어댑터 전환 실패, 공용 어댑터 사용: {e}")
+                adapter_name = self._activate_adapter(None)
+
+            results = []
+            batch_size = self.config.BATCH_MAX_SIZE
+            for start in range(0, len(original_texts), batch_size):
+                results.extend(self._generate(original_texts[start:start + batch_size], cancel_event, adapter_name))
+            return results
+
+    def _generate(self, original_texts: List[str], cancel_event: Optional[threading.Event], adapter_name: str) -> List[str]:
+        model, tokenizer = self.model, self.tokenizer
+        config = self.config
+        # assisted decoding은 배치 크기 1만 지원하므로 여러 개일 때는 일반 디코딩
+        draft_model = self.draft_model if len(original_texts) == 1 else None
+        try:
+            prompts = [build_prompt(text) for text in original_texts]
+
+            inputs = tokenizer(
+                prompts,
+                return_tensors="pt",
+                truncation=True,
+                max_length=config.MAX_PROMPT_LENGTH,
+                padding=True  # load()에서 padding_side="left"로 설정 → 모든 행이 같은 위치에서 생성 시작
+            )
+            inputs = {k: v.to(model.device) for k, v in inputs.items()}
+            prompt_length = inputs["input_ids"].shape[1]
+
+            # 입력 길이에 맞춘 토큰 예산과 조기 종료 조건 (배치에서는 행별 예산, 행별 종료)
+            budgets = [
+                compute_token_budget(len(ids), config)
+                for ids in tokenizer(original_texts)["input_ids"]
+            ]
+            sampling_params = dict(config.SAMPLING_PARAMS)
+            sampling_params["max_new_tokens"] = max(budgets)
+            stopping_criteria = StoppingCriteriaList([
+                DiaryStoppingCriteria(
+                    tokenizer,
+                    prompt_length,
+                    config.STOP_SEQUENCES,
+                    stop_on_repeated_line=config.STOP_ON_REPEATED_LINE
+                )
+            ])
+            if len(set(budgets)) > 1:
+                stopping_criteria.append(TokenBudgetCriteria(prompt_length, budgets))
+            if cancel_event is not None:
+                stopping_criteria.append(CancellationCriteria(cancel_event))
+
+            # speculative decoding: draft 모델이 토큰을 제안하고 메인 모델이 검증 (샘플링 설정은 동일)
+            assisted_kwargs = self._assisted_kwargs() if draft_model is not None else {}
+
+            target_module = model.get_base_model() if hasattr(model, "get_base_model") else model
+            forward_calls = {}
+            start_time = time.perf_counter()
+            with torch.no_grad(), \
+                    count_forward_calls(target_module, forward_calls, "target"), \
+                    count_forward_calls(draft_model, forward_calls, "draft"):
+                generated_ids = model.generate(
+                    inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    pad_token_id=tokenizer.pad_token_id,
+                    eos_token_id=tokenizer.eos_token_id,
+                    stopping_criteria=stopping_criteria,
+                    **sampling_params,
+                    **assisted_kwargs
+                )
+            elapsed = time.perf_counter() - start_time
+
+            new_ids = generated_ids[:, prompt_length:]
+            # 먼저 끝난 행은 pad로 채워지므로 pad가 아닌 토큰만 셈
+            new_tokens = int((new_ids != tokenizer.pad_token_id).sum()) if len(original_texts) > 1 else new_ids.shape[1]
+            step_stats = self.stats.record(
+                new_tokens,
+                elapsed,
+                target_calls=forward_calls["target"] if draft_model is not None else 0,
+                draft_calls=forward_calls["draft"],
+            )
+            print(f"⏱️ 생성 통계: {step_stats} (batch={len(original_texts)}, "
+                  f"budget={sampling_params['max_new_tokens']}, adapter={adapter_name})")
+
+            results = []
+            for row_ids, original_text in zip(new_ids, original_texts):
+                # 출력 파싱: 프롬프트 이후 생성된 부분만 디코딩하고 stop sequence 앞에서 자름
+                generated_text = tokenizer.decode(row_ids, skip_special_tokens=True)
+                generated_text = truncate_at_stop_sequences(generated_text, config.STOP_SEQUENCES).strip()
+
+                # 긍정 문장 하드코딩
+                generated_text = post_process_text(generated_text, original_text)
+                results.append(generated_text + "\n행복한 하루였다.")
+            return results
+
+        except Exception as e:
+            print(f"❌ 추론 실패: {e}")
+            raise GenerationError(f"추론 실패: {e}") from e
+
+    def stats_summary(self) -> Dict[str, Any]:
+        return {"speculative_mode": self.speculative_mode, "loaded_user_adapters": len(self._user_adapters),
+                **self.stats.summary()}
+
+
+def create_generator(config: DiaryGenerationConfig):
+    """설정(MODEL_BACKEND)에 따라 프로세스 내 생성기 또는 모델 워커 클라이언트를 만듭니다."""
+    if config.MODEL_BACKEND == "worker":
+        from lora_core.model_worker import RemoteDiaryGenerator
+        return RemoteDiaryGenerator(config)
+    return DiaryGenerator(config)
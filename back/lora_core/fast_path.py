@@ -0,0 +1,196 @@
+# back/lora_core/fast_path.py
+# 모델이 준비되지 않았거나 생성 대기가 지연 예산을 넘을 때 쓰는 빠른 초안 생성
+# 사용자의 과거 카드 문장(text_final, content)을 문자 n-gram TF-IDF로 색인해 두고,
+# 원문과 가장 비슷한 과거 문장을 붙여 밀리초 단위로 초안을 만듭니다.
+
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?。])\s+|\n+")
+_WORD = re.compile(r"\w+")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text or "") if s.strip()]
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = (2, 3)) -> Counter:
+    """단어 경계를 포함한 문자 n-gram 빈도. 한국어는 어미/조사 변화가 많아 단어보다 문자 단위가 잘 맞습니다."""
+    grams: Counter = Counter()
+    for word in _WORD.findall(text.lower()):
+        padded = f" {word} "
+        for n in sizes:
+            for i in range(len(padded) - n + 1):
+                grams[padded[i:i + n]] += 1
+    return grams
+
+
+class SnippetIndex:
+    """한 사용자의 과거 문장에 대한 TF-IDF 색인 (벡터는 L2 정규화된 sparse dict)."""
+    def __init__(self, snippets: Iterable[str]):
+        self.snippets: List[str] = list(dict.fromkeys(s for s in snippets if s))
+        counts = [char_ngrams(s) for s in self.snippets]
+        df: Counter = Counter()
+        for grams in counts:
+            df.update(grams.keys())
+        n = len(self.snippets)
+        self.idf = {gram: math.log((1 + n) / (1 + freq)) + 1 for gram, freq in df.items()}
+        self.vectors = [self._weigh(grams) for grams in counts]
+        self.built_at = time.monotonic()
+
+    def _weigh(self, grams: Counter) -> Dict[str, float]:
+        vector = {gram: (1 + math.log(tf)) * self.idf[gram] for gram, tf in grams.items() if gram in self.idf}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {gram: w / norm for gram, w in vector.items()} if norm else {}
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, str]]:
+        q = self._weigh(char_ngrams(query))
+        if not q:
+            return []
+        scored = []
+        for snippet, vector in zip(self.snippets, self.vectors):
+            # 짧은 쪽 dict로 순회
+            small, large = (q, vector) if len(q) < len(vector) else (vector, q)
+            score = sum(w * large.get(gram, 0.0) for gram, w in small.items())
+            if score > 0:
+                scored.append((score, snippet))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:top_k]
+
+
+class RetrievalDraftGenerator:
+    """
+    사용자별 SnippetIndex를 LRU + TTL로 보관하고 초안을 만듭니다.
+    fetch_snippets(user_id)는 사용자의 과거 카드 텍스트 목록을 반환하는 함수입니다 (DB 조회는 색인을 만들 때만).
+    비슷한 과거 문장이 없으면 fallback_suffix를 붙입니다.
+    """
+    def __init__(self,
+                 fetch_snippets: Callable[[str], List[str]],
+                 max_users: int = 256,
+                 ttl_sec: float = 600.0,
+                 max_sentences: int = 2,
+                 min_score: float = 0.1,
+                 fallback_suffix: str = "오늘 하루도 행복한 하루였다."):
+        self.fetch_snippets = fetch_snippets
+        self.max_users = max_users
+        self.ttl_sec = ttl_sec
+        self.max_sentences = max_sentences
+        self.min_score = min_score
+        self.fallback_suffix = fallback_suffix
+        self._indexes: "OrderedDict[str, SnippetIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.drafts = 0
+        self.retrieved = 0
+        self.elapsed = 0.0
+        self.reasons: Counter = Counter()
+
+    def index_for(self, user_id: Optional[str]) -> Optional[SnippetIndex]:
+        if not user_id:
+            return None
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at <= self.ttl_sec:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        try:
+            snippets = [sentence for text in self.fetch_snippets(user_id) for sentence in split_sentences(text)]
+        except Exception as e:
+            print(f"⚠️ 초안 색인용 문장 조회 실패: user={user_id}, {e}")
+            return index  # 만료된 색인이라도 있으면 사용
+
+        index = SnippetIndex(snippets)
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def compose(self, original_text: str, user_id: Optional[str] = None, reason: str = "busy") -> str:
+        start_time = time.perf_counter()
+        index = self.index_for(user_id)
+        own = set(split_sentences(original_text))
+
+        picked: List[str] = []
+        if index is not None and index.snippets:
+            results = index.search(original_text, top_k=self.max_sentences * 4)
+            # 어미("~했다.")처럼 흔한 n-gram만 겹치는 문장은 제외: 가장 비슷한 문장 점수의 절반 이상만 사용
+            cutoff = max(self.min_score, results[0][0] * 0.5) if results else self.min_score
+            for score, snippet in results:
+                if score < cutoff or len(picked) >= self.max_sentences:
+                    break
+                if snippet not in own and snippet not in picked:
+                    picked.append(snippet)
+
+        draft = original_text.strip() + "\n" + (" ".join(picked) if picked else self.fallback_suffix)
+        with self._lock:
+            self.drafts += 1
+            self.retrieved += bool(picked)
+            self.elapsed += time.perf_counter() - start_time
+            self.reasons[reason] += 1
+        return draft
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "drafts": self.drafts,
+                "retrieval_rate": round(self.retrieved / self.drafts, 3) if self.drafts else None,
+                "avg_ms": round(self.elapsed * 1000 / self.drafts, 2) if self.drafts else None,
+                "reasons": dict(self.reasons),
+                "indexed_users": len(self._indexes),
+            }
+
+
+class LoadMonitor:
+    """
+    모델 생성 호출의 진행 수와 소요 시간(EWMA)을 추적해 새 요청의 예상 지연을 계산합니다.
+    생성은 DiaryGenerator._generate_lock으로 한 번에 하나씩 실행되므로 (모델 워커도 같음)
+    예상 지연 = (앞선 작업 수 + 1) * 평균 생성 시간
+    """
+    def __init__(self, budget_sec: float = 20.0, alpha: float = 0.2):
+        self.budget_sec = budget_sec
+        self.alpha = alpha
+        self.inflight = 0
+        self.avg_sec: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.inflight += 1
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            with self._lock:
+                self.inflight -= 1
+                self.avg_sec = elapsed if self.avg_sec is None else (
+                    self.alpha * elapsed + (1 - self.alpha) * self.avg_sec
+                )
+
+    def estimated_latency(self, queued: int = 0) -> Optional[float]:
+        """아직 생성 기록이 없으면 추정할 수 없으므로 None."""
+        with self._lock:
+            if self.avg_sec is None:
+                return None
+            return (self.inflight + queued + 1) * self.avg_sec
+
+    def over_budget(self, queued: int = 0) -> bool:
+        estimate = self.estimated_latency(queued)
+        return estimate is not None and estimate > self.budget_sec
+
+    def stats(self) -> Dict[str, Any]:
+        estimate = self.estimated_latency()
+        return {
+            "inflight": self.inflight,
+            "avg_generation_sec": round(self.avg_sec, 3) if self.avg_sec is not None else None,
+            "estimated_latency_sec": round(estimate, 3) if estimate is not None else None,
+            "latency_budget_sec": self.budget_sec,
+        }
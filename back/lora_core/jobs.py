@@ -0,0 +1,184 @@
+# back/lora_core/jobs.py
+# 비동기 생성 작업 큐: 요청은 job id만 받고, 별도 워커 스레드가 우선순위 순으로 생성을 수행
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """대기열이 가득 차서 작업을 받을 수 없을 때 발생합니다."""
+
+
+class GenerationJob:
+    """생성 작업 하나의 상태와 결과를 담습니다."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, payload: Any, priority: int = 0):
+        self.id = str(uuid.uuid4())
+        self.payload = payload
+        self.priority = priority
+        self.status = self.QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()  # 실행 중인 생성을 멈추기 위해 StoppingCriteria에서 확인
+        self.done_event = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class GenerationJobQueue:
+    """
+    크기가 제한된 우선순위 대기열과 워커 스레드 풀.
+    - priority 값이 클수록 먼저 실행되고, 같으면 먼저 들어온 작업이 먼저 실행됩니다.
+    - 대기 중인 작업이 max_queue_size개를 넘으면 submit이 QueueFullError를 던집니다.
+    - 완료된 작업은 result_ttl_sec 동안 조회할 수 있습니다.
+    """
+    def __init__(self, num_workers: int = 1, max_queue_size: int = 32, result_ttl_sec: float = 600.0):
+        self.num_workers = num_workers
+        self.max_queue_size = max_queue_size
+        self.result_ttl_sec = result_ttl_sec
+        self._heap: List[Tuple[int, int, str]] = []
+        self._counter = itertools.count()
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._handler: Optional[Callable[[GenerationJob], Any]] = None
+
+    def start(self, handler: Callable[[GenerationJob], Any]):
+        """handler(job)를 실행할 워커 스레드를 시작합니다. 이미 시작했다면 아무 것도 하지 않습니다."""
+        with self._cond:
+            if self._workers:
+                return
+            self._handler = handler
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"lora-job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        print(f"🧵 생성 작업 워커 {self.num_workers}개 시작")
+
+    def submit(self, payload: Any, priority: int = 0) -> GenerationJob:
+        with self._cond:
+            self._purge_finished()
+            if self._queued >= self.max_queue_size:
+                raise QueueFullError(f"대기 중인 작업이 {self.max_queue_size}개로 가득 찼습니다.")
+            job = GenerationJob(payload, priority)
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (-priority, next(self._counter), job.id))
+            self._queued += 1
+            self._cond.notify()
+            return job
+
+    def complete(self, payload: Any, result: Any, priority: int = 0) -> GenerationJob:
+        """캐시 등으로 결과가 이미 있는 경우 대기열을 거치지 않고 완료된 작업을 등록합니다."""
+        job = GenerationJob(payload, priority)
+        job.result = result
+        job.status = GenerationJob.DONE
+        job.started_at = job.finished_at = job.created_at
+        job.done_event.set()
+        with self._cond:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """대기 중인 작업의 순번(0부터)을 반환합니다. 대기 중이 아니면 None."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != GenerationJob.QUEUED:
+                return None
+            ordered = sorted(entry for entry in self._heap if self._jobs[entry[2]].status == GenerationJob.QUEUED)
+            return [entry[2] for entry in ordered].index(job_id)
+
+    def cancel(self, job_id: str) -> Optional[GenerationJob]:
+        """대기 중인 작업은 즉시 취소하고, 실행 중인 작업은 생성 중단을 요청합니다."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished:
+                return job
+            job.cancel_event.set()
+            if job.status == GenerationJob.QUEUED:
+                # 힙에서는 워커가 꺼낼 때 건너뜀
+                self._queued -= 1
+                self._finish(job, GenerationJob.CANCELLED)
+            return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "workers": len(self._workers),
+                "queued": self._queued,
+                "max_queue_size": self.max_queue_size,
+                "jobs": counts,
+            }
+
+    def _finish(self, job: GenerationJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        job.done_event.set()
+
+    def _purge_finished(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.is_finished and now - job.finished_at > self.result_ttl_sec]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _next_job(self) -> GenerationJob:
+        with self._cond:
+            while True:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is None or job.status != GenerationJob.QUEUED:
+                    continue  # 취소된 작업
+                self._queued -= 1
+                job.status = GenerationJob.RUNNING
+                job.started_at = time.time()
+                return job
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            try:
+                result = self._handler(job)
+                with self._cond:
+                    job.result = result
+                    self._finish(job, GenerationJob.CANCELLED if job.cancel_event.is_set() else GenerationJob.DONE)
+            except Exception as e:
+                print(f"❌ 생성 작업 실패: job={job.id}, {e}")
+                with self._cond:
+                    job.error = str(e)
+                    self._finish(job, GenerationJob.FAILED)
@@ -0,0 +1,106 @@
+# back/lora_core/lifecycle.py
+# 모델 로드/워밍업 수명 주기 관리
+# 요청 처리 경로에서는 모델을 로드하지 않고, 백그라운드 스레드 하나가 로드 → 워밍업 → ready 순서로 준비합니다.
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class ModelLifecycle:
+    """
+    생성기(DiaryGenerator 또는 RemoteDiaryGenerator) 하나의 로드 상태를 관리합니다.
+    - start()는 여러 번 호출해도 로드 스레드를 하나만 띄움 (single-flight)
+    - 로드에 실패하면 backoff_base_sec * 2^(실패 횟수 - 1) (최대 backoff_max_sec) 뒤 재시도
+    - 로드가 끝나면 짧은 생성으로 워밍업(가중치 페이지 인, 버퍼 할당)한 뒤 ready
+    상태: not_started → loading → warming_up → ready (실패 시 backoff → loading ...)
+    """
+    def __init__(self, name: str, generator, backoff_base_sec: float = 5.0, backoff_max_sec: float = 300.0):
+        self.name = name
+        self.generator = generator
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.state = "not_started"
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.load_time_sec: Optional[float] = None
+        self.warmup_time_sec: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.next_retry_at: Optional[float] = None
+        self._ready_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_ready(self) -> bool:
+        # 준비된 뒤에도 모델 워커가 죽는 등 생성기가 내려가면 ready가 아님
+        return self._ready_event.is_set() and self.generator.is_loaded
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-lifecycle", daemon=True)
+                self._thread.start()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """ready가 될 때까지 최대 timeout초 기다립니다. (작업 워커 스레드용, 이벤트 루프에서 호출하지 말 것)"""
+        self._ready_event.wait(timeout)
+        return self.is_ready
+
+    def _run(self):
+        failures = 0
+        while True:
+            self.state = "loading"
+            self.attempts += 1
+            start_time = time.perf_counter()
+            try:
+                self.generator.load()
+                error = None if self.generator.is_loaded else (
+                    getattr(self.generator, "load_error", None) or "로드 후에도 모델이 준비되지 않음"
+                )
+            except Exception as e:
+                error = str(e)
+
+            if error is None:
+                self.last_error = None
+                self.load_time_sec = round(time.perf_counter() - start_time, 3)
+                break
+
+            failures += 1
+            self.last_error = error
+            delay = min(self.backoff_base_sec * (2 ** (failures - 1)), self.backoff_max_sec)
+            self.state = "backoff"
+            self.next_retry_at = time.time() + delay
+            print(f"⚠️ [{self.name}] 모델 로드 실패 ({failures}회): {error} → {delay:.1f}초 후 재시도")
+            time.sleep(delay)
+
+        self.state = "warming_up"
+        start_time = time.perf_counter()
+        try:
+            self.generator.warmup()
+        except Exception as e:
+            # 워밍업 실패는 첫 요청이 느려질 뿐이므로 ready로 진행
+            self.last_error = f"warmup: {e}"
+            print(f"⚠️ [{self.name}] 워밍업 실패: {e}")
+        self.warmup_time_sec = round(time.perf_counter() - start_time, 3)
+
+        self.next_retry_at = None
+        self.ready_at = time.time()
+        self.state = "ready"
+        self._ready_event.set()
+        print(f"✅ [{self.name}] 모델 준비 완료: 로드 {self.load_time_sec}초, 워밍업 {self.warmup_time_sec}초")
+
+    def status(self) -> Dict[str, Any]:
+        state = self.state
+        if state == "ready" and not self.generator.is_loaded:
+            state = "degraded"
+        return {
+            "state": state,
+            "ready": self.is_ready,
+            "attempts": self.attempts,
+            "load_time_sec": self.load_time_sec,
+            "warmup_time_sec": self.warmup_time_sec,
+            "ready_since": self.ready_at,
+            "next_retry_in_sec": round(max(self.next_retry_at - time.time(), 0.0), 1) if self.next_retry_at else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,372 @@
+# back/lora_core/model_worker.py
+# LoRA 모델을 단독으로 보유하는 모델 워커 프로세스와, API 워커 쪽 클라이언트/감시자
+#
+# 실행 (back/ 디렉토리에서):
+#   python -m lora_core.model_worker                       # 소켓: DiaryGenerationConfig.MODEL_WORKER_SOCKET
+# LORA_MODEL_BACKEND=worker 이면 API 워커가 필요할 때 직접 이 프로세스를 띄우고 재시작합니다.
+#
+# multiprocessing.connection은 받은 메시지를 unpickle하므로 인증 키를 아는 쪽은 워커에서 코드를 실행할 수 있습니다.
+# 그래서 소켓은 실행 사용자 전용 디렉토리(0700)에만 만들고, 인증 키는 환경 변수 또는 0600 파일의 무작위 값만 씁니다.
+
+import argparse
+import fcntl
+import os
+import secrets
+import stat
+import subprocess
+import sys
+import threading
+import time
+from contextlib import closing
+from multiprocessing.connection import Listener, Client
+from typing import Any, Dict, List, Optional
+
+from lora_core.adapters import UserAdapterRegistry
+from lora_core.config import DiaryGenerationConfig
+from lora_core.engine import DiaryGenerator, GenerationError
+from lora_core.lifecycle import ModelLifecycle
+
+
+AUTHKEY_BYTES = 32
+
+
+# --- 소켓 디렉토리와 인증 키 ---
+def _check_private(path: str):
+    """path가 현재 사용자 소유이고 그룹/기타 사용자 권한이 없는지 확인합니다 (기존 경로의 권한은 바꾸지 않음)."""
+    info = os.stat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"다른 사용자 소유의 경로는 사용할 수 없습니다: {path}")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f"그룹/다른 사용자가 접근할 수 있는 경로는 사용할 수 없습니다 "
+                              f"(권한 {oct(stat.S_IMODE(info.st_mode))}, 0700/0600 필요): {path}")
+
+
+def ensure_private_dir(path: str) -> str:
+    """실행 사용자만 접근할 수 있는 디렉토리(0700)를 만들거나, 이미 있으면 그런 디렉토리인지 확인합니다."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    _check_private(path)
+    return path
+
+
+def load_authkey(config: DiaryGenerationConfig) -> bytes:
+    """
+    모델 워커 인증 키. LORA_WORKER_AUTHKEY가 있으면 그 값을, 없으면 MODEL_WORKER_AUTHKEY_FILE의 무작위 키를 사용합니다.
+    키 파일이 없으면 0600으로 새로 만듭니다 (API 워커와 모델 워커 중 먼저 실행된 쪽이 생성, O_EXCL로 한 번만).
+    """
+    if config.MODEL_WORKER_AUTHKEY:
+        return config.MODEL_WORKER_AUTHKEY.encode("utf-8")
+
+    path = config.MODEL_WORKER_AUTHKEY_FILE
+    ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(secrets.token_hex(AUTHKEY_BYTES))
+    _check_private(path)
+    with open(path, "r", encoding="utf-8") as f:
+        key = f.read().strip()
+    if len(key) < AUTHKEY_BYTES:
+        raise ValueError(f"모델 워커 인증 키 파일이 비어 있거나 너무 짧습니다: {path}")
+    return key.encode("utf-8")
+
+
+# --- 워커 프로세스 (서버) ---
+def _handle_connection(conn, generator: DiaryGenerator, lifecycle: ModelLifecycle):
+    """연결 하나에서 요청 하나를 처리합니다. 생성 도중 cancel 메시지나 연결 종료가 오면 생성을 멈춥니다."""
+    try:
+        message = conn.recv()
+        op = message.get("op")
+
+        if op == "ping":
+            conn.send({
+                "ok": True,
+                "pid": os.getpid(),
+                "loaded": lifecycle.is_ready,  # 워밍업까지 끝나야 요청을 받음
+                "speculative_mode": generator.speculative_mode,
+                "lifecycle": lifecycle.status(),
+                "models": generator.model_status(),
+            })
+        elif op == "stats":
+            conn.send({"ok": True, "stats": generator.stats_summary()})
+        elif op == "generate":
+            cancel_event = threading.Event()
+            result: Dict[str, Any] = {}
+
+            def _run():
+                # 동시에 들어온 요청은 generator 안의 잠금에서 순서대로 실행됨
+                try:
+                    result["generated_texts"] = generator.generate_batch(
+                        message["original_texts"], cancel_event=cancel_event, user_id=message.get("user_id")
+                    )
+                except Exception as e:
+                    result["error"] = str(e)
+
+            thread = threading.Thread(target=_run, daemon=True)
+            thread.start()
+            while thread.is_alive():
+                try:
+                    if conn.poll(0.2) and conn.recv().get("op") == "cancel":
+                        cancel_event.set()
+                except (EOFError, OSError):
+                    # 클라이언트가 연결을 끊으면 더 이상 결과를 받을 곳이 없으므로 생성 중단
+                    cancel_event.set()
+                    thread.join()
+                    return
+            if "error" in result:
+                conn.send({"ok": False, "error": result["error"]})
+            else:
+                conn.send({"ok": True, "generated_texts": result["generated_texts"]})
+        else:
+            conn.send({"ok": False, "error": f"알 수 없는 요청: {op}"})
+    except (EOFError, OSError):
+        pass
+    except Exception as e:
+        print(f"❌ 모델 워커 요청 처리 실패: {e}")
+        try:
+            conn.send({"ok": False, "error": str(e)})
+        except Exception:
+            pass
+    finally:
+        conn.close()
+
+
+def serve(socket_path: str, config: DiaryGenerationConfig):
+    """소켓을 열고 모델을 백그라운드에서 로드한 뒤 요청을 처리합니다."""
+    # 공개된 위치나 키로는 시작하지 않음 (실패하면 예외로 종료)
+    ensure_private_dir(os.path.dirname(os.path.abspath(socket_path)))
+    authkey = load_authkey(config)
+    generator = DiaryGenerator(config)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # 이전 워커가 남긴 소켓 파일
+    listener = Listener(socket_path, family="AF_UNIX", authkey=authkey)
+    os.chmod(socket_path, 0o600)
+    print(f"🛰️ 모델 워커 시작: pid={os.getpid()}, socket={socket_path}")
+
+    # 로딩 중에도 ping에 응답할 수 있도록 모델은 별도 스레드에서 로드 (실패 시 백오프 재시도, 워밍업 포함)
+    lifecycle = ModelLifecycle(
+        "lora",
+        generator,
+        backoff_base_sec=config.MODEL_LOAD_BACKOFF_BASE_SEC,
+        backoff_max_sec=config.MODEL_LOAD_BACKOFF_MAX_SEC
+    )
+    lifecycle.start()
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"⚠️ 모델 워커 연결 수락 실패: {e}")
+                continue
+            threading.Thread(target=_handle_connection, args=(conn, generator, lifecycle), daemon=True).start()
+    finally:
+        listener.close()
+
+
+# --- API 워커 쪽 (클라이언트) ---
+class ModelWorkerClient:
+    """Unix 소켓으로 모델 워커에 요청을 보내는 얇은 클라이언트."""
+    def __init__(self, socket_path: str, authkey: bytes, request_timeout_sec: float):
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.request_timeout_sec = request_timeout_sec
+
+    def _request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        with closing(Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)) as conn:
+            conn.send(message)
+            if not conn.poll(5.0):
+                raise TimeoutError("모델 워커 응답 없음")
+            return conn.recv()
+
+    def ping(self) -> Optional[Dict[str, Any]]:
+        try:
+            return self._request({"op": "ping"})
+        except Exception:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return self._request({"op": "stats"}).get("stats", {})
+
+    def generate_batch(self,
+                       original_texts: List[str],
+                       cancel_event: Optional[threading.Event] = None,
+                       user_id: Optional[str] = None) -> List[str]:
+        deadline = time.monotonic() + self.request_timeout_sec
+        with closing(Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)) as conn:
+            conn.send({"op": "generate", "original_texts": original_texts, "user_id": user_id})
+            cancel_sent = False
+            while not conn.poll(0.2):
+                if cancel_event is not None and cancel_event.is_set() and not cancel_sent:
+                    conn.send({"op": "cancel"})
+                    cancel_sent = True
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"모델 워커 생성 시간 초과 ({self.request_timeout_sec}s)")
+            reply = conn.recv()
+
+        if not reply.get("ok"):
+            raise GenerationError(reply.get("error", "모델 워커 생성 실패"))
+        return reply["generated_texts"]
+
+
+class RemoteDiaryGenerator:
+    """
+    DiaryGenerator와 같은 인터페이스로 모델 워커를 사용합니다.
+    주기적으로 워커 상태를 확인하고, 응답이 없으면 (파일 잠금으로 한 API 워커만) 새로 띄웁니다.
+    """
+    def __init__(self, config: DiaryGenerationConfig):
+        self.config = config
+        ensure_private_dir(os.path.dirname(os.path.abspath(config.MODEL_WORKER_SOCKET)))
+        self.client = ModelWorkerClient(
+            config.MODEL_WORKER_SOCKET,
+            load_authkey(config),
+            config.MODEL_WORKER_REQUEST_TIMEOUT_SEC
+        )
+        self.adapters = UserAdapterRegistry(config.USER_ADAPTER_ROOT, config.ADAPTER_VERSION)
+        self._status: Dict[str, Any] = {}
+        self._process: Optional[subprocess.Popen] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._restarts = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self._status.get("loaded"))
+
+    @property
+    def speculative_mode(self) -> str:
+        return self._status.get("speculative_mode", "off")
+
+    @property
+    def load_error(self) -> Optional[str]:
+        lifecycle = self._status.get("lifecycle")
+        if lifecycle is None:
+            return "모델 워커에 연결할 수 없음"
+        return lifecycle.get("last_error") or f"모델 워커 상태: {lifecycle.get('state')}"
+
+    def load(self):
+        """워커가 떠 있는지 확인(필요하면 실행)하고 모델 로드가 끝날 때까지 기다립니다."""
+        self._ensure_worker()
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._monitor_loop, name="lora-worker-monitor", daemon=True)
+            self._monitor.start()
+
+        deadline = time.monotonic() + self.config.MODEL_WORKER_START_TIMEOUT_SEC
+        while not self.is_loaded and time.monotonic() < deadline:
+            time.sleep(1.0)
+            self._status = self.client.ping() or {}
+        if not self.is_loaded:
+            print("⚠️ 모델 워커가 아직 모델을 로드하지 못했습니다.")
+
+    def warmup(self):
+        # 모델 워커가 로드 직후 스스로 워밍업하므로 여기서는 할 일이 없음
+        pass
+
+    def model_status(self) -> Dict[str, Any]:
+        return {
+            **self._status.get("models", {}),
+            "worker": {
+                "pid": self._status.get("pid"),
+                "restarts": self._restarts,
+                "lifecycle": self._status.get("lifecycle"),
+            },
+        }
+
+    def adapter_version(self, user_id: Optional[str] = None) -> str:
+        # 어댑터 디렉토리는 워커와 같은 파일시스템을 보므로 버전은 여기서 바로 조회
+        return self.adapters.version_label(user_id)
+
+    def generate(self,
+                 original_text: str,
+                 cancel_event: Optional[threading.Event] = None,
+                 user_id: Optional[str] = None) -> str:
+        return self.generate_batch([original_text], cancel_event=cancel_event, user_id=user_id)[0]
+
+    def generate_batch(self,
+                       original_texts: List[str],
+                       cancel_event: Optional[threading.Event] = None,
+                       user_id: Optional[str] = None) -> List[str]:
+        try:
+            return self.client.generate_batch(original_texts, cancel_event=cancel_event, user_id=user_id)
+        except GenerationError as e:
+            # 워커는 살아 있고 추론만 실패
+            print(f"❌ 모델 워커 추론 실패: {e}")
+            raise
+        except Exception as e:
+            print(f"❌ 모델 워커 호출 실패: {e}")
+            self._status = {}
+            raise GenerationError(f"모델 워커 호출 실패: {e}") from e
+
+    def stats_summary(self) -> Dict[str, Any]:
+        try:
+            stats = self.client.stats()
+        except Exception as e:
+            stats = {"error": str(e)}
+        return {"speculative_mode": self.speculative_mode, "worker_pid": self._status.get("pid"),
+                "worker_restarts": self._restarts, **stats}
+
+    def _ensure_worker(self) -> bool:
+        status = self.client.ping()
+        if status:
+            self._status = status
+            return True
+
+        self._status = {}
+        if not self.config.MODEL_WORKER_SPAWN:
+            return False
+
+        # 여러 API 워커가 동시에 워커를 띄우지 않도록 파일 잠금
+        with open(self.config.MODEL_WORKER_SOCKET + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            status = self.client.ping()
+            if status:
+                self._status = status
+                return True
+
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()  # 응답 없는 워커 정리
+                self._process.wait()
+
+            back_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            self._process = subprocess.Popen(
+                [sys.executable, "-m", "lora_core.model_worker", "--socket", self.config.MODEL_WORKER_SOCKET],
+                cwd=back_dir
+            )
+            self._restarts += 1
+            print(f"🚀 모델 워커 실행: pid={self._process.pid}")
+
+            deadline = time.monotonic() + 30.0
+            while time.monotonic() < deadline:
+                status = self.client.ping()
+                if status:
+                    self._status = status
+                    return True
+                if self._process.poll() is not None:
+                    break
+                time.sleep(0.5)
+
+        print("❌ 모델 워커를 시작하지 못했습니다.")
+        return False
+
+    def _monitor_loop(self):
+        failures = 0
+        while True:
+            time.sleep(min(self.config.MODEL_WORKER_HEALTH_INTERVAL_SEC * (2 ** failures), 300))
+            if self._ensure_worker():
+                failures = 0
+            else:
+                failures = min(failures + 1, 5)
+                print(f"⚠️ 모델 워커 상태 확인 실패 ({failures}회 연속)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LoRA 모델 워커 프로세스")
+    parser.add_argument("--socket", default=DiaryGenerationConfig.MODEL_WORKER_SOCKET, help="Unix 소켓 경로")
+    args = parser.parse_args()
+    serve(args.socket, DiaryGenerationConfig())
+
+
+if __name__ == "__main__":
+    main()
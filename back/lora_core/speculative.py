@@ -0,0 +1,150 @@
+# back/lora_core/speculative.py
+# Speculative(assisted) decoding을 위한 draft 모델 구성 및 계측 유틸리티
+
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+import torch.nn as nn
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from lora_core.config import DiaryGenerationConfig
+
+
+def _shallow_module_copy(module: nn.Module) -> nn.Module:
+    """
+    가중치는 공유하되 _modules, hook 등 내부 딕셔너리는 분리된 nn.Module 얕은 복사본을 만듭니다.
+    (copy.copy만 사용하면 하위 모듈/forward hook 딕셔너리까지 원본과 공유됩니다.)
+    """
+    clone = copy.copy(module)
+    for name, value in module.__dict__.items():
+        if isinstance(value, dict):
+            clone.__dict__[name] = type(value)(value)
+    return clone
+
+
+def build_truncated_draft(model: nn.Module, num_layers: int) -> nn.Module:
+    """
+    베이스 모델의 앞쪽 num_layers개 디코더 레이어만 사용하는 draft 모델을 만듭니다.
+    임베딩/레이어/출력층 가중치는 원본과 공유하므로 추가 메모리가 거의 들지 않고,
+    LoRA가 주입된 레이어도 그대로 공유됩니다.
+    """
+    base = model.get_base_model() if hasattr(model, "get_base_model") else model
+    inner = getattr(base, base.base_model_prefix)  # GPT-NeoX: base.gpt_neox
+
+    num_layers = max(1, min(num_layers, len(inner.layers)))
+
+    draft_inner = _shallow_module_copy(inner)
+    draft_inner.layers = nn.ModuleList(list(inner.layers)[:num_layers])
+
+    draft = _shallow_module_copy(base)
+    setattr(draft, base.base_model_prefix, draft_inner)
+
+    draft.config = copy.deepcopy(base.config)
+    draft.config.num_hidden_layers = num_layers
+    draft_inner.config = draft.config
+    draft.generation_config = copy.deepcopy(base.generation_config)
+    return draft
+
+
+def load_draft_model(model: nn.Module, tokenizer, config: DiaryGenerationConfig) -> Tuple[Optional[nn.Module], Optional[Any]]:
+    """
+    설정에 따라 draft 모델을 준비합니다.
+    Returns:
+        Tuple[Optional[nn.Module], Optional[Any]]: (draft 모델, draft 토크나이저).
+            draft 토크나이저는 메인 토크나이저와 어휘가 다를 때만 반환됩니다 (universal assisted decoding).
+    """
+    mode = config.SPECULATIVE_MODE
+    if mode == "off":
+        return None, None
+
+    draft_tokenizer = None
+    if mode == "truncated":
+        draft = build_truncated_draft(model, config.DRAFT_NUM_LAYERS)
+        print(f"✅ Truncated draft 모델 준비 완료: {draft.config.num_hidden_layers}개 레이어")
+    elif mode == "draft":
+        if not config.DRAFT_MODEL_NAME:
+            print("⚠️ LORA_DRAFT_MODEL이 설정되지 않아 speculative decoding을 사용하지 않습니다.")
+            return None, None
+        draft = AutoModelForCausalLM.from_pretrained(
+            config.DRAFT_MODEL_NAME,
+            torch_dtype=next(model.parameters()).dtype,
+        ).to(model.device)
+        loaded_tokenizer = AutoTokenizer.from_pretrained(config.DRAFT_MODEL_NAME)
+        if loaded_tokenizer.get_vocab() != tokenizer.get_vocab():
+            draft_tokenizer = loaded_tokenizer
+        print(f"✅ Draft 모델 로드 완료: {config.DRAFT_MODEL_NAME}")
+    else:
+        print(f"⚠️ 알 수 없는 LORA_SPECULATIVE_MODE: {mode}. speculative decoding을 사용하지 않습니다.")
+        return None, None
+
+    draft.eval()
+    draft.generation_config.num_assistant_tokens = config.NUM_ASSISTANT_TOKENS
+    draft.generation_config.num_assistant_tokens_schedule = "heuristic"
+    return draft, draft_tokenizer
+
+
+@contextmanager
+def count_forward_calls(module: Optional[nn.Module], counter: Dict[str, int], key: str):
+    """with 블록 안에서 module의 forward 호출 횟수를 counter[key]에 기록합니다."""
+    counter[key] = 0
+    if module is None:
+        yield
+        return
+
+    def _hook(*_):
+        counter[key] += 1
+
+    handle = module.register_forward_hook(_hook)
+    try:
+        yield
+    finally:
+        handle.remove()
+
+
+class GenerationStats:
+    """
+    생성 요청별 토큰 수/소요 시간과 speculative decoding 수락률을 누적합니다.
+    수락률은 (생성 토큰 수 - 메인 모델 forward 횟수) / draft forward 횟수 로 근사합니다.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.new_tokens = 0
+        self.elapsed = 0.0
+        self.target_calls = 0
+        self.draft_calls = 0
+        self.accepted_tokens = 0
+        self.started_at = time.time()
+
+    def record(self, new_tokens: int, elapsed: float, target_calls: int = 0, draft_calls: int = 0) -> Dict[str, float]:
+        accepted = max(0, new_tokens - target_calls) if draft_calls else 0
+        with self._lock:
+            self.requests += 1
+            self.new_tokens += new_tokens
+            self.elapsed += elapsed
+            self.target_calls += target_calls
+            self.draft_calls += draft_calls
+            self.accepted_tokens += accepted
+        return {
+            "new_tokens": new_tokens,
+            "elapsed_sec": round(elapsed, 3),
+            "tokens_per_sec": round(new_tokens / elapsed, 2) if elapsed > 0 else 0.0,
+            "acceptance_rate": round(accepted / draft_calls, 3) if draft_calls else None,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "avg_new_tokens": round(self.new_tokens / self.requests, 2) if self.requests else 0.0,
+            "tokens_per_sec": round(self.new_tokens / self.elapsed, 2) if self.elapsed > 0 else 0.0,
+            "acceptance_rate": round(self.accepted_tokens / self.draft_calls, 3) if self.draft_calls else None,
+            "target_forward_calls": self.target_calls,
+            "draft_forward_calls": self.draft_calls,
+            "since": self.started_at,
+        }
@@ -0,0 +1,78 @@
+# back/lora_core/stopping.py
+# 생성 조기 종료 조건과 입력 길이 기반 토큰 예산 계산
+
+from typing import List
+
+import torch
+from transformers import StoppingCriteria
+
+from lora_core.config import DiaryGenerationConfig
+
+
+class DiaryStoppingCriteria(StoppingCriteria):
+    """
+    프롬프트 이후에 생성된 부분만 보고 종료 여부를 판단합니다.
+    - stop_sequences 중 하나가 나오면 종료 (예: 다음 예시로 넘어가는 "\\n입력:", 두 번째 "출력:")
+    - stop_on_repeated_line이면 이미 나온 줄이 다시 완성되었을 때 종료
+    배치 입력에서는 행별로 종료 여부를 반환합니다.
+    """
+    def __init__(self, tokenizer, prompt_length: int, stop_sequences: List[str], stop_on_repeated_line: bool = True):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_sequences = stop_sequences
+        self.stop_on_repeated_line = stop_on_repeated_line
+
+    def _should_stop(self, text: str) -> bool:
+        if any(seq in text for seq in self.stop_sequences):
+            return True
+
+        if self.stop_on_repeated_line:
+            # 마지막 줄은 아직 생성 중이므로 개행으로 끝난 줄만 비교
+            seen = set()
+            for line in text.split("\n")[:-1]:
+                line = line.strip()
+                if not line:
+                    continue
+                if line in seen:
+                    return True
+                seen.add(line)
+        return False
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        return torch.tensor([self._should_stop(text) for text in texts], dtype=torch.bool, device=input_ids.device)
+
+
+def truncate_at_stop_sequences(text: str, stop_sequences: List[str]) -> str:
+    """생성 텍스트를 가장 먼저 등장하는 stop sequence 앞에서 자릅니다."""
+    cut = len(text)
+    for seq in stop_sequences:
+        idx = text.find(seq)
+        if idx != -1:
+            cut = min(cut, idx)
+    return text[:cut]
+
+
+def compute_token_budget(input_token_count: int, config: DiaryGenerationConfig) -> int:
+    """입력 길이에 비례하는 max_new_tokens를 계산합니다 (최소/최대값으로 제한)."""
+    budget = int(config.MIN_NEW_TOKENS + input_token_count * config.NEW_TOKENS_PER_INPUT_TOKEN)
+    return max(config.MIN_NEW_TOKENS, min(budget, config.SAMPLING_PARAMS["max_new_tokens"]))
+
+
+class CancellationCriteria(StoppingCriteria):
+    """cancel_event가 설정되면 (작업 취소 요청) 다음 스텝에서 생성을 멈춥니다."""
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class TokenBudgetCriteria(StoppingCriteria):
+    """배치 생성에서 행마다 다른 토큰 예산을 적용합니다 (배치의 max_new_tokens는 가장 큰 예산)."""
+    def __init__(self, prompt_length: int, budgets: List[int]):
+        self.prompt_length = prompt_length
+        self.budgets = torch.tensor(budgets)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return (input_ids.shape[1] - self.prompt_length) >= self.budgets.to(input_ids.device)
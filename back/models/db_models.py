@@ -22,6 +22,8 @@ class Diary(BaseModel):
     emotion_vector: Optional[List[float]] = None
     reward_total: Optional[float] = None
     reward_breakdown: Optional[Dict[str, float]] = None
+    generated_text: Optional[str] = None  # LoRA 생성 결과 (persist_result 요청 시 저장)
+    generated_cache_key: Optional[str] = None  # generated_text를 만든 (원문 해시, 어댑터 버전, 샘플링 설정) 키
     created_at: datetime
 
 # Cards 테이블 (새로운 DB 스키마에 맞게 수정)
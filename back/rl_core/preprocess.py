@@ -1,43 +1,173 @@
 # back/rl_core/preprocess.py
 
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 
-# 이 파일은 현재 rl_env.py의 _get_state_vector 내부에 통합되어 있습니다.
-# 하지만 나중에 전처리 로직이 복잡해지면 _get_state_vector 내부에서 이 모듈의 함수들을 호출하도록 분리할 수 있습니다.
+# 카드/사용자 특징 전처리
+# 카드 특징은 CardFeatureEncoder가 계산해 (카드 ID, 특징에 쓰는 필드의 해시)를 키로 인코더 안에 캐시하고,
+# RLEnvironment / VectorizedRLEnvironment는 상태를 만들 때 이 배열을 복사만 합니다.
+# 요청마다 카드를 다시 조회해도 내용이 같으면 캐시를 재사용하도록 get_card_encoder()의 공유 인스턴스를 씁니다.
+# RLConfig.NUM_CARD_FEATURES(와 STATE_DIM)는 CardFeatureEncoder.FEATURE_DIM에서 정해집니다.
 
-# 예시: 특정 카드 특징을 벡터화하는 함수 (현재는 rl_env.py에 통합되어 있음)
-def vectorize_card_features(card_data: Dict[str, Any]) -> List[float]:
+CARD_FEATURE_FIELDS = ('image_url', 'content', 'source_type', 'category', 'layout_type', 'text_final', 'emotion_scores')
+
+
+class CardFeatureEncoder:
+    """
+    카드 하나를 고정 길이 특징 벡터로 변환합니다.
+    "full":
+        has_image, has_content (2)
+        + source_type 원-핫 (SOURCE_TYPES + 기타)
+        + category 원-핫 (CATEGORIES + 기타)
+        + layout_type 원-핫 (LAYOUT_TYPES + 기타, 없으면 모두 0)
+        + 텍스트 길이 구간 원-핫 (TEXT_LENGTH_BOUNDS 기준, text_final이 없으면 content 길이)
+        + 감정 점수 (valence, arousal; card['emotion_scores']가 없으면 0)
+    "basic" (기본): has_image, has_content만 사용 (STATE_DIM=40, 배포된 best_model.pth와 같은 입력)
+    "full" 모델은 입력 차원이 다르므로 체크포인트 파일을 따로 씁니다 (checkpoint_name 참고).
+    """
+    SOURCE_TYPES = ("widget", "image", "text", "chrome")
+    CATEGORIES = ("weather", "quote", "book", "photo", "memo", "news", "culture", "scrap")
+    LAYOUT_TYPES = ("text", "image", "quote", "combo")
+    TEXT_LENGTH_BOUNDS = (1, 40, 120, 300) # 구간: 없음, 1~39, 40~119, 120~299, 300 이상
+    EMOTION_KEYS = ("valence", "arousal")
+
+    FEATURE_DIMS = {
+        "basic": 2,
+        "full": 2
+                + len(SOURCE_TYPES) + 1
+                + len(CATEGORIES) + 1
+                + len(LAYOUT_TYPES) + 1
+                + len(TEXT_LENGTH_BOUNDS) + 1
+                + len(EMOTION_KEYS),
+    }
+    # "full"로 학습한 모델이 준비될 때까지는 "basic" 유지
+    FEATURE_SET = os.getenv("RL_CARD_FEATURES", "basic")
+    FEATURE_DIM = FEATURE_DIMS.get(FEATURE_SET, FEATURE_DIMS["basic"]) # RLConfig.NUM_CARD_FEATURES
+
+    CACHE_SIZE = int(os.getenv("RL_CARD_FEATURE_CACHE_SIZE", "16384"))
+
+    def __init__(self, feature_set: Optional[str] = None, cache_size: Optional[int] = None):
+        self.feature_set = feature_set or self.FEATURE_SET
+        if self.feature_set not in self.FEATURE_DIMS:
+            raise ValueError(f"알 수 없는 카드 특징 구성: {self.feature_set}")
+        self.feature_dim = self.FEATURE_DIMS[self.feature_set]
+        self.cache_size = self.CACHE_SIZE if cache_size is None else cache_size
+        self._cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._source_index = {name: i for i, name in enumerate(self.SOURCE_TYPES)}
+        self._category_index = {name: i for i, name in enumerate(self.CATEGORIES)}
+        self._layout_index = {name: i for i, name in enumerate(self.LAYOUT_TYPES)}
+
+    @classmethod
+    def checkpoint_name(cls, stem: str) -> str:
+        """특징 구성별 체크포인트 파일 이름 ("basic"은 기존 이름 그대로, 예: best_model.pth / best_model_full.pth)."""
+        return f"{stem}.pth" if cls.FEATURE_SET == "basic" else f"{stem}_{cls.FEATURE_SET}.pth"
+
+    def _one_hot(self, features: np.ndarray, offset: int, index: Dict[str, int], value: Optional[str], allow_empty: bool) -> int:
+        """offset부터 len(index) + 1칸에 원-핫을 기록하고 다음 offset을 반환합니다 (목록에 없으면 마지막 '기타' 칸)."""
+        if value or not allow_empty:
+            features[offset + index.get((value or "").lower(), len(index))] = 1.0
+        return offset + len(index) + 1
+
+    @staticmethod
+    def _cache_key(card: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """(카드 ID, 특징 필드 해시). ID가 없는 카드(예: 레이아웃 위치 dict)는 캐시하지 않습니다."""
+        card_id = card.get('id')
+        if card_id is None:
+            return None
+        fields = json.dumps([card.get(field) for field in CARD_FEATURE_FIELDS], ensure_ascii=False, sort_keys=True, default=str)
+        return str(card_id), hashlib.sha1(fields.encode('utf-8')).hexdigest()
+
+    def encode(self, card: Dict[str, Any]) -> np.ndarray:
+        """카드 하나의 특징 벡터 (feature_dim,) (읽기 전용 배열). 같은 ID/내용의 카드는 캐시된 배열을 반환합니다."""
+        key = self._cache_key(card)
+        if key is not None:
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached
+                self.misses += 1
+
+        features = self._compute(card)
+        features.flags.writeable = False
+        if key is not None and self.cache_size > 0:
+            with self._cache_lock:
+                self._cache[key] = features
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return features
+
+    def _compute(self, card: Dict[str, Any]) -> np.ndarray:
+        features = np.zeros(self.feature_dim, dtype=np.float32)
+        features[0] = 1.0 if card.get('image_url') else 0.0
+        features[1] = 1.0 if card.get('content') else 0.0
+        if self.feature_set == "full":
+            offset = 2
+            offset = self._one_hot(features, offset, self._source_index, card.get('source_type'), allow_empty=False)
+            offset = self._one_hot(features, offset, self._category_index, card.get('category'), allow_empty=False)
+            offset = self._one_hot(features, offset, self._layout_index, card.get('layout_type'), allow_empty=True)
+
+            text = card.get('text_final') or card.get('content') or ""
+            features[offset + int(np.searchsorted(self.TEXT_LENGTH_BOUNDS, len(text), side='right'))] = 1.0
+            offset += len(self.TEXT_LENGTH_BOUNDS) + 1
+
+            emotion = card.get('emotion_scores')
+            if isinstance(emotion, dict):
+                emotion = [emotion.get(key, 0.0) for key in self.EMOTION_KEYS]
+            if emotion:
+                features[offset:offset + len(self.EMOTION_KEYS)] = np.asarray(emotion, dtype=np.float32)[:len(self.EMOTION_KEYS)]
+        return features
+
+    def cache_stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            return {"size": len(self._cache), "max_size": self.cache_size, "hits": self.hits, "misses": self.misses}
+
+    def encode_cards(self, selected_cards_data: List[Dict[str, Any]], max_cards: int) -> np.ndarray:
+        """카드 리스트를 (max_cards, feature_dim) 배열로 변환합니다 (넘치는 카드는 자르고, 빈 자리는 0)."""
+        features = np.zeros((max_cards, self.feature_dim), dtype=np.float32)
+        for i, card in enumerate(selected_cards_data[:max_cards]):
+            features[i] = self.encode(card)
+        return features
+
+
+_shared_encoders: Dict[str, CardFeatureEncoder] = {}
+_shared_encoders_lock = threading.Lock()
+
+def get_card_encoder(feature_set: Optional[str] = None) -> CardFeatureEncoder:
+    """특징 구성별 공유 인코더 (프로세스 안의 모든 환경/요청이 같은 캐시를 사용)."""
+    feature_set = feature_set or CardFeatureEncoder.FEATURE_SET
+    with _shared_encoders_lock:
+        if feature_set not in _shared_encoders:
+            _shared_encoders[feature_set] = CardFeatureEncoder(feature_set)
+        return _shared_encoders[feature_set]
+
+
+def vectorize_card_features(card_data: Dict[str, Any], encoder: Optional[CardFeatureEncoder] = None) -> List[float]:
     """
     단일 카드의 특징을 수치형 벡터로 변환합니다.
     """
-    has_image = 1.0 if card_data.get('image_url') else 0.0
-    has_content = 1.0 if card_data.get('content') else 0.0
-    # TODO: 카테고리 (source, category)를 원-핫 인코딩 등 추가 가능
-    return [has_image, has_content]
+    return (encoder or get_card_encoder()).encode(card_data).tolist()
 
 def get_padded_card_features_vector(
-    selected_cards_data: List[Dict[str, Any]], 
-    max_cards_in_layout: int, 
-    num_card_features: int
+    selected_cards_data: List[Dict[str, Any]],
+    max_cards_in_layout: int,
+    encoder: Optional[CardFeatureEncoder] = None
 ) -> np.ndarray:
     """
     선택된 모든 카드의 특징 벡터를 생성하고, 최대 카드 개수에 맞춰 패딩 또는 트렁케이션합니다.
     """
-    card_features_list = [vectorize_card_features(card) for card in selected_cards_data]
-    flat_card_features = np.array(card_features_list).flatten()
-    
-    expected_dim = max_cards_in_layout * num_card_features
-    if len(flat_card_features) < expected_dim:
-        padded_features = np.pad(flat_card_features, (0, expected_dim - len(flat_card_features)), 'constant')
-    elif len(flat_card_features) > expected_dim:
-        padded_features = flat_card_features[:expected_dim]
-    else:
-        padded_features = flat_card_features
-    
-    return padded_features
-
-# 예시: 사용자 프로필 특징을 벡터화하는 함수 (현재는 rl_env.py에 통합되어 있음)
+    return (encoder or get_card_encoder()).encode_cards(selected_cards_data, max_cards_in_layout).flatten()
+
+# 사용자 프로필 특징을 벡터화하는 함수 (VectorizedRLEnvironment.encode_user와 같은 값)
 def vectorize_user_profile(user_profile_data: Dict[str, Any]) -> np.ndarray:
     """
     사용자 프로필 데이터를 수치형 벡터로 변환합니다.
@@ -47,6 +177,3 @@ def vectorize_user_profile(user_profile_data: Dict[str, Any]) -> np.ndarray:
         user_profile_data.get('total_diaries', 1.0) / 100.0
     ])
     return user_features
-
-# 참고: 현재 rl_env.py의 _get_state_vector는 이 함수들의 로직을 직접 포함하고 있습니다.
-# 나중에 전처리 로직이 복잡해지면, rl_env.py에서 위 함수들을 호출하도록 리팩토링할 수 있습니다.
\ No newline at end of file
@@ -0,0 +1,449 @@
+# back/rl_core/replay_buffer.py
+# 레이아웃 경험 저장소 (디스크에 남는 append-only 리플레이 버퍼)
+# 추천한 레이아웃마다 스텝별 (상태, 행동, 유효 행동 마스크, 로그 확률, 가치)를 기록해 두었다가
+# 피드백이 오면 최종 보상과 함께 memmap 배열에 이어 씁니다.
+# 학습(train_script.py --source replay)은 DB 로그를 다시 조회/시뮬레이션하지 않고 이 배열에서 샘플링합니다.
+#
+# 디렉토리 구조:
+#   <root>/segment-00000/          트랜지션 SEGMENT_SIZE개 분량의 .npy (np.lib.format.open_memmap)
+#       states.npy (S, STATE_DIM) float32, actions.npy (S,) int16, masks.npy (S, ACTION_SPACE_SIZE) bool,
+#       log_probs.npy / values.npy / rewards.npy (S,) float32, dones.npy (S,) bool,
+#       episodes.npy (S,) EPISODE_DTYPE (에피소드별 시작 위치, 길이, 최종 보상, 기록 시각, 우선순위)
+#       segment.json               실제로 기록된 트랜지션/에피소드 수 (배열을 쓴 뒤 원자적으로 교체)
+#   <root>/.lock                   프로세스 간 파일 잠금 (fcntl.flock)
+#   <root>/pending/                피드백 대기 중인 스텝 배열 (PendingEpisodes를 디스크에 둘 때, diary_id별 .npz)
+# 에피소드는 세그먼트를 넘어가지 않으며, 세그먼트가 MAX_SEGMENTS개를 넘으면 가장 오래된 것부터 삭제합니다.
+#
+# 여러 uvicorn 워커가 같은 디렉토리를 열어도 되도록, 기록/우선순위 갱신/샘플링은 .lock 파일 잠금 안에서
+# 디스크의 segment.json을 다시 읽은 뒤 수행하고, 기록할 때마다 segment.json을 갱신합니다.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 동작 (단일 프로세스에서만 사용)
+    fcntl = None
+
+SEGMENT_META_FILE = "segment.json"
+LOCK_FILE = ".lock"
+EPISODE_DTYPE = np.dtype([
+    ("start", np.int32),
+    ("length", np.int16),
+    ("final_reward", np.float32),
+    ("created_at", np.float64),
+    ("priority", np.float32),
+])
+PRIORITY_EPS = 1e-3  # 우선순위가 0인 에피소드도 뽑힐 수 있도록
+
+
+class _Segment:
+    """트랜지션 배열 묶음 하나 (memmap)."""
+    def __init__(self, path: str, capacity: int, state_dim: int, action_dim: int, create: bool):
+        self.path = path
+        mode = "w+" if create else "r+"
+        if create:
+            os.makedirs(path, exist_ok=True)
+        shapes = {
+            "states": ((capacity, state_dim), np.float32),
+            "actions": ((capacity,), np.int16),
+            "masks": ((capacity, action_dim), np.bool_),
+            "log_probs": ((capacity,), np.float32),
+            "values": ((capacity,), np.float32),
+            "rewards": ((capacity,), np.float32),
+            "dones": ((capacity,), np.bool_),
+            "episodes": ((capacity,), EPISODE_DTYPE),
+        }
+        self.arrays: Dict[str, np.memmap] = {
+            name: np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode=mode, dtype=dtype, shape=shape)
+            if create else np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode=mode)
+            for name, (shape, dtype) in shapes.items()
+        }
+        self.capacity = self.arrays["actions"].shape[0]
+        self.num_transitions = 0
+        self.num_episodes = 0
+        if not create:
+            self.read_meta()
+
+    def read_meta(self):
+        with open(os.path.join(self.path, SEGMENT_META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.num_transitions = meta["transitions"]
+        self.num_episodes = meta["episodes"]
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+        self.write_meta()
+
+    def write_meta(self):
+        tmp_path = os.path.join(self.path, f"{SEGMENT_META_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"transitions": self.num_transitions, "episodes": self.num_episodes}, f)
+        os.replace(tmp_path, os.path.join(self.path, SEGMENT_META_FILE))
+
+
+class ReplayBuffer:
+    """
+    에피소드 단위로 쓰고 에피소드 단위로 샘플링하는 디스크 리플레이 버퍼.
+    - append_episode(): 한 레이아웃의 스텝별 배열 + 최종 보상을 이어 씀
+      (segment.json은 매번 갱신, 배열 msync는 flush_every개마다)
+    - sample_episodes(): "uniform", "prioritized"(우선순위^alpha 비례, 중요도 가중치 반환), "recency"(반감기 기준 지수 가중)
+    - update_priorities(): 학습 후 에피소드별 |advantage| 평균 등으로 우선순위 갱신
+    새 에피소드의 우선순위는 지금까지의 최대 우선순위로 시작해 적어도 한 번은 뽑히도록 합니다.
+    같은 root를 여러 프로세스가 열어도 안전합니다 (스레드 간에는 threading.Lock, 프로세스 간에는 .lock 파일 잠금).
+    """
+    def __init__(self,
+                 root: str,
+                 state_dim: int,
+                 action_dim: int,
+                 segment_size: int = 65536,
+                 max_segments: int = 32,
+                 flush_every: int = 64):
+        self.root = root
+        self.state_dim = state_dim
+        self.action_dim = action_dim
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._segments: "OrderedDict[int, _Segment]" = OrderedDict()
+        self._unflushed = 0
+        self._skipped: set = set()  # 차원이 달라 쓰지 않는 세그먼트 (매번 다시 열지 않도록)
+        self.max_priority = 1.0
+
+        os.makedirs(root, exist_ok=True)
+        self._lock_file = open(os.path.join(root, LOCK_FILE), "a+")
+        with self._file_lock(shared=True):
+            self._refresh()
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """프로세스 간 잠금. 기록은 배타적(LOCK_EX), 샘플링/통계는 공유(LOCK_SH)."""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """
+        디스크의 세그먼트 목록과 segment.json을 다시 읽어 다른 프로세스가 기록/삭제한 내용을 반영합니다.
+        파일 잠금 안에서 호출해야 합니다.
+        """
+        on_disk = {}
+        for name in os.listdir(self.root):
+            if name.startswith("segment-") and name not in self._skipped:
+                on_disk[int(name.split("-")[1])] = name
+        segments: "OrderedDict[int, _Segment]" = OrderedDict()
+        for segment_id in sorted(on_disk):
+            name = on_disk[segment_id]
+            segment = self._segments.get(segment_id)
+            try:
+                if segment is None:
+                    segment = _Segment(os.path.join(self.root, name), self.segment_size, self.state_dim, self.action_dim, create=False)
+                    if segment.arrays["states"].shape[1] != self.state_dim or segment.arrays["masks"].shape[1] != self.action_dim:
+                        print(f"⚠️ 상태/행동 차원이 다른 리플레이 세그먼트, 건너뜀: {name}")
+                        self._skipped.add(name)
+                        continue
+                    if segment.num_episodes:
+                        self.max_priority = max(self.max_priority, float(segment.arrays["episodes"]["priority"][:segment.num_episodes].max()))
+                else:
+                    segment.read_meta()
+            except (FileNotFoundError, ValueError, json.JSONDecodeError) as e:
+                print(f"⚠️ 리플레이 세그먼트 로드 실패, 건너뜀: {name} ({e})")
+                continue
+            segments[segment_id] = segment
+        self._segments = segments
+
+    def __len__(self) -> int:
+        with self._lock, self._file_lock(shared=True):
+            self._refresh()
+            return sum(segment.num_transitions for segment in self._segments.values())
+
+    @property
+    def num_episodes(self) -> int:
+        with self._lock, self._file_lock(shared=True):
+            self._refresh()
+            return sum(segment.num_episodes for segment in self._segments.values())
+
+    def _writable_segment(self, length: int) -> _Segment:
+        if self._segments:
+            segment_id, segment = next(reversed(self._segments.items()))
+            if segment.num_transitions + length <= segment.capacity:
+                return segment
+            segment.flush()
+            segment_id += 1
+        else:
+            segment_id = 0
+        segment = _Segment(os.path.join(self.root, f"segment-{segment_id:05d}"),
+                           self.segment_size, self.state_dim, self.action_dim, create=True)
+        segment.flush()
+        self._segments[segment_id] = segment
+        while len(self._segments) > self.max_segments:
+            _, oldest = self._segments.popitem(last=False)
+            shutil.rmtree(oldest.path, ignore_errors=True)
+        return segment
+
+    def append_episode(self,
+                       states: np.ndarray,
+                       actions: np.ndarray,
+                       masks: np.ndarray,
+                       log_probs: np.ndarray,
+                       values: np.ndarray,
+                       final_reward: float,
+                       rewards: Optional[np.ndarray] = None) -> Tuple[int, int]:
+        """
+        에피소드 하나를 기록합니다.
+        Args:
+            states, actions, masks, log_probs, values: 스텝별 배열 (행 수 = 스텝 수).
+            final_reward (float): 피드백으로 계산한 최종 보상.
+            rewards (np.ndarray, optional): 스텝별 보상. 없으면 마지막 스텝에만 final_reward.
+        Returns:
+            Tuple[int, int]: (세그먼트 번호, 세그먼트 안의 에피소드 번호) — update_priorities의 키.
+        """
+        length = len(actions)
+        if length == 0:
+            raise ValueError("스텝이 없는 에피소드는 기록할 수 없습니다.")
+        if length > self.segment_size:
+            raise ValueError(f"에피소드 길이({length})가 세그먼트 크기({self.segment_size})보다 깁니다.")
+        if rewards is None:
+            rewards = np.zeros(length, dtype=np.float32)
+            rewards[-1] = final_reward
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            segment = self._writable_segment(length)
+            start, end = segment.num_transitions, segment.num_transitions + length
+            arrays = segment.arrays
+            arrays["states"][start:end] = states
+            arrays["actions"][start:end] = actions
+            arrays["masks"][start:end] = masks
+            arrays["log_probs"][start:end] = log_probs
+            arrays["values"][start:end] = values
+            arrays["rewards"][start:end] = rewards
+            arrays["dones"][start:end] = False
+            arrays["dones"][end - 1] = True
+            arrays["episodes"][segment.num_episodes] = (start, length, final_reward, time.time(), self.max_priority)
+            key = (next(reversed(self._segments)), segment.num_episodes)
+            segment.num_transitions = end
+            segment.num_episodes += 1
+
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                segment.flush()
+                self._unflushed = 0
+            else:
+                segment.write_meta()  # 다른 프로세스가 다음 위치부터 이어 쓰도록 개수는 바로 반영
+        return key
+
+    def flush(self):
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self._segments:
+                next(reversed(self._segments.values())).flush()
+            self._unflushed = 0
+
+    def _episode_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """모든 세그먼트의 에피소드 정보를 이어 붙인 배열과 (세그먼트 번호, 에피소드 번호) 키 배열."""
+        tables, keys = [], []
+        for segment_id, segment in self._segments.items():
+            n = segment.num_episodes
+            tables.append(np.array(segment.arrays["episodes"][:n]))
+            keys.append(np.stack([np.full(n, segment_id), np.arange(n)], axis=1))
+        if not tables:
+            return np.zeros(0, dtype=EPISODE_DTYPE), np.zeros((0, 2), dtype=np.int64)
+        return np.concatenate(tables), np.concatenate(keys)
+
+    def sample_episodes(self,
+                        num_episodes: int,
+                        strategy: str = "uniform",
+                        alpha: float = 0.6,
+                        beta: float = 0.4,
+                        half_life_sec: float = 14 * 24 * 3600,
+                        rng: Optional[np.random.Generator] = None) -> Dict[str, Any]:
+        """
+        에피소드를 뽑아 트랜지션 배열로 이어 붙여 반환합니다 (에피소드 안의 스텝 순서 유지, 중복 추출 없음).
+        Args:
+            num_episodes (int): 뽑을 에피소드 수 (저장된 수보다 많으면 전체).
+            strategy (str): "uniform", "prioritized", "recency".
+            alpha (float): prioritized에서 우선순위 지수 (0이면 균등).
+            beta (float): prioritized 중요도 가중치 지수 (1이면 완전 보정).
+            half_life_sec (float): recency에서 가중치가 절반이 되는 경과 시간.
+        Returns:
+            Dict[str, Any]: states, actions, masks, log_probs, values, rewards, dones (트랜지션 단위),
+                episode_lengths, keys (에피소드 단위), weights (트랜지션 단위, 최댓값 1로 정규화).
+        """
+        if strategy not in ("uniform", "prioritized", "recency"):
+            raise ValueError(f"알 수 없는 샘플링 방식: {strategy}")
+        rng = rng or np.random.default_rng()
+        with self._lock, self._file_lock(shared=True):
+            self._refresh()
+            table, keys = self._episode_table()
+            total = len(table)
+            num_episodes = min(num_episodes, total)
+            if num_episodes == 0:
+                return self._empty_sample()
+
+            if strategy == "prioritized":
+                scaled = (table["priority"].astype(np.float64) + PRIORITY_EPS) ** alpha
+                probs = scaled / scaled.sum()
+            elif strategy == "recency":
+                age = np.maximum(time.time() - table["created_at"], 0.0)
+                scaled = 0.5 ** (age / half_life_sec)
+                probs = scaled / scaled.sum()
+            else:
+                probs = np.full(total, 1.0 / total)
+            # 세그먼트별로 모아 한 번의 fancy indexing으로 읽도록 키 순서로 정렬
+            picked = np.sort(rng.choice(total, size=num_episodes, replace=False, p=probs))
+
+            lengths = table["length"][picked].astype(np.int64)
+            starts = table["start"][picked].astype(np.int64)
+            batch = {name: [] for name in ("states", "actions", "masks", "log_probs", "values", "rewards", "dones")}
+            for segment_id in np.unique(keys[picked, 0]):
+                in_segment = keys[picked, 0] == segment_id
+                seg_lengths = lengths[in_segment]
+                # 에피소드별 [start, start + length) 구간을 이어 붙인 트랜지션 인덱스
+                offsets = np.arange(seg_lengths.sum()) - np.repeat(np.cumsum(seg_lengths) - seg_lengths, seg_lengths)
+                rows = np.repeat(starts[in_segment], seg_lengths) + offsets
+                arrays = self._segments[int(segment_id)].arrays
+                for name in batch:
+                    batch[name].append(arrays[name][rows])
+            sample = {name: np.concatenate(parts) for name, parts in batch.items()}
+
+        if strategy == "prioritized":
+            episode_weights = (total * probs[picked]) ** (-beta)
+            episode_weights /= episode_weights.max()
+        else:
+            episode_weights = np.ones(num_episodes)
+        sample.update({
+            "episode_lengths": lengths,
+            "keys": keys[picked],
+            "weights": np.repeat(episode_weights, lengths).astype(np.float32),
+        })
+        return sample
+
+    def _empty_sample(self) -> Dict[str, Any]:
+        return {
+            "states": np.zeros((0, self.state_dim), dtype=np.float32),
+            "actions": np.zeros(0, dtype=np.int16),
+            "masks": np.zeros((0, self.action_dim), dtype=np.bool_),
+            "log_probs": np.zeros(0, dtype=np.float32),
+            "values": np.zeros(0, dtype=np.float32),
+            "rewards": np.zeros(0, dtype=np.float32),
+            "dones": np.zeros(0, dtype=np.bool_),
+            "episode_lengths": np.zeros(0, dtype=np.int64),
+            "keys": np.zeros((0, 2), dtype=np.int64),
+            "weights": np.zeros(0, dtype=np.float32),
+        }
+
+    def update_priorities(self, keys: np.ndarray, priorities: np.ndarray):
+        """sample_episodes가 반환한 keys 순서대로 에피소드 우선순위를 갱신합니다 (삭제된 세그먼트는 무시)."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            for (segment_id, episode_idx), priority in zip(np.asarray(keys).tolist(), np.asarray(priorities).tolist()):
+                segment = self._segments.get(segment_id)
+                if segment is not None and episode_idx < segment.num_episodes:
+                    segment.arrays["episodes"][episode_idx]["priority"] = priority
+                    self.max_priority = max(self.max_priority, priority)
+            for segment in self._segments.values():
+                segment.arrays["episodes"].flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock, self._file_lock(shared=True):
+            self._refresh()
+            return {
+                "segments": len(self._segments),
+                "episodes": sum(segment.num_episodes for segment in self._segments.values()),
+                "transitions": sum(segment.num_transitions for segment in self._segments.values()),
+                "max_priority": round(self.max_priority, 4),
+            }
+
+
+class PendingEpisodes:
+    """
+    추천은 했지만 아직 피드백이 오지 않은 레이아웃의 스텝 배열을 diary_id별로 보관합니다 (LRU + TTL).
+    피드백이 오면 pop()으로 꺼내 최종 보상과 함께 ReplayBuffer에 기록합니다.
+    root가 주어지면 메모리 대신 root/<diary_id 해시>.npz로 보관해, 추천과 피드백을 서로 다른 워커 프로세스가
+    처리해도 꺼낼 수 있습니다 (pop은 파일 이름을 바꿔 선점하므로 한 프로세스만 꺼냄).
+    """
+    def __init__(self, max_size: int = 4096, ttl_sec: float = 24 * 3600, root: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self.root = root
+        self._items: "OrderedDict[str, Tuple[float, Dict[str, np.ndarray]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, diary_id: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(diary_id.encode("utf-8")).hexdigest() + ".npz")
+
+    def _prune(self):
+        """오래된 파일부터 지워 max_size개 이하로 유지합니다."""
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".npz"):
+                try:
+                    entries.append((os.path.getmtime(os.path.join(self.root, name)), name))
+                except FileNotFoundError:
+                    continue
+        for _, name in sorted(entries)[:max(0, len(entries) - self.max_size)]:
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+    def put(self, diary_id: str, trajectory: Dict[str, np.ndarray]):
+        if self.root is not None:
+            path = self._path(diary_id)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **trajectory)
+            os.replace(tmp_path, path)
+            self._prune()
+            return
+        with self._lock:
+            self._items[diary_id] = (time.monotonic(), trajectory)
+            self._items.move_to_end(diary_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def pop(self, diary_id: str) -> Optional[Dict[str, np.ndarray]]:
+        if self.root is not None:
+            path = self._path(diary_id)
+            claimed = f"{path}.{os.getpid()}.{threading.get_ident()}.claimed"
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                return None
+            try:
+                if time.time() - os.path.getmtime(claimed) > self.ttl_sec:
+                    return None
+                with np.load(claimed) as data:
+                    return {name: data[name] for name in data.files}
+            finally:
+                os.remove(claimed)
+        with self._lock:
+            item = self._items.pop(diary_id, None)
+        if item is None or time.monotonic() - item[0] > self.ttl_sec:
+            return None
+        return item[1]
+
+    def __len__(self) -> int:
+        if self.root is not None:
+            return sum(1 for name in os.listdir(self.root) if name.endswith(".npz"))
+        with self._lock:
+            return len(self._items)
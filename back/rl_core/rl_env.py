@@ -4,6 +4,7 @@ import numpy as np
 from typing import List, Dict, Any, Tuple, Optional
 import math # 올림 연산을 위해 import
 import torch # torch.Tensor 타입을 위해 임포트 (PPOModel과 연동)
+from rl_core.preprocess import CardFeatureEncoder, get_card_encoder
 
 class RLConfig:
     """강화학습 환경의 설정을 정의하는 클래스"""
@@ -19,9 +20,10 @@ class RLConfig:
     # 상태 벡터 차원 관련 설정
     MAX_CARDS_IN_LAYOUT = MAX_ROWS * MAX_COLS # 레이아웃에 들어갈 수 있는 최대 카드 개수 (최대 12개)
 
-    # 카드 특징 정의
-    # 현재: has_image(1), has_content(1)
-    NUM_CARD_FEATURES = 2 
+    # 카드 특징 정의 (rl_core/preprocess.py의 CardFeatureEncoder 참고)
+    # 기본(RL_CARD_FEATURES=basic): has_image(1), has_content(1)
+    # RL_CARD_FEATURES=full: + source_type/category/layout_type 원-핫, 텍스트 길이 구간, 감정 점수
+    NUM_CARD_FEATURES = CardFeatureEncoder.FEATURE_DIM
 
     # 사용자 특징 정의
     # 현재: average_satisfaction(1), total_diaries(1)
@@ -53,6 +55,9 @@ class RLEnvironment:
         self.user_profile_data: Dict[str, Any] = {}
         self.grid_state: np.ndarray = np.zeros((self.config.MAX_ROWS, self.config.MAX_COLS), dtype=np.int32) # 그리드 점유 상태 (0: 비어있음, 1: 점유됨)
         self.current_card_index_to_place: int = 0 # 현재 배치하려는 카드 인덱스 (selected_cards_data 리스트 내 인덱스)
+        self.card_encoder = get_card_encoder()
+        self.user_features: np.ndarray = np.zeros(self.config.NUM_USER_FEATURES, dtype=np.float32)
+        self.card_features_flat: np.ndarray = np.zeros(self.config.MAX_CARDS_IN_LAYOUT * self.config.NUM_CARD_FEATURES, dtype=np.float32)
 
     def reset(self, 
               user_id: str, 
@@ -77,6 +82,10 @@ class RLEnvironment:
         self.grid_state = np.zeros((self.config.MAX_ROWS, self.config.MAX_COLS), dtype=np.int32) # 그리드 점유 상태 초기화 (모두 비어있음)
         self.current_card_index_to_place = 0 # 첫 번째 카드부터 배치 시작
 
+        # 에피소드 동안 바뀌지 않는 사용자/카드 특징은 여기서 한 번만 계산 (카드 특징은 공유 인코더에 캐시되어 재사용)
+        self.user_features = VectorizedRLEnvironment.encode_user(self.user_profile_data)
+        self.card_features_flat = self.card_encoder.encode_cards(self.selected_cards_data, self.config.MAX_CARDS_IN_LAYOUT).flatten()
+
         # print(f"RLEnvironment reset for user {user_id} with {self.num_selected_cards} cards.")
         return self._get_state_vector()
 
@@ -85,11 +94,8 @@ class RLEnvironment:
         강화학습 모델의 입력으로 사용될 상태 벡터를 생성합니다.
         사용자 프로필 데이터, 현재 배치하려는 카드 인덱스, 선택된 카드 데이터, 현재 그리드 상태를 활용합니다.
         """
-        # 1. 사용자 특징
-        user_features = np.array([
-            self.user_profile_data.get('average_satisfaction', 0.5), 
-            self.user_profile_data.get('total_diaries', 1.0) / 100.0 # 스케일링 (최대 100개 일기 가정)
-        ])
+        # 1. 사용자 특징 (reset에서 계산)
+        user_features = self.user_features
         
         # 2. 현재 배치하려는 카드 인덱스 (정규화)
         current_card_idx_feature = np.array([self.current_card_index_to_place / self.config.MAX_CARDS_IN_LAYOUT])
@@ -97,26 +103,8 @@ class RLEnvironment:
         # 3. 선택된 카드 개수 (정규화)
         num_cards_feature = np.array([self.num_selected_cards / self.config.MAX_CARDS_IN_LAYOUT])
 
-        # 4. 각 카드의 특징 (패딩/트렁케이션 포함)
-        card_features_list = []
-        for card in self.selected_cards_data:
-            has_image = 1.0 if card.get('image_url') else 0.0
-            has_content = 1.0 if card.get('content') else 0.0
-            # TODO: 카테고리 (source_type, category) 원-핫 인코딩 등 더 많은 특징 추가 가능
-            card_features_list.append([has_image, has_content])
-        
-        # 선택된 카드 특징들을 하나의 벡터로 평탄화. MAX_CARDS_IN_LAYOUT에 맞춰 패딩/트렁케이션.
-        flat_card_features = np.array(card_features_list).flatten()
-        
-        expected_card_features_dim = self.config.MAX_CARDS_IN_LAYOUT * self.config.NUM_CARD_FEATURES
-        if len(flat_card_features) < expected_card_features_dim:
-            # 부족하면 0으로 패딩
-            card_features_padded = np.pad(flat_card_features, (0, expected_card_features_dim - len(flat_card_features)), 'constant')
-        elif len(flat_card_features) > expected_card_features_dim:
-            # 많으면 잘라냄
-            card_features_padded = flat_card_features[:expected_card_features_dim]
-        else:
-            card_features_padded = flat_card_features
+        # 4. 각 카드의 특징 (reset에서 MAX_CARDS_IN_LAYOUT에 맞춰 패딩/트렁케이션해 둔 배열)
+        card_features_padded = self.card_features_flat
 
         # 5. 그리드 상태 (어떤 칸이 점유되었는지)
         grid_flat = self.grid_state.flatten().astype(np.float32) # PPO 모델 입력을 위해 float32로 변환
@@ -242,4 +230,153 @@ class RLEnvironment:
             # 재생성 요청 (가장 부정적)
             return self.config.REWARD_REGENERATE
         else:
-            return 0.0  # 알 수 없는 피드백
\ No newline at end of file
+            return 0.0  # 알 수 없는 피드백
+
+class VectorizedRLEnvironment:
+    """
+    N개의 에피소드를 NumPy 배열로 한꺼번에 보관하고, 행동 배열 하나로 모두 진행시키는 환경 클래스.
+    RLEnvironment와 같은 상태 벡터/보상 규칙을 따르며, PPO 경험 수집처럼 많은 트랜지션이 필요할 때 사용합니다.
+    배열 구성:
+        grid_state:     (N, MAX_ROWS, MAX_COLS)                    그리드 점유 상태 (0: 비어있음, 1: 점유됨)
+        card_features:  (N, MAX_CARDS_IN_LAYOUT, NUM_CARD_FEATURES) 카드 특징 (카드가 없는 자리는 0)
+        user_features:  (N, NUM_USER_FEATURES)                     사용자 특징
+        num_cards:      (N,)                                       에피소드별 배치할 카드 수
+        current_card_index_to_place: (N,)                          에피소드별 현재 배치하려는 카드 인덱스
+        done:           (N,)                                       에피소드 종료 여부
+    """
+    def __init__(self, config: RLConfig, num_envs: int):
+        self.config = config
+        self.num_envs = num_envs
+        self.grid_state = np.zeros((num_envs, config.MAX_ROWS, config.MAX_COLS), dtype=np.int32)
+        self.card_features = np.zeros((num_envs, config.MAX_CARDS_IN_LAYOUT, config.NUM_CARD_FEATURES), dtype=np.float32)
+        self.user_features = np.zeros((num_envs, config.NUM_USER_FEATURES), dtype=np.float32)
+        self.num_cards = np.zeros(num_envs, dtype=np.int64)
+        self.current_card_index_to_place = np.zeros(num_envs, dtype=np.int64)
+        self.done = np.ones(num_envs, dtype=bool)
+
+    @staticmethod
+    def encode_cards(selected_cards_data: List[Dict[str, Any]], config: RLConfig) -> np.ndarray:
+        """카드 상세 데이터 리스트를 (MAX_CARDS_IN_LAYOUT, NUM_CARD_FEATURES) 배열로 변환합니다 (_get_state_vector와 같은 특징)."""
+        return get_card_encoder().encode_cards(selected_cards_data, config.MAX_CARDS_IN_LAYOUT)
+
+    @staticmethod
+    def encode_user(user_profile_data: Dict[str, Any]) -> np.ndarray:
+        return np.array([
+            user_profile_data.get('average_satisfaction', 0.5),
+            user_profile_data.get('total_diaries', 1.0) / 100.0
+        ], dtype=np.float32)
+
+    @staticmethod
+    def calculate_rewards(config: RLConfig,
+                          feedback: np.ndarray,
+                          layout_difference: np.ndarray,
+                          layout_reward: np.ndarray) -> np.ndarray:
+        """
+        RLEnvironment.calculate_reward(details에 layout_difference, layout_reward가 있는 경우)의 배열 버전.
+        Args:
+            feedback (np.ndarray): (N,) 0: save, 1: modify, 2: regenerate (그 외는 보상 0).
+            layout_difference (np.ndarray): (N,) 추천 레이아웃과 사용자 레이아웃의 차이.
+            layout_reward (np.ndarray): (N,) 프론트엔드가 계산한 레이아웃 보상.
+        """
+        feedback = np.asarray(feedback)
+        layout_difference = np.asarray(layout_difference, dtype=np.float32)
+        save_reward = np.where(layout_difference > 0, config.REWARD_SAVE + np.asarray(layout_reward, dtype=np.float32),
+                               config.REWARD_SAVE + 20)  # AI 추천을 그대로 사용하면 보너스
+        rewards = np.zeros(feedback.shape, dtype=np.float32)
+        rewards = np.where(feedback == 0, save_reward, rewards)
+        rewards = np.where(feedback == 1, config.REWARD_MODIFY - layout_difference * 10, rewards)
+        rewards = np.where(feedback == 2, config.REWARD_REGENERATE, rewards)
+        return rewards.astype(np.float32)
+
+    def reset(self,
+              card_features: np.ndarray,
+              num_cards: np.ndarray,
+              user_features: np.ndarray,
+              env_indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        지정한 에피소드들(기본: 전체)을 새 카드 셋으로 초기화하고 전체 상태 배열을 반환합니다.
+        Args:
+            card_features (np.ndarray): (M, MAX_CARDS_IN_LAYOUT, NUM_CARD_FEATURES) 카드 특징.
+            num_cards (np.ndarray): (M,) 에피소드별 카드 수.
+            user_features (np.ndarray): (M, NUM_USER_FEATURES) 사용자 특징.
+            env_indices (np.ndarray, optional): 초기화할 에피소드 인덱스 (M개). 없으면 0..N-1 전체.
+        Returns:
+            np.ndarray: (N, STATE_DIM) 상태 배열.
+        """
+        if env_indices is None:
+            env_indices = np.arange(self.num_envs)
+        self.grid_state[env_indices] = 0
+        self.card_features[env_indices] = card_features
+        self.user_features[env_indices] = user_features
+        self.num_cards[env_indices] = num_cards
+        self.current_card_index_to_place[env_indices] = 0
+        self.done[env_indices] = np.asarray(num_cards) == 0
+        return self.get_state_vectors()
+
+    def reset_from_data(self,
+                        episodes: List[Tuple[List[Dict[str, Any]], Dict[str, Any]]],
+                        env_indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """(선택된 카드 상세 데이터 리스트, 사용자 프로필) 쌍의 리스트로 초기화합니다."""
+        card_features = np.stack([self.encode_cards(cards, self.config) for cards, _ in episodes])
+        num_cards = np.array([len(cards) for cards, _ in episodes], dtype=np.int64)
+        user_features = np.stack([self.encode_user(profile) for _, profile in episodes])
+        return self.reset(card_features, num_cards, user_features, env_indices)
+
+    def get_state_vectors(self) -> np.ndarray:
+        """(N, STATE_DIM) 상태 배열. 각 행은 RLEnvironment._get_state_vector와 같은 순서로 구성됩니다."""
+        n = self.num_envs
+        max_cards = self.config.MAX_CARDS_IN_LAYOUT
+        return np.concatenate([
+            self.user_features,
+            (self.current_card_index_to_place / max_cards)[:, None],
+            (self.num_cards / max_cards)[:, None],
+            self.card_features.reshape(n, -1),
+            self.grid_state.reshape(n, -1)
+        ], axis=1).astype(np.float32)
+
+    def action_masks(self) -> np.ndarray:
+        """(N, ACTION_SPACE_SIZE) 유효한 행동(비어있는 셀) 마스크."""
+        return self.grid_state.reshape(self.num_envs, -1) == 0
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        모든 에피소드에 행동을 하나씩 적용합니다. 이미 끝난 에피소드는 그대로 두고 보상 0을 받습니다.
+        Args:
+            actions (np.ndarray): (N,) 에피소드별 그리드 셀 인덱스.
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+                - next_states: (N, STATE_DIM)
+                - rewards: (N,) 단일 스텝 보상
+                - dones: (N,) 에피소드 종료 여부
+                - info: placed_index(배치된 카드 인덱스, 배치하지 않았으면 -1), row, col, invalid
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        active = ~self.done
+        rows = actions // self.config.MAX_COLS
+        cols = actions % self.config.MAX_COLS
+
+        in_bounds = (actions >= 0) & (actions < self.config.ACTION_SPACE_SIZE)
+        env_idx = np.arange(self.num_envs)
+        occupied = np.zeros(self.num_envs, dtype=bool)
+        occupied[in_bounds] = self.grid_state[env_idx[in_bounds], rows[in_bounds], cols[in_bounds]] == 1
+        invalid = active & (~in_bounds | occupied)
+        valid = active & ~invalid
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        rewards[invalid] = self.config.REWARD_INVALID_ACTION
+
+        placed_index = np.where(valid, self.current_card_index_to_place, -1)
+        self.grid_state[env_idx[valid], rows[valid], cols[valid]] = 1
+        self.current_card_index_to_place[valid] += 1
+
+        finished = valid & (self.current_card_index_to_place >= self.num_cards)
+        rewards[finished] = 1.0  # 카드를 모두 배치한 스텝의 작은 긍정 보상 (RLEnvironment.step과 동일)
+        self.done |= invalid | finished
+
+        info = {
+            "placed_index": placed_index,
+            "row": np.where(valid, rows, -1),
+            "col": np.where(valid, cols, -1),
+            "invalid": invalid,
+        }
+        return self.get_state_vectors(), rewards, self.done.copy(), info
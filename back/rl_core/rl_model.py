@@ -5,8 +5,11 @@ import torch.nn as nn
 import torch.optim as optim
 from torch.distributions import Categorical # 이산 행동 공간을 위한 분포
 import numpy as np
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
 import os # 모델 저장 경로 관리를 위해 임포트
+import threading
+from collections import OrderedDict
+from rl_core.preprocess import CardFeatureEncoder
 
 class PPOConfig:
     """PPO 학습 관련 설정을 정의하는 클래스"""
@@ -17,16 +20,152 @@ class PPOConfig:
     BATCH_SIZE = 64 # 학습 배치 사이즈
     LEARNING_RATE = 3e-4 # 학습률
     ENTROPY_BETA = 0.01 # 엔트로피 항 가중치 (탐험 유도)
+    VALUE_COEF = 0.5 # 가치 손실 가중치
+    MAX_GRAD_NORM = 0.5 # 그래디언트 클리핑 기준
+    TARGET_KL = 0.03 # 한 epoch의 평균 KL이 이 값을 넘으면 남은 epoch 중단 (None이면 사용 안 함)
+
+    # 레이아웃 추론 설정
+    # "sample": 정책 분포에서 샘플링 (탐험), "greedy": 매 카드마다 argmax, "beam": 전체 레이아웃의 결합 로그 확률로 빔 서치
+    INFERENCE_MODE = os.getenv("RL_INFERENCE_MODE", "sample")
+    BEAM_WIDTH = 4
+    LAYOUT_CACHE_SIZE = 1024 # greedy/beam 결과 캐시 크기 (sample은 매번 달라야 하므로 캐시하지 않음)
+    USER_BUCKET_SIZE = 0.1 # 캐시 키를 만들 때 사용자 특징을 이 간격으로 양자화
+
+    # 경험 리플레이 버퍼 (rl_core/replay_buffer.py): 추천한 레이아웃의 스텝 데이터 + 피드백 보상을 디스크에 누적
+    # 여러 워커 프로세스가 같은 REPLAY_DIR을 공유 (기록은 파일 잠금, 피드백 대기 데이터는 REPLAY_DIR/pending)
+    REPLAY_ENABLED = os.getenv("RL_REPLAY", "1") == "1"
+    REPLAY_DIR = os.getenv("RL_REPLAY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay"))
+    REPLAY_SEGMENT_SIZE = 65536 # 세그먼트당 트랜지션 수
+    REPLAY_MAX_SEGMENTS = 32 # 초과하면 가장 오래된 세그먼트 삭제
+    REPLAY_PENDING_SIZE = 4096 # 피드백을 기다리는 추천 레이아웃 최대 보관 수
+    REPLAY_PENDING_TTL_SEC = 24 * 3600.0
+    REPLAY_SAMPLE_STRATEGY = os.getenv("RL_REPLAY_STRATEGY", "prioritized") # "uniform", "prioritized", "recency"
+    REPLAY_PRIORITY_ALPHA = 0.6
+    REPLAY_PRIORITY_BETA = 0.4
+    REPLAY_HALF_LIFE_SEC = 14 * 24 * 3600.0 # recency 샘플링에서 가중치가 절반이 되는 기간
     
     # RL 환경 설정 (RLConfig와 동일하게)
     MAX_ROWS = 3
     MAX_COLS = 4
     MAX_CARDS_IN_LAYOUT = MAX_ROWS * MAX_COLS
-    NUM_CARD_FEATURES = 2
+    NUM_CARD_FEATURES = CardFeatureEncoder.FEATURE_DIM
     NUM_USER_FEATURES = 2
     STATE_DIM = NUM_USER_FEATURES + 1 + 1 + (MAX_CARDS_IN_LAYOUT * NUM_CARD_FEATURES) + (MAX_ROWS * MAX_COLS)
     ACTION_SPACE_SIZE = MAX_ROWS * MAX_COLS
 
+def pad_episodes(sequences: List[Any], pad_value: float = 0.0) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    길이가 다른 에피소드별 1차원 시퀀스를 (에피소드 수, 최대 스텝 수) 텐서로 패딩합니다.
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor]: 패딩된 값, 실제 스텝이면 True인 valid 마스크.
+        values[valid]는 에피소드들을 순서대로 이어 붙인 1차원 버퍼와 같은 순서입니다.
+    """
+    lengths = torch.as_tensor([len(seq) for seq in sequences], dtype=torch.long)
+    max_len = int(lengths.max()) if len(sequences) else 0
+    padded = torch.full((len(sequences), max_len), pad_value, dtype=torch.float32)
+    for i, seq in enumerate(sequences):
+        if len(seq):
+            padded[i, :len(seq)] = torch.as_tensor(np.asarray(seq, dtype=np.float32))
+    valid = torch.arange(max_len).unsqueeze(0) < lengths.unsqueeze(1)
+    return padded, valid
+
+
+def compute_gae(rewards: torch.Tensor,
+                values: torch.Tensor,
+                dones: torch.Tensor,
+                gamma: float,
+                gae_lambda: float,
+                valid: Optional[torch.Tensor] = None,
+                last_values: Optional[torch.Tensor] = None,
+                normalize: str = "none") -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    (에피소드 수 E, 스텝 수 T)로 패딩된 텐서에 대해 GAE를 한 번의 역방향 스캔으로 계산합니다.
+    스텝 루프는 T번만 돌고, 각 스텝에서 모든 에피소드를 한꺼번에 계산합니다.
+        delta_t = r_t + gamma * V_{t+1} * (1 - done_t) - V_t
+        A_t     = delta_t + gamma * lambda * (1 - done_t) * A_{t+1}
+    Args:
+        rewards, values, dones (torch.Tensor): (E, T). dones는 해당 스텝 이후 에피소드가 끝났으면 1.
+        valid (torch.Tensor, optional): (E, T) 실제 스텝이면 True. 패딩 칸은 다음 가치/Advantage 전파를 끊습니다.
+        last_values (torch.Tensor, optional): (E,) 마지막 스텝 다음 상태의 가치 (끝나지 않은 에피소드 부트스트랩용, 기본 0).
+        normalize (str): "none", "batch"(유효한 전체 스텝 기준) 또는 "episode"(에피소드별)로 Advantage 정규화.
+            Return은 정규화 전 Advantage + 가치로 계산합니다.
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor]: (E, T) Advantage와 Return (패딩 칸은 0).
+    """
+    rewards = rewards.float()
+    values = values.float()
+    not_done = 1.0 - dones.float()
+    if valid is None:
+        valid = torch.ones_like(rewards, dtype=torch.bool)
+    valid_f = valid.float()
+    num_episodes, num_steps = rewards.shape
+
+    advantages = torch.zeros_like(rewards)
+    next_value = last_values.float() if last_values is not None else torch.zeros(num_episodes)
+    next_advantage = torch.zeros(num_episodes)
+    for t in reversed(range(num_steps)):
+        # 패딩 칸 다음(=에피소드 마지막 실제 스텝)에서는 next_value가 last_values가 되도록 valid로 이어 붙임
+        delta = rewards[:, t] + gamma * next_value * not_done[:, t] - values[:, t]
+        advantage = delta + gamma * gae_lambda * not_done[:, t] * next_advantage
+        advantages[:, t] = advantage * valid_f[:, t]
+        next_value = torch.where(valid[:, t], values[:, t], next_value)
+        next_advantage = torch.where(valid[:, t], advantage, next_advantage)
+
+    returns = (advantages + values) * valid_f
+
+    if normalize == "batch":
+        selected = advantages[valid]
+        if selected.numel() > 1:
+            advantages = (advantages - selected.mean()) / (selected.std() + 1e-8) * valid_f
+    elif normalize == "episode":
+        counts = valid_f.sum(dim=1, keepdim=True).clamp(min=1.0)
+        mean = advantages.sum(dim=1, keepdim=True) / counts
+        var = (((advantages - mean) * valid_f) ** 2).sum(dim=1, keepdim=True) / (counts - 1).clamp(min=1.0)
+        advantages = (advantages - mean) / (var.sqrt() + 1e-8) * valid_f
+    elif normalize != "none":
+        raise ValueError(f"알 수 없는 normalize 옵션: {normalize}")
+
+    return advantages, returns
+
+
+class LayoutCache:
+    """
+    (사용자 프로필 구간, 카드 특징 시그니처, 추론 모드, 정책 버전) → 추천 셀 목록 LRU 캐시.
+    정책 가중치가 바뀌면 정책 버전이 올라가므로 이전 결과는 더 이상 조회되지 않습니다.
+    """
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[List[int]]:
+        with self._lock:
+            cells = self._entries.get(key)
+            if cells is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cells
+
+    def set(self, key, cells: List[int]):
+        with self._lock:
+            self._entries[key] = cells
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
 class PPOModel(nn.Module):
     """
     PPO (Proximal Policy Optimization) 모델의 Policy Network 정의.
@@ -57,6 +196,10 @@ class PPOModel(nn.Module):
 
         self.optimizer = optim.Adam(self.parameters(), lr=self.ppo_config.LEARNING_RATE)
 
+        # 가중치가 바뀔 때마다 증가 (레이아웃 캐시 무효화용)
+        self.policy_version = 0
+        self.layout_cache = LayoutCache(self.ppo_config.LAYOUT_CACHE_SIZE)
+
     def forward(self, state: torch.Tensor):
         """
         상태를 입력받아 액터(정책)와 크리틱(가치) 네트워크의 출력을 반환합니다.
@@ -83,11 +226,9 @@ class PPOModel(nn.Module):
             # 유효하지 않은 행동(이미 점유된 셀)에 대해 매우 낮은 확률 부여
             # PPO 학습 시에는 환경에서 유효한 액션만 반환하도록 할 수 있지만,
             # 추론 시에는 이 처리로 무효한 액션 선택을 방지할 수 있습니다.
-            mask = torch.ones_like(action_logits) * -1e9 # 매우 작은 값으로 마스킹
-            for action_idx in available_actions:
-                mask[0, action_idx] = 0 # 유효한 행동은 마스킹 해제
-
-            masked_logits = action_logits + mask
+            valid = torch.zeros_like(action_logits, dtype=torch.bool)
+            valid[0, available_actions] = True # 유효한 행동만 마스킹 해제
+            masked_logits = action_logits.masked_fill(~valid, -1e9) # 매우 작은 값으로 마스킹
             
             # 확률 분포 생성 (Categorical)
             dist = Categorical(logits=masked_logits)
@@ -96,12 +237,19 @@ class PPOModel(nn.Module):
             
         return action.item(), log_prob.item()
 
-    def evaluate_actions(self, states, actions):
+    def evaluate_actions(self, states, actions, action_masks=None):
         """
         주어진 상태와 행동에 대해 로그 확률, 엔트로피, 가치 함수를 계산합니다.
         (PPO 학습 시 사용)
+        Args:
+            states (torch.Tensor): (B, STATE_DIM) 상태.
+            actions (torch.Tensor): (B,) 실제로 취한 행동.
+            action_masks (torch.Tensor, optional): (B, ACTION_SPACE_SIZE) 유효한 행동이면 True.
+                행동 선택 시와 같은 마스크를 주어야 log_prob이 기록된 값과 비교 가능합니다.
         """
         action_logits, values = self.forward(states)
+        if action_masks is not None:
+            action_logits = action_logits.masked_fill(~action_masks, -1e9)
         dist = Categorical(logits=action_logits)
         
         log_probs = dist.log_prob(actions)
@@ -112,159 +260,341 @@ class PPOModel(nn.Module):
     def compute_advantages_and_returns(self, rewards, values, dones):
         """
         GAE (Generalized Advantage Estimation)를 사용하여 Advantage와 Return을 계산합니다.
+        단일 에피소드(1차원 텐서)용이며, 여러 에피소드는 pad_episodes + compute_gae로 한 번에 계산하세요.
         """
-        advantages = torch.zeros_like(rewards)
-        returns = torch.zeros_like(rewards)
-        last_gae_lambda = 0
-        
-        # 마지막 스텝부터 거꾸로 계산
-        for t in reversed(range(len(rewards))):
-            if t == len(rewards) - 1:
-                # 마지막 스텝: done 상태라면 다음 가치 0, 아니면 현재 가치 사용
-                next_value = 0 if dones[t] else values[t] # values[t]가 next_state_value를 의미할 경우
-                next_non_terminal = 1.0 - dones[t]
-            else:
-                next_value = values[t+1]
-                next_non_terminal = 1.0 - dones[t+1] # t+1의 done 여부
-
-            delta = rewards[t] + self.ppo_config.GAMMA * next_value * next_non_terminal - values[t]
-            last_gae_lambda = delta + self.ppo_config.GAMMA * self.ppo_config.GAE_LAMBDA * next_non_terminal * last_gae_lambda
-            advantages[t] = last_gae_lambda
-            
-        returns = advantages + values # Returns = Advantages + Values
-
-        return advantages, returns
+        advantages, returns = compute_gae(
+            torch.as_tensor(rewards).unsqueeze(0),
+            torch.as_tensor(values).unsqueeze(0),
+            torch.as_tensor(dones).unsqueeze(0),
+            self.ppo_config.GAMMA,
+            self.ppo_config.GAE_LAMBDA
+        )
+        return advantages.squeeze(0), returns.squeeze(0)
     
-    def update(self, buffer_states, buffer_actions, buffer_log_probs, buffer_advantages, buffer_returns):
+    def update(self, buffer_states, buffer_actions, buffer_log_probs, buffer_advantages, buffer_returns,
+               buffer_action_masks=None, normalize_advantages: bool = True) -> Dict[str, float]:
         """
         PPO 알고리즘을 사용하여 모델을 업데이트합니다.
+        버퍼 전체를 한 번 텐서로 만든 뒤, PPO_EPOCHS번 섞어서 BATCH_SIZE 크기의 미니배치로 나누어
+        clipped surrogate + 가치 손실 + 엔트로피 보너스를 최소화합니다.
+        Args:
+            buffer_states: (N, STATE_DIM) 상태.
+            buffer_actions: (N,) 행동을 선택할 때 실제로 취한 행동.
+            buffer_log_probs: (N,) 행동을 선택할 때 기록한 로그 확률 (old policy).
+            buffer_advantages: (N,) Advantage.
+            buffer_returns: (N,) Return (가치 함수의 목표값).
+            buffer_action_masks: (N, ACTION_SPACE_SIZE) 행동 선택 시 사용한 유효 행동 마스크 (없으면 마스킹 안 함).
+            normalize_advantages (bool): 버퍼 전체 기준으로 Advantage를 평균 0, 표준편차 1로 정규화할지 여부.
+        Returns:
+            Dict[str, float]: 마지막 epoch까지의 평균 손실, 근사 KL, 클리핑 비율 등 학습 통계.
         """
-        # 기존 PPO 업데이트 로직...
-        return 0.0  # 임시 반환값
+        states = torch.as_tensor(np.asarray(buffer_states), dtype=torch.float32)
+        actions = torch.as_tensor(np.asarray(buffer_actions), dtype=torch.long)
+        old_log_probs = torch.as_tensor(np.asarray(buffer_log_probs), dtype=torch.float32)
+        advantages = torch.as_tensor(np.asarray(buffer_advantages), dtype=torch.float32)
+        returns = torch.as_tensor(np.asarray(buffer_returns), dtype=torch.float32)
+        masks = None if buffer_action_masks is None else torch.as_tensor(np.asarray(buffer_action_masks), dtype=torch.bool)
+
+        num_samples = states.shape[0]
+        if num_samples == 0:
+            return {"samples": 0, "epochs": 0, "updates": 0}
+        if not (actions.shape[0] == old_log_probs.shape[0] == advantages.shape[0] == returns.shape[0] == num_samples):
+            raise ValueError("PPO 버퍼의 상태/행동/로그 확률/Advantage/Return 길이가 다릅니다.")
+        if normalize_advantages and num_samples > 1:
+            advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-8)
+
+        cfg = self.ppo_config
+        batch_size = min(cfg.BATCH_SIZE, num_samples)
+        self.train()
+
+        totals = {"policy_loss": 0.0, "value_loss": 0.0, "entropy": 0.0, "approx_kl": 0.0, "clip_fraction": 0.0}
+        num_updates = 0
+        epochs_run = 0
+        for _ in range(cfg.PPO_EPOCHS):
+            epoch_kl = 0.0
+            epoch_batches = 0
+            for batch_idx in torch.randperm(num_samples).split(batch_size):
+                log_probs, values, entropy = self.evaluate_actions(
+                    states[batch_idx], actions[batch_idx], None if masks is None else masks[batch_idx]
+                )
+                log_ratio = log_probs - old_log_probs[batch_idx]
+                ratio = log_ratio.exp()
+                batch_adv = advantages[batch_idx]
+
+                surrogate = ratio * batch_adv
+                clipped_surrogate = torch.clamp(ratio, 1.0 - cfg.CLIP_EPSILON, 1.0 + cfg.CLIP_EPSILON) * batch_adv
+                policy_loss = -torch.min(surrogate, clipped_surrogate).mean()
+                value_loss = nn.functional.mse_loss(values.squeeze(-1), returns[batch_idx])
+                entropy_mean = entropy.mean()
+                loss = policy_loss + cfg.VALUE_COEF * value_loss - cfg.ENTROPY_BETA * entropy_mean
+
+                self.optimizer.zero_grad()
+                loss.backward()
+                nn.utils.clip_grad_norm_(self.parameters(), cfg.MAX_GRAD_NORM)
+                self.optimizer.step()
+
+                with torch.no_grad():
+                    # http://joschu.net/blog/kl-approx.html 의 k3 추정량
+                    approx_kl = ((ratio - 1) - log_ratio).mean().item()
+                    clip_fraction = ((ratio - 1.0).abs() > cfg.CLIP_EPSILON).float().mean().item()
+                totals["policy_loss"] += policy_loss.item()
+                totals["value_loss"] += value_loss.item()
+                totals["entropy"] += entropy_mean.item()
+                totals["approx_kl"] += approx_kl
+                totals["clip_fraction"] += clip_fraction
+                num_updates += 1
+                epoch_kl += approx_kl
+                epoch_batches += 1
+
+            epochs_run += 1
+            if cfg.TARGET_KL is not None and epoch_kl / epoch_batches > cfg.TARGET_KL:
+                break  # 정책이 너무 많이 바뀜 → 남은 epoch 생략
 
-    def simple_update(self, states: List[np.ndarray], rewards: List[float]) -> float:
+        self.eval()
+        self.policy_version += 1
+        stats = {key: round(value / num_updates, 6) for key, value in totals.items()}
+        stats.update({"samples": num_samples, "epochs": epochs_run, "updates": num_updates})
+        return stats
+
+    def simple_update(self, states: List[np.ndarray], rewards: List[float],
+                      actions: Optional[List[int]] = None,
+                      action_masks: Optional[np.ndarray] = None) -> float:
         """
-        배치 학습을 위한 간단한 업데이트 메서드
+        (상태, 최종 보상) 쌍만 있는 피드백 배치로 한 번 업데이트합니다 (한 스텝짜리 에피소드로 간주).
+        - 가치 함수는 보상을 목표로 회귀
+        - actions(실제로 배치된 셀)가 주어지면 Advantage(보상 - 가치)로 그 행동의 로그 확률을 조정
+          (주어지지 않으면 정책은 학습하지 않음)
+        전체 배치를 한 번에 순전파하고 optimizer step도 한 번만 수행합니다.
         Args:
             states: 상태 벡터 리스트
             rewards: 보상 리스트
+            actions: 각 상태에서 실제로 취한 행동 (선택)
+            action_masks: (N, ACTION_SPACE_SIZE) 유효 행동 마스크 (선택)
         Returns:
-            float: 평균 손실
+            float: 손실
         """
         if not states or not rewards:
             return 0.0
-            
+
         self.train()  # 학습 모드
-        
-        total_loss = 0.0
-        num_updates = 0
-        
-        for state, reward in zip(states, rewards):
-            try:
-                # 상태를 텐서로 변환
-                state_tensor = torch.FloatTensor(state).unsqueeze(0)
-                reward_tensor = torch.FloatTensor([reward])
-                
-                # 순전파
-                action_logits, value = self.forward(state_tensor)
-                
-                # 간단한 손실 계산 (MSE for value, cross-entropy for policy)
-                value_loss = nn.MSELoss()(value.squeeze(), reward_tensor)
-                
-                # 정책 손실 (간단한 형태)
-                dist = Categorical(logits=action_logits)
-                action = dist.sample()
-                log_prob = dist.log_prob(action)
-                policy_loss = -log_prob * reward_tensor  # REINFORCE 스타일
-                
-                # 전체 손실
-                loss = value_loss + 0.5 * policy_loss
-                
-                # 역전파
-                self.optimizer.zero_grad()
-                loss.backward()
-                self.optimizer.step()
-                
-                total_loss += loss.item()
-                num_updates += 1
-                
-            except Exception as e:
-                print(f"⚠️ 단일 업데이트 실패: {e}")
-                continue
-        
-        return total_loss / num_updates if num_updates > 0 else 0.0
+        states_tensor = torch.as_tensor(np.asarray(states), dtype=torch.float32)
+        rewards_tensor = torch.as_tensor(np.asarray(rewards), dtype=torch.float32)
+
+        if actions is not None:
+            masks = None if action_masks is None else torch.as_tensor(np.asarray(action_masks), dtype=torch.bool)
+            log_probs, values, _ = self.evaluate_actions(
+                states_tensor, torch.as_tensor(np.asarray(actions), dtype=torch.long), masks
+            )
+            values = values.squeeze(-1)
+            advantages = rewards_tensor - values.detach()
+            policy_loss = -(log_probs * advantages).mean()
+        else:
+            _, values = self.forward(states_tensor)
+            values = values.squeeze(-1)
+            policy_loss = torch.zeros(())
+
+        value_loss = nn.functional.mse_loss(values, rewards_tensor)
+        loss = self.ppo_config.VALUE_COEF * value_loss + policy_loss
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        nn.utils.clip_grad_norm_(self.parameters(), self.ppo_config.MAX_GRAD_NORM)
+        self.optimizer.step()
+        self.eval()
+        self.policy_version += 1
+
+        return loss.item()
+
+    def _grid_slice(self) -> slice:
+        return slice(self.ppo_config.STATE_DIM - self.ppo_config.MAX_ROWS * self.ppo_config.MAX_COLS, self.ppo_config.STATE_DIM)
+
+    def _masked_logits(self, states: torch.Tensor) -> torch.Tensor:
+        """상태의 그리드 부분에서 점유된 칸을 찾아 해당 행동의 로짓을 마스킹합니다. (B, ACTION_SPACE_SIZE)"""
+        action_logits = self.actor(states)
+        return action_logits.masked_fill(states[:, self._grid_slice()] != 0, -1e9)
+
+    def _advance(self, states: torch.Tensor, actions: torch.Tensor, next_card_index: int) -> torch.Tensor:
+        """선택한 칸을 점유로 표시하고 현재 카드 인덱스 특징을 다음 카드로 옮긴 새 상태를 반환합니다."""
+        states = states.clone()
+        states[torch.arange(states.shape[0]), self._grid_slice().start + actions] = 1.0
+        states[:, self.ppo_config.NUM_USER_FEATURES] = next_card_index / self.ppo_config.MAX_CARDS_IN_LAYOUT
+        return states
+
+    def _rollout_layouts(self, states: torch.Tensor, num_cards: torch.Tensor, greedy: bool) -> List[List[int]]:
+        """
+        여러 레이아웃을 한꺼번에 카드 하나씩 배치하며 argmax(greedy) 또는 샘플링으로 셀을 고릅니다.
+        스텝마다 아직 배치할 카드가 남은 행만 상태를 진행시킵니다.
+        Args:
+            states (torch.Tensor): (N, STATE_DIM) 초기 상태.
+            num_cards (torch.Tensor): (N,) 레이아웃별 배치할 카드 수.
+        """
+        num_layouts = states.shape[0]
+        max_steps = int(num_cards.max()) if num_layouts else 0
+        chosen = torch.full((num_layouts, max_steps), -1, dtype=torch.long)
+        for i in range(max_steps):
+            active = num_cards > i
+            masked_logits = self._masked_logits(states)
+            actions = masked_logits.argmax(dim=-1) if greedy else Categorical(logits=masked_logits).sample()
+            chosen[:, i] = torch.where(active, actions, chosen[:, i])
+            states = torch.where(active.unsqueeze(1), self._advance(states, actions, i + 1), states)
+        return [row[:n].tolist() for row, n in zip(chosen, num_cards.tolist())]
+
+    def _beam_search_layout(self, state: torch.Tensor, num_cards: int, beam_width: int) -> List[int]:
+        """전체 레이아웃의 결합 로그 확률(카드별 로그 확률의 합)이 가장 큰 배치를 빔 서치로 찾습니다."""
+        beams = state # (B, STATE_DIM), 처음에는 B=1
+        scores = torch.zeros(1)
+        histories: List[List[int]] = [[]]
+        for i in range(num_cards):
+            log_probs = torch.log_softmax(self._masked_logits(beams), dim=-1)
+            occupied = beams[:, self._grid_slice()] != 0
+            totals = (scores.unsqueeze(1) + log_probs).masked_fill(occupied, float("-inf")).flatten()
+            k = min(beam_width, int(torch.isfinite(totals).sum()))
+            top = totals.topk(k)
+            beam_idx = top.indices // self.ppo_config.ACTION_SPACE_SIZE
+            actions = top.indices % self.ppo_config.ACTION_SPACE_SIZE
+            beams = self._advance(beams[beam_idx], actions, i + 1)
+            scores = top.values
+            histories = [histories[b] + [a] for b, a in zip(beam_idx.tolist(), actions.tolist())]
+        return histories[0] # topk는 내림차순이므로 첫 번째가 최고 점수
+
+    def predict_layouts(self,
+                        state_vectors: np.ndarray,
+                        num_cards: np.ndarray,
+                        mode: Optional[str] = None,
+                        beam_width: Optional[int] = None) -> List[List[int]]:
+        """
+        여러 일기의 초기 상태를 받아 일기별 추천 셀(카드 순서대로) 목록을 반환합니다.
+        sample/greedy는 모든 일기를 한 번의 배치 루프(카드 수만큼의 순전파)로 추론하고,
+        beam은 일기별로 빔 서치합니다. greedy/beam 결과는 (사용자 프로필 구간, 카드 특징 시그니처)로 캐시됩니다.
+        Args:
+            state_vectors (np.ndarray): (N, STATE_DIM) 초기 상태 (그리드 부분 포함). 변경하지 않습니다.
+            num_cards (np.ndarray): (N,) 일기별 배치할 카드 수. 빈 칸 수를 넘으면 빈 칸 수만큼만 배치합니다.
+            mode (str, optional): "sample", "greedy", "beam" (기본: PPOConfig.INFERENCE_MODE).
+            beam_width (int, optional): beam 모드의 빔 크기 (기본: PPOConfig.BEAM_WIDTH).
+        Returns:
+            List[List[int]]: 일기별 셀 인덱스 리스트 (row = cell // MAX_COLS, col = cell % MAX_COLS).
+        """
+        mode = mode or self.ppo_config.INFERENCE_MODE
+        beam_width = beam_width or self.ppo_config.BEAM_WIDTH
+        if mode not in ("sample", "greedy", "beam"):
+            raise ValueError(f"알 수 없는 추론 모드: {mode}")
+        self.eval() # 평가 모드로 설정
+
+        states = np.array(state_vectors, dtype=np.float32).reshape(-1, self.ppo_config.STATE_DIM) # 호출자의 배열은 건드리지 않음
+        num_free_cells = (states[:, self._grid_slice()] == 0).sum(axis=1)
+        num_cards = np.minimum(np.asarray(num_cards, dtype=np.int64), num_free_cells)
+
+        results: List[Optional[List[int]]] = [None] * len(states)
+        cache_keys: List[Any] = [None] * len(states)
+        if mode != "sample":
+            # 사용자 특징을 구간 중앙값으로 맞춘 상태로 추론 → 같은 구간/카드 셋이면 같은 결과를 재사용
+            bucket = self.ppo_config.USER_BUCKET_SIZE
+            user_slice = slice(0, self.ppo_config.NUM_USER_FEATURES)
+            states[:, user_slice] = (np.floor(states[:, user_slice] / bucket) + 0.5) * bucket
+            for i, state in enumerate(states):
+                cache_keys[i] = (mode, beam_width if mode == "beam" else None, self.policy_version,
+                                 int(num_cards[i]), state.tobytes())
+                results[i] = self.layout_cache.get(cache_keys[i])
+
+        pending = [i for i, cells in enumerate(results) if cells is None]
+        if pending:
+            with torch.no_grad():
+                pending_states = torch.as_tensor(states[pending])
+                if mode == "beam":
+                    computed = [self._beam_search_layout(pending_states[j:j + 1], int(num_cards[i]), beam_width)
+                                for j, i in enumerate(pending)]
+                else:
+                    computed = self._rollout_layouts(pending_states, torch.as_tensor(num_cards[pending]),
+                                                     greedy=(mode == "greedy"))
+            for i, cells in zip(pending, computed):
+                results[i] = cells
+                if cache_keys[i] is not None:
+                    self.layout_cache.set(cache_keys[i], cells)
+
+        return results
+
+    def layout_trajectories(self, state_vectors: np.ndarray, layouts: List[List[int]]) -> List[Dict[str, np.ndarray]]:
+        """
+        predict_layouts가 고른 셀 목록을 카드 순서대로 다시 진행하며 스텝별 학습 데이터를 만듭니다 (리플레이 버퍼 기록용).
+        상태 진행은 텐서 연산으로, 로그 확률과 가치는 모든 일기의 모든 스텝을 한 번에 순전파해 계산합니다.
+        Args:
+            state_vectors (np.ndarray): (N, STATE_DIM) 초기 상태.
+            layouts (List[List[int]]): 일기별 셀 인덱스 리스트.
+        Returns:
+            List[Dict[str, np.ndarray]]: 일기별 states, actions, masks, log_probs, values (행 수 = 배치한 카드 수).
+        """
+        lengths = [len(cells) for cells in layouts]
+        max_steps = max(lengths, default=0)
+        if max_steps == 0:
+            return [{} for _ in layouts]
+        padded_actions = torch.zeros((len(layouts), max_steps), dtype=torch.long)
+        for i, cells in enumerate(layouts):
+            padded_actions[i, :len(cells)] = torch.as_tensor(cells, dtype=torch.long)
+
+        states = torch.as_tensor(np.asarray(state_vectors, dtype=np.float32).reshape(-1, self.ppo_config.STATE_DIM))
+        step_states = []
+        for i in range(max_steps):
+            step_states.append(states)
+            states = self._advance(states, padded_actions[:, i], i + 1)
+        step_states = torch.stack(step_states, dim=1) # (N, max_steps, STATE_DIM)
+        valid = torch.arange(max_steps).unsqueeze(0) < torch.as_tensor(lengths).unsqueeze(1)
+
+        flat_states = step_states[valid]
+        flat_actions = padded_actions[valid]
+        flat_masks = flat_states[:, self._grid_slice()] == 0
+        self.eval()
+        with torch.no_grad():
+            log_probs, values, _ = self.evaluate_actions(flat_states, flat_actions, flat_masks)
+
+        trajectories = []
+        offset = 0
+        for length in lengths:
+            end = offset + length
+            trajectories.append({
+                "states": flat_states[offset:end].numpy(),
+                "actions": flat_actions[offset:end].numpy(),
+                "masks": flat_masks[offset:end].numpy(),
+                "log_probs": log_probs[offset:end].numpy(),
+                "values": values[offset:end].squeeze(-1).numpy(),
+            })
+            offset = end
+        return trajectories
 
     def predict_action(self, state_vector: np.ndarray, 
                        selected_card_ids: List[str], 
                        max_rows: int, max_cols: int,
-                       grid_state_initial: np.ndarray) -> Dict[str, Dict[str, int]]:
+                       grid_state_initial: np.ndarray,
+                       mode: Optional[str] = None,
+                       beam_width: Optional[int] = None) -> Dict[str, Dict[str, int]]:
         """
         주어진 상태 벡터를 기반으로 강화학습 모델이 레이아웃을 추론합니다.
-        여러 카드를 순차적으로 배치하는 방식을 사용합니다.
+        여러 카드를 순차적으로 배치하는 방식을 사용하며, 유효한 칸 마스크는 상태의 그리드 부분에서 텐서 연산으로 만듭니다.
+        (일기 하나에 대한 predict_layouts)
         
         Args:
-            state_vector (np.ndarray): 현재 환경 상태를 나타내는 초기 상태 벡터 (reset 시점의 상태).
+            state_vector (np.ndarray): 현재 환경 상태를 나타내는 초기 상태 벡터 (reset 시점의 상태). 변경하지 않습니다.
             selected_card_ids (List[str]): 사용자가 선택한 카드 ID 리스트.
             max_rows (int): 레이아웃의 최대 행 수.
             max_cols (int): 레이아웃의 최대 열 수.
             grid_state_initial (np.ndarray): reset 시점의 초기 그리드 상태 (보통 모두 0).
+            mode (str, optional): "sample", "greedy", "beam" (기본: PPOConfig.INFERENCE_MODE).
+            beam_width (int, optional): beam 모드의 빔 크기 (기본: PPOConfig.BEAM_WIDTH).
 
         Returns:
             Dict[str, Dict[str, int]]: 추천된 레이아웃.
-                                       예: { "card_id_A": {"row": 0, "col": 0}, ... }
+                                       예: { "card_id_A": {"row": 0, "col": 0, "order_index": 0}, ... }
         """
-        self.eval() # 평가 모드로 설정
-        
-        current_grid_state = np.copy(grid_state_initial) # 그리드 상태를 추론 과정에서 업데이트
-        current_state_vector = state_vector # 현재 상태 벡터 (계속 업데이트됨)
-        
-        recommended_layout: Dict[str, Dict[str, int]] = {}
-        
-        num_cards_to_place = len(selected_card_ids)
-        
-        for i, card_id in enumerate(selected_card_ids):
-            # 현재 유효한 행동 (비어있는 그리드 셀) 목록 생성
-            available_actions_indices = []
-            for r in range(max_rows):
-                for c in range(max_cols):
-                    if current_grid_state[r, c] == 0: # 비어있는 셀만
-                        available_actions_indices.append(r * max_cols + c) # 1차원 인덱스
-
-            if not available_actions_indices:
-                # 더 이상 배치할 공간이 없으면 중단
-                print(f"No more available cells to place card {card_id}.")
-                break
-            
-            # 모델로부터 행동(그리드 셀 인덱스) 선택
-            # select_action은 이제 available_actions를 고려하여 마스킹된 로짓에서 샘플링함
-            # 이 함수는 학습시에도 쓰여야 하므로, log_prob도 반환함. 추론시에는 log_prob은 필요없음.
-            action_idx, _ = self.select_action(current_state_vector, available_actions_indices)
-            
-            row = action_idx // max_cols
-            col = action_idx % max_cols
-
-            # 선택된 위치에 카드 배치
-            recommended_layout[card_id] = {'row': row, 'col': col, 'order_index': i}
-            current_grid_state[row, col] = 1 # 그리드 상태 업데이트
-
-            # 다음 카드를 위한 상태 벡터 업데이트 (현재 카드 인덱스 및 그리드 상태 반영)
-            # rl_env의 _get_state_vector를 직접 호출하는 방식이 아니므로, 수동으로 업데이트
-            # 여기서는 state_vector의 그리드 부분만 업데이트
-            
-            # current_state_vector는 numpy 배열이므로, 슬라이싱으로 직접 업데이트
-            # STATE_DIM = NUM_USER_FEATURES(2) + current_card_idx(1) + num_cards_feature(1) + card_features_padded(...) + grid_flat(...)
-            
-            # 그리드 부분의 시작 인덱스 계산 (state_dim 계산식에 따라)
-            grid_start_idx = self.ppo_config.STATE_DIM - (max_rows * max_cols)
-            current_state_vector[grid_start_idx:] = current_grid_state.flatten().astype(np.float32)
-
-            # 다음 카드 인덱스 업데이트 (state_vector의 current_card_idx_feature 부분)
-            # current_card_idx_feature는 user_features 바로 뒤에 위치
-            current_card_idx_feature_idx = self.ppo_config.NUM_USER_FEATURES
-            current_state_vector[current_card_idx_feature_idx] = (i + 1) / self.ppo_config.MAX_CARDS_IN_LAYOUT
-
+        state = np.array(state_vector, dtype=np.float32)
+        state[self._grid_slice()] = np.asarray(grid_state_initial, dtype=np.float32).flatten()
+        cells = self.predict_layouts(state[None, :], np.array([len(selected_card_ids)]), mode, beam_width)[0]
+        if len(cells) < len(selected_card_ids):
+            # 더 이상 배치할 공간이 없으면 남은 카드는 배치하지 않음
+            print(f"No more available cells to place {len(selected_card_ids) - len(cells)} card(s).")
 
-        return recommended_layout
+        return {
+            card_id: {'row': cell // max_cols, 'col': cell % max_cols, 'order_index': i}
+            for i, (card_id, cell) in enumerate(zip(selected_card_ids, cells))
+        }
 
     def save_model(self, path: str):
         """모델 가중치를 저장합니다."""
@@ -279,6 +609,7 @@ class PPOModel(nn.Module):
         try:
             self.load_state_dict(torch.load(path))
             self.eval() # 평가 모드로 설정
+            self.policy_version += 1
             print(f"Model loaded from {path}")
         except Exception as e:
             print(f"Error loading model from {path}: {e}. Initializing fresh model.")
\ No newline at end of file
@@ -0,0 +1,218 @@
+# back/rl_core/simulator.py
+# 오프라인 학습/부하 테스트용 가상 사용자 시뮬레이터
+# 실제 피드백은 드물어서 정책 학습이 느리므로, 잠재 레이아웃 선호를 가진 가상 사용자를 만들어
+# 카드 셋 생성 → (정책이 만든) 레이아웃 평가 → save/modify/regenerate 피드백과 보상까지 배열 연산으로 처리합니다.
+#
+# 가상 사용자의 선호 레이아웃: 카드 종류별 선호도(사진은 앞, 명언은 뒤 등 + 사용자별 잡음)가 높은 카드부터
+# 읽는 순서(행 우선)로 빈틈없이 채운 배치. 추천 레이아웃과 선호 레이아웃의 차이는 프론트엔드와 같은
+# 카드 평균 |행 차이| + 평균 |열 차이|(layout_difference)이고, 보상은 RLEnvironment.calculate_reward와 같은 규칙입니다.
+
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rl_core.rl_env import RLConfig, VectorizedRLEnvironment
+
+# 시뮬레이션 카드 종류: (이름, source_type, category, layout_type, 이미지 여부, 내용 여부, 기본 선호도)
+# 기본 선호도가 클수록 앞(왼쪽 위)에 두고 싶어함
+CARD_KINDS = [
+    ("photo", "image", "photo", "image", True, False, 2.0),
+    ("photo_memo", "image", "photo", "combo", True, True, 1.5),
+    ("book", "widget", "book", "combo", True, True, 0.5),
+    ("text", "text", "memo", "text", False, True, 0.0),
+    ("weather", "widget", "weather", "text", False, True, 0.0),
+    ("quote", "widget", "quote", "quote", False, True, -2.0),
+]
+FEEDBACK_TYPES = ("save", "modify", "regenerate") # 피드백 코드 0, 1, 2
+
+
+class SimulatorConfig:
+    """가상 사용자/카드 분포 설정"""
+    NUM_CARDS_MEAN = 4.0 # 일기당 카드 수 (1 + 포아송, MAX_CARDS로 자름)
+    MAX_CARDS = 8
+    KIND_PROBS = [0.25, 0.15, 0.05, 0.3, 0.1, 0.15] # CARD_KINDS 순서
+
+    # 사용자별 잠재 선호
+    KIND_PREFERENCE_NOISE = 0.5 # 종류별 기본 선호도에 더하는 사용자별 잡음 (표준편차)
+    ORDER_WEIGHT_MEAN = 0.5 # 같은 선호도면 고른 순서를 유지하려는 정도
+    SAVE_TOLERANCE_MEAN = 0.5 # 이 layout_difference 이하면 그대로 저장
+    REGENERATE_TOLERANCE_MEAN = 2.0 # 이 이상이면 재추천 요청, 사이면 직접 수정
+    TOLERANCE_SPREAD = 0.2 # 허용치의 사용자별 변동 (로그 정규, 표준편차)
+    FEEDBACK_NOISE = 0.2 # 피드백을 고를 때 layout_difference에 더하는 잡음 (표준편차)
+
+    LAYOUT_REWARD_SCALE = 20.0 # 프론트엔드와 같은 layout_reward = -layout_difference * 20
+
+
+class SimulatedUsers:
+    """
+    잠재 선호를 가진 가상 사용자 num_users명. 모든 메서드는 에피소드 N개를 배열로 한꺼번에 처리합니다.
+    에피소드 배열 구성 (sample_episodes):
+        user_index: (N,)                  에피소드의 사용자
+        kinds:      (N, MAX_CARDS_IN_LAYOUT) 카드 종류 (CARD_KINDS 인덱스, 카드가 없는 자리는 -1)
+        num_cards:  (N,)
+        card_features, user_features       VectorizedRLEnvironment.reset에 바로 넣을 수 있는 특징 배열
+    레이아웃(cells)은 (N, MAX_CARDS_IN_LAYOUT) 셀 인덱스 배열이며, 카드가 없거나 배치하지 않은 자리는 -1입니다.
+    """
+    def __init__(self,
+                 config: RLConfig,
+                 sim_config: Optional[SimulatorConfig] = None,
+                 num_users: int = 1000,
+                 seed: Optional[int] = None):
+        self.config = config
+        self.sim_config = sim_config = sim_config or SimulatorConfig()
+        self.num_users = num_users
+        self.rng = np.random.default_rng(seed)
+        rng = self.rng
+
+        base_preference = np.array([kind[6] for kind in CARD_KINDS], dtype=np.float32)
+        self.kind_preference = base_preference + rng.normal(0, sim_config.KIND_PREFERENCE_NOISE, (num_users, len(CARD_KINDS))).astype(np.float32)
+        self.order_weight = rng.exponential(sim_config.ORDER_WEIGHT_MEAN, num_users).astype(np.float32)
+        self.save_tolerance = (sim_config.SAVE_TOLERANCE_MEAN * rng.lognormal(0, sim_config.TOLERANCE_SPREAD, num_users)).astype(np.float32)
+        self.regenerate_tolerance = np.maximum(
+            sim_config.REGENERATE_TOLERANCE_MEAN * rng.lognormal(0, sim_config.TOLERANCE_SPREAD, num_users),
+            self.save_tolerance + 0.1
+        ).astype(np.float32)
+        # 상태 벡터의 사용자 특징 (average_satisfaction, total_diaries)
+        self.profiles = np.stack([
+            rng.beta(5, 2, num_users),
+            np.minimum(rng.geometric(1 / 20, num_users), 100)
+        ], axis=1).astype(np.float32)
+
+        # 카드 종류 → 상태 벡터의 카드 특징 (VectorizedRLEnvironment.encode_cards와 같은 값)
+        self.kind_features = np.stack([
+            VectorizedRLEnvironment.encode_cards([self._kind_card(kind)], config)[0] for kind in range(len(CARD_KINDS))
+        ])
+
+    @staticmethod
+    def _kind_card(kind: int, card_id: Optional[str] = None) -> Dict[str, Any]:
+        name, source_type, category, layout_type, has_image, has_content, _ = CARD_KINDS[kind]
+        return {
+            'id': card_id or str(uuid.uuid4()),
+            'source_type': source_type,
+            'category': category,
+            'layout_type': layout_type,
+            'image_url': f"https://example.com/simulated/{name}.jpg" if has_image else None,
+            'content': f"시뮬레이션 {category} 카드" if has_content else None,
+        }
+
+    def sample_episodes(self, num_episodes: int, user_index: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """카드 셋과 사용자를 뽑아 에피소드 배열을 만듭니다."""
+        cfg, sim = self.config, self.sim_config
+        rng = self.rng
+        if user_index is None:
+            user_index = rng.integers(0, self.num_users, num_episodes)
+        max_cards = min(sim.MAX_CARDS, cfg.MAX_CARDS_IN_LAYOUT)
+        num_cards = np.minimum(1 + rng.poisson(sim.NUM_CARDS_MEAN - 1, num_episodes), max_cards)
+        kinds = rng.choice(len(CARD_KINDS), size=(num_episodes, cfg.MAX_CARDS_IN_LAYOUT), p=sim.KIND_PROBS)
+        kinds[np.arange(cfg.MAX_CARDS_IN_LAYOUT)[None, :] >= num_cards[:, None]] = -1
+
+        card_features = np.where((kinds >= 0)[..., None], self.kind_features[kinds], 0.0).astype(np.float32)
+        profiles = self.profiles[user_index]
+        user_features = np.stack([profiles[:, 0], profiles[:, 1] / 100.0], axis=1) # encode_user와 같은 스케일
+        return {
+            "user_index": user_index,
+            "kinds": kinds,
+            "num_cards": num_cards,
+            "card_features": card_features,
+            "user_features": user_features.astype(np.float32),
+        }
+
+    def preferred_cells(self, episodes: Dict[str, np.ndarray]) -> np.ndarray:
+        """사용자별 선호 레이아웃: 선호도 순으로 정렬한 카드를 셀 0, 1, 2, ... (행 우선)에 배치."""
+        kinds = episodes["kinds"]
+        present = kinds >= 0
+        position = np.arange(kinds.shape[1], dtype=np.float32)[None, :] / self.config.MAX_CARDS_IN_LAYOUT
+        user_index = episodes["user_index"]
+        score = np.take_along_axis(self.kind_preference[user_index], np.maximum(kinds, 0), axis=1) \
+            - self.order_weight[user_index, None] * position
+        score = np.where(present, score, -np.inf)
+        order = np.argsort(-score, axis=1, kind="stable") # 선호도 내림차순으로 카드 인덱스
+        cells = np.empty_like(kinds)
+        np.put_along_axis(cells, order, np.arange(kinds.shape[1])[None, :].repeat(len(kinds), axis=0), axis=1)
+        return np.where(present, cells, -1)
+
+    def layout_difference(self, cells: np.ndarray, other_cells: np.ndarray) -> np.ndarray:
+        """두 레이아웃에 모두 배치된 카드의 평균 |행 차이| + 평균 |열 차이| (프론트엔드의 layoutDifference)."""
+        max_cols = self.config.MAX_COLS
+        compared = (cells >= 0) & (other_cells >= 0)
+        diff = np.abs(cells // max_cols - other_cells // max_cols) + np.abs(cells % max_cols - other_cells % max_cols)
+        count = compared.sum(axis=1)
+        return np.where(count > 0, np.where(compared, diff, 0).sum(axis=1) / np.maximum(count, 1), 0.0).astype(np.float32)
+
+    def feedback(self, episodes: Dict[str, np.ndarray], cells: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        추천 레이아웃(cells)에 대한 피드백을 만듭니다.
+        - 선호 레이아웃과의 차이(+잡음)가 save 허용치 이하 → save (수정 없음)
+        - regenerate 허용치 이상 → regenerate
+        - 그 사이 → modify (사용자가 선호 레이아웃으로 옮김)
+        Returns:
+            feedback (N,) FEEDBACK_TYPES 코드, layout_difference / layout_reward (modify일 때 추천과 수정본의 차이),
+            user_cells (N, MAX_CARDS_IN_LAYOUT) 사용자의 최종 레이아웃, rewards (N,) 최종 보상
+        """
+        user_index = episodes["user_index"]
+        preferred = self.preferred_cells(episodes)
+        distance = self.layout_difference(cells, preferred)
+        noisy = distance + self.rng.normal(0, self.sim_config.FEEDBACK_NOISE, len(distance)).astype(np.float32)
+
+        feedback = np.full(len(distance), 1, dtype=np.int64)
+        feedback[noisy <= self.save_tolerance[user_index]] = 0
+        feedback[noisy >= self.regenerate_tolerance[user_index]] = 2
+        modified = feedback == 1
+        user_cells = np.where(modified[:, None], preferred, cells)
+        layout_difference = np.where(modified, distance, 0.0).astype(np.float32)
+        layout_reward = -layout_difference * self.sim_config.LAYOUT_REWARD_SCALE
+        return {
+            "feedback": feedback,
+            "layout_difference": layout_difference,
+            "layout_reward": layout_reward,
+            "user_cells": user_cells,
+            "rewards": VectorizedRLEnvironment.calculate_rewards(self.config, feedback, layout_difference, layout_reward),
+        }
+
+    def to_requests(self,
+                    episodes: Dict[str, np.ndarray],
+                    cells: np.ndarray,
+                    result: Dict[str, np.ndarray],
+                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        부하 테스트용으로 에피소드를 API 요청 본문으로 변환합니다.
+        Returns:
+            List[Dict[str, Any]]: 에피소드별 {"diary_id", "user_id", "cards", "suggest_layout", "feedback"}
+                (suggest_layout은 /rl/suggest-layout, feedback은 /rl/learn-from-feedback 본문)
+        """
+        max_cols = self.config.MAX_COLS
+        requests = []
+        for n in range(len(cells) if limit is None else min(limit, len(cells))):
+            diary_id = str(uuid.uuid4())
+            user_id = f"simulated-user-{int(episodes['user_index'][n])}"
+            cards = [self._kind_card(int(kind)) for kind in episodes["kinds"][n] if kind >= 0]
+            original_layout, user_layout = {}, {}
+            for i, card in enumerate(cards):
+                for layout, cell in ((original_layout, cells[n, i]), (user_layout, result["user_cells"][n, i])):
+                    if cell >= 0:
+                        layout[card['id']] = {'row': int(cell // max_cols), 'col': int(cell % max_cols), 'order_index': i}
+            requests.append({
+                "diary_id": diary_id,
+                "user_id": user_id,
+                "cards": cards,
+                "suggest_layout": {"diary_id": diary_id, "user_id": user_id, "selected_card_ids": [card['id'] for card in cards]},
+                "feedback": {
+                    "diary_id": diary_id,
+                    "feedback_type": FEEDBACK_TYPES[int(result["feedback"][n])],
+                    "details": {
+                        "user_id": user_id,
+                        "original_layout": original_layout,
+                        "user_layout": user_layout,
+                        "layout_difference": float(result["layout_difference"][n]),
+                        "layout_reward": float(result["layout_reward"][n]),
+                    },
+                },
+            })
+        return requests
+
+
+def random_layouts(num_cards: np.ndarray, num_cells: int, rng: np.random.Generator) -> np.ndarray:
+    """카드 수만큼 서로 다른 셀을 무작위로 고른 레이아웃 (N, num_cells). 기준선/처리량 측정용."""
+    cells = np.argsort(rng.random((len(num_cards), num_cells)), axis=1)
+    return np.where(np.arange(num_cells)[None, :] < np.asarray(num_cards)[:, None], cells, -1)
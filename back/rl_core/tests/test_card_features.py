@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+카드 특징 인코더 테스트
+RLEnvironment(단일)와 VectorizedRLEnvironment(배열)가 같은 카드 특징으로 같은 상태를 만드는지,
+입력 카드 데이터를 바꾸지 않고 인코더 캐시로 재사용하는지 확인합니다.
+
+실행 (back/ 디렉토리에서):
+    python -m pytest rl_core/tests/test_card_features.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from rl_core.preprocess import CardFeatureEncoder, get_padded_card_features_vector
+from rl_core.rl_env import RLConfig, RLEnvironment, VectorizedRLEnvironment
+
+CARDS = {
+    "a": {"id": "a", "source_type": "image", "category": "photo", "image_url": "https://example.com/a.jpg"},
+    "b": {"id": "b", "source_type": "widget", "category": "weather", "layout_type": "combo", "content": "맑음 " * 30},
+    "c": {"id": "c", "source_type": "unknown", "text_final": "짧은 메모", "emotion_scores": {"valence": 0.8, "arousal": -0.2}},
+}
+
+
+def test_encoded_features():
+    encoder = CardFeatureEncoder("full")
+    features = encoder.encode(dict(CARDS["c"]))
+    assert features.shape == (CardFeatureEncoder.FEATURE_DIMS["full"],)
+    assert features[:2].tolist() == [0.0, 0.0]
+    # source_type은 '기타', category는 없으므로 '기타', layout_type은 없으므로 모두 0
+    assert np.isclose(features.sum(), 1 + 1 + 1 + 0.8 - 0.2)
+    np.testing.assert_allclose(features[-2:], [0.8, -0.2])
+
+    basic = CardFeatureEncoder("basic").encode(dict(CARDS["b"]))
+    assert basic.tolist() == [0.0, 1.0]
+
+
+def test_single_and_vectorized_states_match():
+    config = RLConfig()
+    cards = {cid: dict(card) for cid, card in CARDS.items()}
+    user = {"average_satisfaction": 0.6, "total_diaries": 12}
+
+    env = RLEnvironment(config)
+    state = env.reset("user", ["b", "a", "c"], cards, user)
+    assert state.shape == (config.STATE_DIM,)
+    assert cards == CARDS  # 입력 dict는 그대로
+
+    vec_env = VectorizedRLEnvironment(config, 1)
+    vec_state = vec_env.reset_from_data([([cards["b"], cards["a"], cards["c"]], user)])
+    np.testing.assert_allclose(vec_state[0], state)
+
+    padded = get_padded_card_features_vector([cards["b"], cards["a"], cards["c"]], config.MAX_CARDS_IN_LAYOUT)
+    start = config.NUM_USER_FEATURES + 2
+    np.testing.assert_allclose(state[start:start + len(padded)], padded)
+
+    next_state, _, _, _ = env.step(0)
+    np.testing.assert_allclose(next_state[start:start + len(padded)], padded)
+
+
+def test_cache_is_keyed_by_card_id_and_content():
+    encoder = CardFeatureEncoder("full", cache_size=2)
+    first = encoder.encode(dict(CARDS["b"]))
+    # 다시 조회한 같은 카드 (다른 dict 객체)는 캐시 적중
+    assert encoder.encode(dict(CARDS["b"])) is first
+    # 내용이 바뀌면 다시 계산
+    changed = encoder.encode({**CARDS["b"], "image_url": "https://example.com/b.jpg"})
+    assert changed[0] == 1.0 and first[0] == 0.0
+    assert encoder.cache_stats() == {"size": 2, "max_size": 2, "hits": 1, "misses": 2}
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+GAE 계산 테스트
+rl_model.compute_gae(패딩된 에피소드 배치를 한 번에 계산)가 에피소드 하나씩 스텝을 거꾸로 도는
+스칼라 구현과 같은 값을 내는지 확인합니다.
+
+실행 (back/ 디렉토리에서):
+    python -m pytest rl_core/tests/test_gae.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from rl_core.rl_model import PPOConfig, PPOModel, compute_gae, pad_episodes
+
+GAMMA = 0.99
+GAE_LAMBDA = 0.95
+
+
+def scalar_gae(rewards, values, dones, gamma=GAMMA, gae_lambda=GAE_LAMBDA, last_value=0.0):
+    """참조 구현: 에피소드 하나를 파이썬 루프로 계산"""
+    advantages = [0.0] * len(rewards)
+    next_value, next_advantage = last_value, 0.0
+    for t in reversed(range(len(rewards))):
+        not_done = 0.0 if dones[t] else 1.0
+        delta = rewards[t] + gamma * next_value * not_done - values[t]
+        next_advantage = delta + gamma * gae_lambda * not_done * next_advantage
+        advantages[t] = next_advantage
+        next_value = values[t]
+    returns = [a + v for a, v in zip(advantages, values)]
+    return advantages, returns
+
+
+def make_episodes(num_episodes=32, max_len=12, seed=0):
+    rng = np.random.default_rng(seed)
+    episodes = []
+    for _ in range(num_episodes):
+        length = int(rng.integers(1, max_len + 1))
+        rewards = rng.normal(size=length).tolist()
+        values = rng.normal(size=length).tolist()
+        dones = (rng.random(length) < 0.2).tolist()
+        dones[-1] = bool(rng.random() < 0.7)  # 일부 에피소드는 끝나지 않은 채로 잘림
+        episodes.append((rewards, values, dones, float(rng.normal())))
+    return episodes
+
+
+def test_compute_gae_matches_scalar_reference():
+    episodes = make_episodes()
+    rewards, valid = pad_episodes([e[0] for e in episodes])
+    values, _ = pad_episodes([e[1] for e in episodes])
+    dones, _ = pad_episodes([e[2] for e in episodes])
+    last_values = torch.tensor([e[3] for e in episodes])
+
+    advantages, returns = compute_gae(rewards, values, dones, GAMMA, GAE_LAMBDA, valid=valid, last_values=last_values)
+
+    expected_adv, expected_ret = [], []
+    for r, v, d, last in episodes:
+        adv, ret = scalar_gae(r, v, d, last_value=last)
+        expected_adv.extend(adv)
+        expected_ret.extend(ret)
+
+    # valid 위치를 행 우선으로 꺼내면 에피소드를 이어 붙인 버퍼 순서와 같아야 함
+    np.testing.assert_allclose(advantages[valid].numpy(), expected_adv, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(returns[valid].numpy(), expected_ret, rtol=1e-5, atol=1e-5)
+    assert torch.all(advantages[~valid] == 0) and torch.all(returns[~valid] == 0)
+
+
+def test_compute_gae_normalization():
+    episodes = make_episodes(seed=1)
+    rewards, valid = pad_episodes([e[0] for e in episodes])
+    values, _ = pad_episodes([e[1] for e in episodes])
+    dones, _ = pad_episodes([e[2] for e in episodes])
+
+    raw, raw_returns = compute_gae(rewards, values, dones, GAMMA, GAE_LAMBDA, valid=valid)
+    batch, batch_returns = compute_gae(rewards, values, dones, GAMMA, GAE_LAMBDA, valid=valid, normalize="batch")
+    assert abs(batch[valid].mean().item()) < 1e-5
+    assert abs(batch[valid].std().item() - 1.0) < 1e-4
+    torch.testing.assert_close(batch_returns, raw_returns)  # Return은 정규화하지 않음
+
+    episode, _ = compute_gae(rewards, values, dones, GAMMA, GAE_LAMBDA, valid=valid, normalize="episode")
+    for i in range(len(episodes)):
+        row = episode[i][valid[i]]
+        if row.numel() > 1:
+            assert abs(row.mean().item()) < 1e-5
+
+
+def test_single_episode_wrapper():
+    rewards, values, dones, _ = make_episodes(num_episodes=1, seed=2)[0]
+    model = PPOModel(state_dim=4, action_dim=2, ppo_config=PPOConfig())
+    advantages, returns = model.compute_advantages_and_returns(
+        torch.tensor(rewards), torch.tensor(values), torch.tensor(dones)
+    )
+    expected_adv, expected_ret = scalar_gae(rewards, values, dones, PPOConfig.GAMMA, PPOConfig.GAE_LAMBDA)
+    np.testing.assert_allclose(advantages.numpy(), expected_adv, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(returns.numpy(), expected_ret, rtol=1e-5, atol=1e-5)
+
+
+if __name__ == "__main__":
+    test_compute_gae_matches_scalar_reference()
+    test_compute_gae_normalization()
+    test_single_episode_wrapper()
+    print("✅ GAE 테스트 통과")
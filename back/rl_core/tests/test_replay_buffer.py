@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+리플레이 버퍼 테스트
+기록한 에피소드가 다시 열어도 그대로 남아 있는지, 샘플링 결과가 에피소드 단위로 이어져 있는지 확인합니다.
+
+실행 (back/ 디렉토리에서):
+    python -m pytest rl_core/tests/test_replay_buffer.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from rl_core.replay_buffer import PendingEpisodes, ReplayBuffer
+
+STATE_DIM = 6
+ACTION_DIM = 4
+
+
+def make_episode(length, episode_id):
+    """상태 첫 열에 에피소드 번호, 둘째 열에 스텝 번호를 넣은 에피소드"""
+    states = np.zeros((length, STATE_DIM), dtype=np.float32)
+    states[:, 0] = episode_id
+    states[:, 1] = np.arange(length)
+    return {
+        "states": states,
+        "actions": np.arange(length) % ACTION_DIM,
+        "masks": np.ones((length, ACTION_DIM), dtype=bool),
+        "log_probs": np.full(length, -1.0),
+        "values": np.zeros(length),
+    }
+
+
+def test_episodes_persist_and_sample_contiguously(tmp_path):
+    buffer = ReplayBuffer(str(tmp_path), STATE_DIM, ACTION_DIM, segment_size=10, max_segments=8)
+    lengths = [3, 4, 2, 5, 1, 4]
+    for episode_id, length in enumerate(lengths):
+        buffer.append_episode(final_reward=float(episode_id), **make_episode(length, episode_id))
+    buffer.flush()
+
+    reopened = ReplayBuffer(str(tmp_path), STATE_DIM, ACTION_DIM, segment_size=10, max_segments=8)
+    assert reopened.num_episodes == len(lengths)
+    assert len(reopened) == sum(lengths)
+
+    sample = reopened.sample_episodes(len(lengths), strategy="prioritized", rng=np.random.default_rng(0))
+    offset = 0
+    for length in sample["episode_lengths"]:
+        episode = sample["states"][offset:offset + length]
+        episode_id = int(episode[0, 0])
+        assert length == lengths[episode_id]
+        np.testing.assert_array_equal(episode[:, 0], episode_id)
+        np.testing.assert_array_equal(episode[:, 1], np.arange(length))
+        # 최종 보상은 마지막 스텝에만, done도 마지막 스텝에만
+        np.testing.assert_array_equal(sample["rewards"][offset:offset + length], [0.0] * (length - 1) + [episode_id])
+        np.testing.assert_array_equal(sample["dones"][offset:offset + length], [False] * (length - 1) + [True])
+        offset += length
+    assert offset == len(sample["actions"]) == len(sample["weights"])
+
+
+def test_oldest_segments_are_dropped(tmp_path):
+    buffer = ReplayBuffer(str(tmp_path), STATE_DIM, ACTION_DIM, segment_size=4, max_segments=2)
+    for episode_id in range(6):
+        buffer.append_episode(final_reward=0.0, **make_episode(3, episode_id))  # 세그먼트당 에피소드 1개
+
+    assert buffer.stats()["segments"] == 2
+    sample = buffer.sample_episodes(10)
+    assert sorted(set(sample["states"][:, 0].astype(int))) == [4, 5]
+
+
+def test_buffers_sharing_a_directory_do_not_overwrite_each_other(tmp_path):
+    # 워커 프로세스 두 개가 같은 디렉토리를 연 상황 (각자 파일 핸들과 메모리 상태를 가짐)
+    first = ReplayBuffer(str(tmp_path), STATE_DIM, ACTION_DIM, segment_size=10, max_segments=8)
+    second = ReplayBuffer(str(tmp_path), STATE_DIM, ACTION_DIM, segment_size=10, max_segments=8)
+    lengths = [3, 4, 2, 5, 1, 4, 3]
+    for episode_id, length in enumerate(lengths):
+        writer = first if episode_id % 2 == 0 else second
+        writer.append_episode(final_reward=float(episode_id), **make_episode(length, episode_id))
+
+    reopened = ReplayBuffer(str(tmp_path), STATE_DIM, ACTION_DIM, segment_size=10, max_segments=8)
+    assert reopened.num_episodes == first.num_episodes == len(lengths)
+    sample = reopened.sample_episodes(len(lengths))
+    assert sorted(set(sample["states"][:, 0].astype(int))) == list(range(len(lengths)))
+    assert len(sample["actions"]) == sum(lengths)
+
+
+def test_pending_episodes_on_disk_are_shared(tmp_path):
+    recommender = PendingEpisodes(max_size=2, root=str(tmp_path))
+    feedback_handler = PendingEpisodes(max_size=2, root=str(tmp_path))
+    recommender.put("d1", make_episode(3, 1))
+    recommender.put("d2", make_episode(3, 2))
+    os.utime(recommender._path("d1"), (0, 0))  # 가장 오래된 항목
+    recommender.put("d3", make_episode(3, 3))
+
+    assert len(feedback_handler) == 2
+    assert feedback_handler.pop("d1") is None
+    episode = feedback_handler.pop("d3")
+    np.testing.assert_array_equal(episode["states"][:, 0], 3)
+    assert recommender.pop("d3") is None
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+가상 사용자 시뮬레이터 테스트
+배열로 계산한 보상이 RLEnvironment.calculate_reward와 같은지, 선호 레이아웃을 추천하면 저장하는지 확인합니다.
+
+실행 (back/ 디렉토리에서):
+    python -m pytest rl_core/tests/test_simulator.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from rl_core.rl_env import RLConfig, RLEnvironment
+from rl_core.simulator import FEEDBACK_TYPES, SimulatedUsers, SimulatorConfig, random_layouts
+
+
+def test_rewards_match_calculate_reward():
+    config = RLConfig()
+    users = SimulatedUsers(config, num_users=50, seed=0)
+    episodes = users.sample_episodes(300)
+    result = users.feedback(episodes, random_layouts(episodes["num_cards"], config.ACTION_SPACE_SIZE, users.rng))
+
+    env = RLEnvironment(config)
+    expected = [
+        env.calculate_reward(FEEDBACK_TYPES[code], {'layout_difference': float(diff), 'layout_reward': float(layout_reward)})
+        for code, diff, layout_reward in zip(result["feedback"], result["layout_difference"], result["layout_reward"])
+    ]
+    np.testing.assert_allclose(result["rewards"], expected, rtol=1e-5)
+    assert set(result["feedback"].tolist()) == {0, 1, 2}
+
+
+def test_preferred_layout_is_saved():
+    config = RLConfig()
+    sim_config = SimulatorConfig()
+    sim_config.FEEDBACK_NOISE = 0.0
+    users = SimulatedUsers(config, sim_config, num_users=50, seed=1)
+    episodes = users.sample_episodes(200)
+    preferred = users.preferred_cells(episodes)
+
+    # 카드마다 서로 다른 셀, 카드가 없는 자리는 -1
+    for cells, num_cards in zip(preferred, episodes["num_cards"]):
+        assert sorted(cells[:num_cards]) == list(range(num_cards))
+        assert np.all(cells[num_cards:] == -1)
+
+    result = users.feedback(episodes, preferred)
+    assert np.all(result["feedback"] == 0)
+    np.testing.assert_array_equal(result["user_cells"], preferred)
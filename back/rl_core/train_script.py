@@ -8,6 +8,7 @@ import uuid
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Tuple, Optional
 import asyncio # 비동기 실행을 위해 임포트
+import argparse
 
 # 프로젝트 루트 경로를 Python Path에 추가 (상대 경로 임포트 문제 해결)
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,9 +24,12 @@ from back.db.connect import supabase
 # DB 모델 임포트
 from back.models.db_models import User, Card, RewardLog, LayoutLog 
 # RL Core 모듈 임포트
-from back.rl_core.rl_env import RLEnvironment, RLConfig
-from back.rl_core.rl_model import PPOModel, PPOConfig
+from back.rl_core.rl_env import RLEnvironment, RLConfig, VectorizedRLEnvironment
+from back.rl_core.rl_model import PPOModel, PPOConfig, pad_episodes, compute_gae
+from back.rl_core.replay_buffer import ReplayBuffer
+from back.rl_core.preprocess import CardFeatureEncoder
 
+USER_FETCH_CHUNK_SIZE = 200 # in_ 조회 한 번에 넣을 사용자 ID 수 (URL 길이 제한)
 
 # --- 데이터 로드 함수 ---
 async def fetch_user_data(user_id: str) -> Optional[Dict[str, Any]]:
@@ -39,6 +43,23 @@ async def fetch_user_data(user_id: str) -> Optional[Dict[str, Any]]:
         print(f"Error fetching user data for {user_id}: {e}")
         return None
 
+async def fetch_users_data(user_ids: List[str],
+                           user_cache: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    여러 사용자를 in_ 조회로 한꺼번에 가져옵니다. Dict[user_id, user_data] 형태로 반환.
+    user_cache가 주어지면 이미 있는 사용자는 조회하지 않고, 새로 조회한 사용자를 추가합니다.
+    """
+    cache = user_cache if user_cache is not None else {}
+    missing = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in cache]
+    for start in range(0, len(missing), USER_FETCH_CHUNK_SIZE):
+        chunk = missing[start:start + USER_FETCH_CHUNK_SIZE]
+        try:
+            response = await supabase.table('users').select('*').in_('id', chunk).execute()
+            cache.update({user['id']: user for user in response.data})
+        except Exception as e:
+            print(f"Error fetching user data for {len(chunk)} users: {e}")
+    return {user_id: cache[user_id] for user_id in user_ids if user_id in cache}
+
 async def fetch_all_cards_data() -> Dict[str, Dict[str, Any]]:
     """Supabase에서 모든 카드 데이터를 조회합니다. Dict[card_id_str, card_data_dict] 형태로 반환."""
     try:
@@ -74,137 +95,188 @@ async def create_training_episodes(
     reward_logs: List[RewardLog], 
     layout_logs: List[LayoutLog], 
     all_cards_data: Dict[str, Dict[str, Any]], 
-    rl_env: RLEnvironment
-) -> List[Dict[str, Any]]:
+    rl_env: RLEnvironment,
+    user_cache: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
     """
-    Supabase 로그를 기반으로 PPO 학습에 사용될 에피소드를 구성합니다.
-    각 에피소드는 (상태, 행동, 보상, 다음_상태, 종료_여부) 트랜지션의 시퀀스입니다.
+    Supabase 로그를 기반으로 PPO 학습에 사용될 트랜지션 버퍼를 구성합니다.
+    AI가 추천한 레이아웃(generated_layout)을 order_index 순서대로 그대로 '행동'으로 간주합니다.
+    1. 에피소드에 필요한 사용자를 in_ 조회로 한꺼번에 가져오고 (user_cache에 보관)
+    2. 로그마다 행동 목록만 뽑은 뒤
+    3. 모든 스텝의 상태 벡터를 (에피소드 수, 최대 스텝 수, STATE_DIM) 배열 연산으로 한 번에 만듭니다.
+    - 각 카드 배치 성공에 1.0, 이미 점유된 칸에 배치하면 그 직전 스텝에서 에피소드 종료
+    - 최종 피드백 보상은 에피소드가 끝났을 때 (마지막 카드 배치 또는 유효하지 않은 행동) 마지막 스텝에 더함
+    - row/col이 없는 카드는 건너뜀 (카드 인덱스는 진행)
+    Returns:
+        Dict[str, Any]: states (N, STATE_DIM), actions (N,), action_masks (N, ACTION_SPACE_SIZE) — 에피소드 순서로 이어 붙인 버퍼,
+            rewards / dones — 에피소드별 배열 리스트 (GAE 계산용).
     """
-    episodes_data = []
-    
+    config = rl_env.config
+    max_cols = config.MAX_COLS
+    max_cards = config.MAX_CARDS_IN_LAYOUT
+
     # layout_logs를 diary_id로 그룹화
     layout_logs_by_diary_id = {log.diary_id: log for log in layout_logs}
-    
-    for r_log in reward_logs:
+    matched = [(r_log, layout_logs_by_diary_id[r_log.diary_id]) for r_log in reward_logs
+               if r_log.diary_id in layout_logs_by_diary_id]
+    users = await fetch_users_data([l_log.user_id for _, l_log in matched], user_cache)
+
+    # 에피소드별 (카드 특징, 사용자 특징, 카드 수, 행동 목록, 행동을 취한 카드 인덱스, 최종 보상)
+    card_features, user_features, num_cards = [], [], []
+    episode_actions, episode_card_indices, final_rewards = [], [], []
+    for r_log, l_log in matched:
         diary_id = r_log.diary_id
-        if diary_id not in layout_logs_by_diary_id:
-            continue # 해당 레이아웃 로그가 없으면 스킵
-
-        l_log = layout_logs_by_diary_id[diary_id]
-        
-        # 유저 데이터 미리 로드 (캐싱 필요시 개선)
-        user_profile_data = await fetch_user_data(l_log.user_id)
+        user_profile_data = users.get(l_log.user_id)
         if not user_profile_data:
             print(f"Skipping diary {diary_id}: User {l_log.user_id} not found.")
             continue
 
-        # selected_card_ids 추출 (layout_logs의 generated_layout 키에서 가져옴)
         # generated_layout은 Dict[card_id, Dict[row, col, order_index]] 형태
         selected_card_ids = list(l_log.generated_layout.keys())
         if not selected_card_ids:
             print(f"Skipping diary {diary_id}: No cards in generated layout.")
             continue
-            
-        # 단일 에피소드 버퍼 (각 카드 배치 스텝)
-        episode_buffer = {
-            "states": [], "actions": [], "log_probs": [], 
-            "rewards": [], "dones": [], "user_final_layout": l_log.final_layout # 최종 레이아웃을 저장하여 나중에 보상 계산에 활용
-        }
-        
-        # 환경 초기화 (에피소드 시작)
-        initial_state = rl_env.reset(
-            user_id=l_log.user_id, 
-            selected_card_ids=selected_card_ids,
-            all_cards_data_raw=all_cards_data,
-            user_profile_data_raw=user_profile_data
-        )
-        current_state = initial_state
-        
-        # 이 시뮬레이션에서는 'AI가 추천한 레이아웃'을 그대로 '행동'으로 간주합니다.
-        # 즉, AI는 l_log.generated_layout에 기록된 대로 카드를 배치했다고 가정하고 학습합니다.
-        # 실제 PPO 환경의 step 함수와는 약간 다른 방식으로 데이터를 구성합니다.
-        
-        placed_cells = np.zeros((rl_env.config.MAX_ROWS, rl_env.config.MAX_COLS), dtype=np.int32)
-        
-        # generated_layout에 있는 카드들을 순서대로 처리 (order_index 활용)
-        # order_index가 없는 경우, 임의의 순서로 처리
+
         sorted_generated_layout_items = sorted(
             l_log.generated_layout.items(), 
             key=lambda item: item[1].get('order_index', 0)
         )
-
+        actions, card_indices = [], []
+        occupied = set()
         done = False
-        step_rewards = [] # 각 스텝의 보상 (나중에 누적)
-
         for i, (card_id, layout_info) in enumerate(sorted_generated_layout_items):
-            if done: # 이전 스텝에서 종료되었다면 (예: 유효하지 않은 행동으로)
-                break
-
             target_row = layout_info.get('row')
             target_col = layout_info.get('col')
-
             if target_row is None or target_col is None:
                 print(f"Warning: Missing row/col for card {card_id} in diary {diary_id}. Skipping.")
                 continue
 
-            action_idx = target_row * rl_env.config.MAX_COLS + target_col
-
-            # 해당 행동이 유효한지 검사
-            if placed_cells[target_row, target_col] == 1:
-                # 이미 점유된 칸에 배치 시도: 유효하지 않은 행동
-                current_reward = rl_env.config.REWARD_INVALID_ACTION
-                done = True
+            action_idx = target_row * max_cols + target_col
+            if action_idx in occupied:
+                # 이미 점유된 칸에 배치 시도: 유효하지 않은 행동 → 에피소드 종료
                 print(f"Diary {diary_id}: Invalid action during data creation - cell ({target_row}, {target_col}) already occupied.")
-            else:
-                placed_cells[target_row, target_col] = 1 # 그리드 상태 업데이트
-                current_reward = 1.0 # 각 카드 배치 성공에 대한 작은 보상 (학습의 안정성을 위해)
-                
-                # 가상의 next_state 계산을 위해 임시로 그리드 상태 업데이트 후 _get_state_vector 호출
-                temp_env = RLEnvironment(rl_env.config) # 환경 객체 복사 (deep copy 대신 간단히 새로 생성)
-                temp_env.current_user_id = l_log.user_id
-                temp_env.selected_cards_data = rl_env.selected_cards_data
-                temp_env.num_selected_cards = rl_env.num_selected_cards
-                temp_env.user_profile_data = user_profile_data
-                temp_env.grid_state = np.copy(placed_cells)
-                temp_env.current_card_index_to_place = i + 1 # 다음 카드 인덱스
-
-                next_state_sim = temp_env._get_state_vector()
-                
-                # 에피소드 버퍼에 추가
-                episode_buffer["states"].append(current_state)
-                episode_buffer["actions"].append(action_idx)
-                # log_prob은 PPOModel의 evaluate_actions에서 계산해야 함. 여기서는 더미 0.0
-                episode_buffer["log_probs"].append(0.0) 
-                episode_buffer["dones"].append(False) # 각 스텝은 일반적으로 done이 아님. 최종 단계에서만 True
-
-                current_state = next_state_sim # 상태 업데이트
-                step_rewards.append(current_reward)
-                
-                if i == len(selected_card_ids) - 1: # 마지막 카드 배치
-                    done = True
-                    episode_buffer["dones"][-1] = True # 마지막 스텝의 done을 True로
-                
-            if done: # 유효하지 않은 행동이나 마지막 카드 배치로 에피소드 조기 종료
+                done = True
                 break
-        
-        # 최종 보상 (RewardLog)을 마지막 스텝에 반영
-        if episode_buffer["states"]: # 스텝이 하나라도 있었으면
-            # accumulate rewards and append total reward to the last step's reward
-            final_feedback_reward = rl_env.calculate_reward(r_log.feedback_type, {'original_layout': l_log.generated_layout, 'final_layout': l_log.final_layout})
-            
-            # 모든 스텝 보상에 최종 보상을 더하는 방식 (누적)
-            # 또는 마지막 스텝에만 최종 보상을 주는 방식
-            # 여기서는 모든 스텝에 최종 보상 분배 (혹은 마지막 스텝에 집중)
-            # PPO는 최종 누적 보상을 바탕으로 학습하므로, 스텝별 보상과 최종 보상 합산
-            if done:
-                 step_rewards[-1] += final_feedback_reward # 최종 보상을 마지막 스텝에 더함
-
-            episode_buffer["rewards"] = step_rewards # 스텝별 보상 리스트
-
-            episodes_data.append(episode_buffer)
-
-    print(f"Created {len(episodes_data)} training episodes.")
-    return episodes_data
+            occupied.add(action_idx)
+            actions.append(action_idx)
+            card_indices.append(i)
+            if i == len(selected_card_ids) - 1: # 마지막 카드 배치
+                done = True
+
+        if not actions:
+            continue
+
+        selected_cards_data = [all_cards_data[cid] for cid in selected_card_ids if cid in all_cards_data]
+        card_features.append(VectorizedRLEnvironment.encode_cards(selected_cards_data, config))
+        user_features.append(VectorizedRLEnvironment.encode_user(user_profile_data))
+        num_cards.append(len(selected_cards_data))
+        episode_actions.append(actions)
+        episode_card_indices.append(card_indices)
+        final_rewards.append(
+            rl_env.calculate_reward(r_log.feedback_type, {'original_layout': l_log.generated_layout, 'final_layout': l_log.final_layout})
+            if done else None
+        )
+
+    num_episodes = len(episode_actions)
+    print(f"Created {num_episodes} training episodes.")
+    if num_episodes == 0:
+        return {"states": np.zeros((0, config.STATE_DIM), dtype=np.float32), "actions": np.zeros(0, dtype=np.int64),
+                "action_masks": np.zeros((0, config.ACTION_SPACE_SIZE), dtype=bool), "rewards": [], "dones": []}
+
+    # 패딩된 (에피소드, 스텝) 배열로 모든 상태를 한 번에 구성
+    lengths = np.array([len(actions) for actions in episode_actions])
+    max_steps = int(lengths.max())
+    valid = np.arange(max_steps)[None, :] < lengths[:, None]
+    actions = np.zeros((num_episodes, max_steps), dtype=np.int64)
+    actions[valid] = np.concatenate(episode_actions)
+    # 스텝 k의 상태: 카드 인덱스는 직전 행동을 취한 카드 다음 (첫 스텝은 0), 그리드는 k 이전 행동들로 점유
+    card_index = np.zeros((num_episodes, max_steps), dtype=np.float32)
+    card_index[valid] = np.concatenate([[0] + [i + 1 for i in indices[:-1]] for indices in episode_card_indices])
+    placed = np.zeros((num_episodes, max_steps, config.ACTION_SPACE_SIZE), dtype=np.float32)
+    placed[np.nonzero(valid) + (actions[valid],)] = 1.0
+    grid = np.cumsum(placed, axis=1) - placed # 현재 스텝 이전까지의 배치
+
+    broadcast = (num_episodes, max_steps)
+    states = np.concatenate([
+        np.broadcast_to(np.stack(user_features)[:, None, :], broadcast + (config.NUM_USER_FEATURES,)),
+        (card_index / max_cards)[..., None],
+        np.broadcast_to((np.array(num_cards) / max_cards)[:, None, None], broadcast + (1,)),
+        np.broadcast_to(np.stack(card_features).reshape(num_episodes, 1, -1), broadcast + (max_cards * config.NUM_CARD_FEATURES,)),
+        grid
+    ], axis=2).astype(np.float32)[valid]
+
+    # 스텝 보상 1.0, 에피소드가 끝났으면 마지막 스텝에 최종 보상을 더하고 done 표시
+    split_points = np.cumsum(lengths)[:-1]
+    rewards = np.split(np.ones(int(lengths.sum()), dtype=np.float32), split_points)
+    dones = np.split(np.zeros(int(lengths.sum()), dtype=bool), split_points)
+    for episode_rewards, episode_dones, final_reward in zip(rewards, dones, final_rewards):
+        if final_reward is not None:
+            episode_rewards[-1] += final_reward
+            episode_dones[-1] = True
+
+    return {
+        "states": states,
+        "actions": actions[valid],
+        "action_masks": grid[valid] == 0,
+        "rewards": rewards,
+        "dones": dones,
+    }
+
+# --- PPO 업데이트 (로그 기반 / 리플레이 버퍼 기반 학습 공용) ---
+def run_ppo_update(
+    rl_model: PPOModel,
+    ppo_config: PPOConfig,
+    buffer_states,
+    buffer_actions,
+    buffer_log_probs,
+    buffer_rewards: List[Any],
+    buffer_dones: List[Any],
+    buffer_action_masks=None,
+    buffer_weights: Optional[np.ndarray] = None,
+    buffer_values: Optional[torch.Tensor] = None
+) -> Tuple[Dict[str, float], np.ndarray]:
+    """
+    에피소드별 보상/종료 여부로 GAE를 계산하고 PPO 업데이트를 한 번 수행합니다.
+    buffer_weights(트랜지션별 중요도 가중치, 우선순위 샘플링 보정용)가 주어지면 정규화한 Advantage에 곱합니다.
+    buffer_values(현재 모델의 상태 가치, (N,))를 이미 계산했다면 넘겨서 순전파를 생략할 수 있습니다.
+    Returns:
+        Tuple[Dict[str, float], np.ndarray]: 업데이트 통계, 버퍼 순서의 Advantage (정규화 전)
+    """
+    # 모든 에피소드의 Advantage와 Return을 한 번에 계산
+    # 상태 가치는 버퍼 전체를 한 번에 순전파하고, (에피소드 수, 최대 스텝 수)로 패딩해 GAE 역방향 스캔 한 번으로 처리
+    if buffer_values is None:
+        with torch.no_grad():
+            _, values_tensor = rl_model.forward(torch.as_tensor(np.asarray(buffer_states), dtype=torch.float32))
+        buffer_values = values_tensor.squeeze(1)
+    padded_rewards, valid = pad_episodes(buffer_rewards)
+    padded_dones, _ = pad_episodes(buffer_dones)
+    padded_values = torch.zeros_like(padded_rewards)
+    padded_values[valid] = buffer_values # valid 순서(행 우선) = 버퍼 순서
+    advantages, returns = compute_gae(
+        padded_rewards, padded_values, padded_dones,
+        ppo_config.GAMMA, ppo_config.GAE_LAMBDA, valid=valid
+    )
+    buffer_advantages = advantages[valid].numpy() # 버퍼 순서와 정렬된 1차원 배열
+    buffer_returns = returns[valid].numpy()
+
+    normalize_advantages = True
+    update_advantages = buffer_advantages
+    if buffer_weights is not None:
+        update_advantages = (buffer_advantages - buffer_advantages.mean()) / (buffer_advantages.std() + 1e-8) * buffer_weights
+        normalize_advantages = False
+
+    # PPO 모델 업데이트
+    print(f"Updating PPO model with {len(buffer_states)} total experiences.")
+    update_stats = rl_model.update(
+        buffer_states, 
+        buffer_actions, 
+        buffer_log_probs, 
+        update_advantages,
+        buffer_returns,
+        buffer_action_masks,
+        normalize_advantages=normalize_advantages
+    )
+    return update_stats, buffer_advantages
 
 # --- 학습 스크립트의 메인 로직 ---
 async def train_model():
@@ -227,151 +299,114 @@ async def train_model():
     rl_model = PPOModel(state_dim=rl_config.STATE_DIM, action_dim=action_dim, ppo_config=ppo_config)
     
     # 이전에 학습된 모델이 있다면 로드
-    model_checkpoint_path = os.path.join(current_dir, "checkpoints", "layout_policy.pth")
+    model_checkpoint_path = os.path.join(current_dir, "checkpoints", CardFeatureEncoder.checkpoint_name("layout_policy"))
     rl_model.load_model(model_checkpoint_path)
 
     # 3. 학습 데이터 준비
     print("Creating training episodes from logs...")
-    training_episodes = await create_training_episodes(reward_logs, layout_logs, all_cards_data_db, rl_env)
+    training_buffer = await create_training_episodes(reward_logs, layout_logs, all_cards_data_db, rl_env)
 
-    if not training_episodes:
+    if not training_buffer["rewards"]:
         print("No training episodes created. Skipping training.")
         return
 
-    # 4. PPO 학습 루프
-    print(f"Starting PPO training with {len(training_episodes)} episodes.")
+    # 4. PPO 학습
+    print(f"Starting PPO training with {len(training_buffer['rewards'])} episodes.")
 
     # PPO는 일반적으로 On-policy 알고리즘이지만, 여기서는 과거 데이터를 사용하는 Off-policy 방식으로 구현
-    # 수집된 모든 경험을 한 번에 버퍼에 담아 학습
-    buffer_states = []
-    buffer_actions = []
-    buffer_log_probs = []
-    buffer_rewards = []
-    buffer_dones = []
-    
-    # 각 에피소드에서 트랜지션(상태, 행동, 보상, 다음 상태, 종료 여부) 추출
-    for episode in training_episodes:
-        episode_states = []
-        episode_actions = []
-        episode_log_probs = []
-        episode_rewards = []
-        episode_dones = []
-        
-        # PPO 학습을 위해, 실제 발생한 '행동'에 대한 log_prob을 재계산해야 합니다.
-        # 이전에 generated_layout에 기록된 레이아웃은 모델이 그 시점에 '취한 행동'으로 간주.
-        
-        # rl_env.reset()으로 초기 상태를 생성하여 모델에 입력
-        # 실제 환경에서 AI가 step을 밟아가며 레이아웃을 완성한 데이터를 만드는 과정 시뮬레이션
-        # 훈련 데이터셋 구성시: (state, action, reward, next_state, done)
-        
-        # 에피소드 버퍼 데이터를 PPO 모델 학습에 맞게 변환
-        # 각 step마다 (state, action, reward, next_state, done)을 기록하고, 
-        # 나중에 advantage와 return을 계산하여 PPO 업데이트
-        
-        current_grid_state_for_log_prob = np.zeros((rl_config.MAX_ROWS, rl_config.MAX_COLS), dtype=np.int32)
-        
-        for i in range(len(episode["states"])): # episode["states"]는 이미 _get_state_vector로 생성된 상태
-            state = episode["states"][i]
-            action = episode["actions"][i]
-            reward = episode["rewards"][i]
-            done = episode["dones"][i]
-            
-            # 이전에 해당 상태에서 모델이 이 액션을 취했을 때의 log_prob을 추정
-            # 실제 PPO에서는 'old_log_probs'를 버퍼에 저장하고 업데이트에 사용
-            # 여기서는 학습 데이터에서 가져온 'action'에 대한 log_prob을 모델을 통해 계산
-            
-            # 임시로 유효한 액션 (현재 그리드 상태 기반)
-            temp_available_actions = []
-            temp_grid_state = np.copy(current_grid_state_for_log_prob)
-            
-            for r in range(rl_config.MAX_ROWS):
-                for c in range(rl_config.MAX_COLS):
-                    if temp_grid_state[r, c] == 0:
-                        temp_available_actions.append(r * rl_config.MAX_COLS + c)
-            
-            # 모델을 사용하여 log_prob 계산
-            # 주의: 이 과정에서 모델은 아직 완전히 학습되지 않았을 수 있음
-            # on-policy PPO에서는 액션 선택과 동시에 log_prob을 기록함
-            # off-policy 학습에서는 replay buffer에서 샘플링 후 log_prob 재계산
-            
-            # 모델의 eval() 모드에서 log_prob 계산 (정책 변화 반영 X)
-            rl_model.eval()
-            with torch.no_grad():
-                state_tensor = torch.FloatTensor(state).unsqueeze(0)
-                action_tensor = torch.LongTensor([action])
-                
-                # 유효한 액션 마스킹 적용
-                mask = torch.ones(rl_config.ACTION_SPACE_SIZE) * -1e9
-                for valid_action_idx in temp_available_actions:
-                    mask[valid_action_idx] = 0
-                
-                action_logits, values = rl_model.forward(state_tensor)
-                masked_logits = action_logits + mask.unsqueeze(0)
-                dist = Categorical(logits=masked_logits)
-                
-                log_prob = dist.log_prob(action_tensor).item()
-                value = values.item()
-            
-            episode_states.append(state)
-            episode_actions.append(action)
-            episode_log_probs.append(log_prob)
-            episode_rewards.append(reward)
-            episode_dones.append(done) # 마지막 스텝만 True
-
-            # 그리드 상태 업데이트 (다음 스텝의 'temp_available_actions'에 영향)
-            row = action // rl_config.MAX_COLS
-            col = action % rl_config.MAX_COLS
-            if 0 <= row < rl_config.MAX_ROWS and 0 <= col < rl_config.MAX_COLS: # 유효성 검사
-                current_grid_state_for_log_prob[row, col] = 1
-
-        # 에피소드 종료 후, Advantage와 Return 계산
-        # values는 상태 가치 함수 값 (크리틱 네트워크 출력)
-        # 이 부분이 실제 강화학습 트랜지션의 핵심. 학습 데이터는 (state, action, reward, next_state, done)
-        # PPO는 (state, action, old_log_prob, advantage, return)을 사용.
-        # 그래서 values도 다시 계산해야 함.
-        
-        # 전체 에피소드의 states에 대해 value 예측
-        if not episode_states: # 에피소드 데이터가 없으면 스킵
-            continue
-
-        with torch.no_grad():
-            episode_states_tensor = torch.FloatTensor(np.array(episode_states))
-            _, values_tensor = rl_model.forward(episode_states_tensor)
-            episode_values = values_tensor.squeeze(1).numpy()
-        
-        # compute_advantages_and_returns는 numpy 배열이 아닌 torch tensor를 입력으로 받음
-        advantages, returns = rl_model.compute_advantages_and_returns(
-            torch.FloatTensor(np.array(episode_rewards)), 
-            torch.FloatTensor(np.array(episode_values)), 
-            torch.BoolTensor(np.array(episode_dones)) # dones는 boolean tensor
+    # generated_layout에 기록된 레이아웃을 모델이 그 시점에 '취한 행동'으로 간주하고,
+    # 그 행동의 log_prob(old policy)과 상태 가치를 버퍼 전체에 대해 한 번의 순전파로 계산
+    # (행동 선택 시와 같은 마스크 = 그 스텝 이전에 비어 있던 칸)
+    buffer_states = training_buffer["states"]
+    buffer_actions = training_buffer["actions"]
+    buffer_action_masks = training_buffer["action_masks"]
+    rl_model.eval()
+    with torch.no_grad():
+        log_probs, values, _ = rl_model.evaluate_actions(
+            torch.as_tensor(buffer_states),
+            torch.as_tensor(buffer_actions),
+            torch.as_tensor(buffer_action_masks)
         )
 
-        buffer_states.extend(episode_states)
-        buffer_actions.extend(episode_actions)
-        buffer_log_probs.extend(episode_log_probs)
-        buffer_rewards.extend(episode_rewards) # 이 부분은 PPO 학습에 직접 쓰이지 않지만 디버깅용
-        buffer_dones.extend(episode_dones) # 이 부분도 직접 쓰이지 않지만 디버깅용
+    update_stats, _ = run_ppo_update(
+        rl_model, ppo_config, buffer_states, buffer_actions, log_probs.numpy(),
+        training_buffer["rewards"], training_buffer["dones"], buffer_action_masks,
+        buffer_values=values.squeeze(-1)
+    )
+    print(f"PPO update stats: {update_stats}")
+
+    print("PPO training finished.")
+
+    # 5. 학습된 모델 저장
+    os.makedirs(os.path.dirname(model_checkpoint_path), exist_ok=True)
+    rl_model.save_model(model_checkpoint_path)
+    print("Training complete. Model saved.")
 
-    if not buffer_states:
-        print("No valid data for PPO training. Buffer is empty.")
+def train_from_replay(num_episodes: int, strategy: Optional[str] = None):
+    """
+    리플레이 버퍼(/rl/suggest-layout + /rl/learn-from-feedback가 기록한 경험)에서 에피소드를 샘플링해 학습합니다.
+    DB 조회나 에피소드 재구성 없이 저장된 상태/행동/마스크/로그 확률/보상 배열을 그대로 사용하고,
+    학습 후 샘플링한 에피소드의 우선순위를 |Advantage| 평균으로 갱신합니다.
+    """
+    print("Starting RL model training from replay buffer...")
+    rl_config = RLConfig()
+    ppo_config = PPOConfig()
+    strategy = strategy or ppo_config.REPLAY_SAMPLE_STRATEGY
+    replay_buffer = ReplayBuffer(
+        ppo_config.REPLAY_DIR,
+        rl_config.STATE_DIM,
+        rl_config.ACTION_SPACE_SIZE,
+        segment_size=ppo_config.REPLAY_SEGMENT_SIZE,
+        max_segments=ppo_config.REPLAY_MAX_SEGMENTS
+    )
+    print(f"Replay buffer: {replay_buffer.stats()}")
+
+    sample = replay_buffer.sample_episodes(
+        num_episodes,
+        strategy=strategy,
+        alpha=ppo_config.REPLAY_PRIORITY_ALPHA,
+        beta=ppo_config.REPLAY_PRIORITY_BETA,
+        half_life_sec=ppo_config.REPLAY_HALF_LIFE_SEC
+    )
+    if len(sample["episode_lengths"]) == 0:
+        print("Replay buffer is empty. Skipping training.")
         return
 
-    # PPO 모델 업데이트
-    print(f"Updating PPO model with {len(buffer_states)} total experiences.")
-    rl_model.update(
-        buffer_states, 
-        buffer_actions, 
-        buffer_log_probs, 
-        advantages.numpy(), # advantages, returns는 이미 torch tensor이므로 numpy로 변환
-        returns.numpy()
+    rl_model = PPOModel(state_dim=rl_config.STATE_DIM, action_dim=rl_config.ACTION_SPACE_SIZE, ppo_config=ppo_config)
+    model_checkpoint_path = os.path.join(current_dir, "checkpoints", CardFeatureEncoder.checkpoint_name("layout_policy"))
+    rl_model.load_model(model_checkpoint_path)
+
+    # 트랜지션 배열을 에피소드별 보상/종료 여부 리스트로 나눔 (GAE 계산용)
+    split_points = np.cumsum(sample["episode_lengths"])[:-1]
+    episode_rewards = np.split(sample["rewards"], split_points)
+    episode_dones = np.split(sample["dones"], split_points)
+    print(f"Sampled {len(episode_rewards)} episodes ({len(sample['actions'])} transitions, strategy={strategy}).")
+
+    update_stats, advantages = run_ppo_update(
+        rl_model, ppo_config,
+        sample["states"], sample["actions"].astype(np.int64), sample["log_probs"],
+        episode_rewards, episode_dones, sample["masks"],
+        buffer_weights=sample["weights"] if strategy == "prioritized" else None
     )
+    print(f"PPO update stats: {update_stats}")
 
-    print("PPO training finished.")
+    priorities = [np.abs(adv).mean() for adv in np.split(advantages, split_points)]
+    replay_buffer.update_priorities(sample["keys"], np.asarray(priorities))
 
-    # 5. 학습된 모델 저장
     os.makedirs(os.path.dirname(model_checkpoint_path), exist_ok=True)
     rl_model.save_model(model_checkpoint_path)
     print("Training complete. Model saved.")
 
 if __name__ == "__main__":
-    asyncio.run(train_model())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="RL 레이아웃 정책 학습")
+    parser.add_argument("--source", choices=["logs", "replay"], default="logs",
+                        help="logs: Supabase 로그로 에피소드 재구성, replay: 리플레이 버퍼에서 샘플링")
+    parser.add_argument("--replay-episodes", type=int, default=4096, help="리플레이 버퍼에서 샘플링할 에피소드 수")
+    parser.add_argument("--replay-strategy", choices=["uniform", "prioritized", "recency"], default=None,
+                        help="샘플링 방식 (기본: PPOConfig.REPLAY_SAMPLE_STRATEGY)")
+    args = parser.parse_args()
+
+    if args.source == "replay":
+        train_from_replay(args.replay_episodes, args.replay_strategy)
+    else:
+        asyncio.run(train_model())
\ No newline at end of file
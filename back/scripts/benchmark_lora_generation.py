@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+LoRA 일기 생성 벤치마크 스크립트
+
+고정된 프롬프트 셋(lora/scripts/prepare_training_data.py의 카테고리별 예시)으로
+샘플링 설정 / dtype / 어댑터 병합 여부 / 배치 크기 조합마다 다음을 측정하고 JSON으로 저장합니다.
+- 지연: time-to-first-token, 배치당 전체 지연(p50/p95), tokens/sec, 최대 RSS
+- 품질 대리 지표: 반복률(단어 3-gram 중복 비율), 생성 길이, post_process_text 대체(원문 반환) 비율
+
+API와 같은 DiaryGenerator.generate_batch 경로(generate_personalized_text가 호출하는 경로)를 그대로 사용합니다.
+
+실행 예시 (back/ 디렉토리에서):
+    python scripts/benchmark_lora_generation.py
+    python scripts/benchmark_lora_generation.py --presets default,greedy --dtypes float32,bfloat16 \\
+        --merged off,on --batch-sizes 1,4 --output benchmarks/lora_generation.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "lora", "scripts"))
+
+import torch
+from peft import PeftModel
+
+from lora_core.config import DiaryGenerationConfig
+from lora_core.engine import DiaryGenerator, GenerationError
+from prepare_training_data import get_user_cards_from_dummy_data
+
+GENERATION_SUFFIX = "\n행복한 하루였다."
+
+# 비교할 샘플링 설정 (DiaryGenerationConfig.SAMPLING_PARAMS 기준으로 덮어씀)
+SAMPLING_PRESETS = {
+    "default": {},
+    "greedy": {"do_sample": False, "top_k": None, "top_p": None, "temperature": None},
+    "low_temp": {"temperature": 0.5, "top_p": 0.9},
+    "no_repeat_off": {"no_repeat_ngram_size": 0, "repetition_penalty": 1.0},
+}
+
+
+# --- 측정 도구 ---
+class RSSSampler:
+    """측정 구간 동안 /proc/self/status의 VmRSS를 주기적으로 읽어 최댓값(MB)을 기록합니다."""
+    def __init__(self, interval_sec: float = 0.05):
+        self.interval_sec = interval_sec
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_mb() -> float:
+        try:
+            with open("/proc/self/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        import resource  # /proc이 없는 환경(macOS)에서는 프로세스 전체 최댓값으로 대신함
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self.current_mb())
+            self._stop.wait(self.interval_sec)
+
+    def __enter__(self):
+        self.peak_mb = self.current_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self.current_mb())
+
+
+class FirstForwardTimer:
+    """generate 호출마다 첫 forward(프롬프트 prefill → 첫 토큰)가 끝난 시각을 기록합니다."""
+    def __init__(self, module):
+        self.first_at = None
+        self._handle = module.register_forward_hook(self._hook)
+
+    def _hook(self, *_):
+        if self.first_at is None:
+            self.first_at = time.perf_counter()
+
+    def reset(self):
+        self.first_at = None
+
+    def remove(self):
+        self._handle.remove()
+
+
+def repetition_rate(text: str, n: int = 3) -> float:
+    """단어 n-gram 중 이미 나온 n-gram의 비율 (0이면 반복 없음)."""
+    words = text.split()
+    ngrams = [tuple(words[i:i + n]) for i in range(len(words) - n + 1)]
+    if not ngrams:
+        return 0.0
+    return 1 - len(set(ngrams)) / len(ngrams)
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+# --- 벤치마크 ---
+def load_prompts(max_prompts: int):
+    """카테고리별 더미 카드에서 content(짧은 메모)를 원문으로 사용합니다."""
+    cards = get_user_cards_from_dummy_data()
+    prompts = [{"category": card["category"], "text": card["content"] or card["text_final"]} for card in cards]
+    return prompts[:max_prompts] if max_prompts else prompts
+
+
+def run_config(generator: DiaryGenerator, prompts, batch_size: int, repeats: int, seed: int):
+    """현재 생성기 설정으로 프롬프트 셋 전체를 repeats번 생성하고 지표를 계산합니다."""
+    target = generator.model.get_base_model() if isinstance(generator.model, PeftModel) else generator.model
+    timer = FirstForwardTimer(target)
+    generator.stats.reset()
+    torch.manual_seed(seed)
+
+    ttfts, latencies, outputs = [], [], []
+    failed = 0 # 추론 실패(GenerationError)로 결과가 없는 요청 수
+    try:
+        with RSSSampler() as rss:
+            for _ in range(repeats):
+                for start in range(0, len(prompts), batch_size):
+                    batch = prompts[start:start + batch_size]
+                    texts = [p["text"] for p in batch]
+                    timer.reset()
+                    batch_start = time.perf_counter()
+                    try:
+                        generated = generator.generate_batch(texts)
+                    except GenerationError as e:
+                        print(f"   ❌ 배치 생성 실패: {e}")
+                        failed += len(texts)
+                        continue
+                    latencies.append(time.perf_counter() - batch_start)
+                    if timer.first_at is not None:
+                        ttfts.append(timer.first_at - batch_start)
+                    outputs.extend(zip(texts, generated))
+    finally:
+        timer.remove()
+
+    bodies = [generated[:-len(GENERATION_SUFFIX)] if generated.endswith(GENERATION_SUFFIX) else generated
+              for _, generated in outputs]
+    fallbacks = failed + sum(1 for (original, _), body in zip(outputs, bodies) if body.strip() == original.strip())
+    if not outputs:
+        raise RuntimeError(f"모든 배치의 생성이 실패했습니다 ({failed}건).")
+    stats = generator.stats
+
+    return {
+        "requests": len(outputs) + failed,
+        "batches": len(latencies),
+        "ttft_sec": {
+            "mean": round(statistics.mean(ttfts), 4) if ttfts else None,
+            "p50": round(percentile(ttfts, 0.5), 4) if ttfts else None,
+            "p95": round(percentile(ttfts, 0.95), 4) if ttfts else None,
+        },
+        "batch_latency_sec": {
+            "mean": round(statistics.mean(latencies), 4),
+            "p50": round(percentile(latencies, 0.5), 4),
+            "p95": round(percentile(latencies, 0.95), 4),
+            "total": round(sum(latencies), 3),
+        },
+        "tokens_per_sec": round(stats.new_tokens / stats.elapsed, 2) if stats.elapsed > 0 else 0.0,
+        "avg_new_tokens": round(stats.new_tokens / len(outputs), 2) if outputs else 0.0,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "quality": {
+            "repetition_rate": round(statistics.mean(repetition_rate(body) for body in bodies), 4),
+            "avg_length_chars": round(statistics.mean(len(body) for body in bodies), 1),
+            "fallback_rate": round(fallbacks / (len(outputs) + failed), 4),
+        },
+        "samples": [{"input": original, "output": generated} for original, generated in outputs[:3]],
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LoRA 일기 생성 지연/품질 벤치마크")
+    parser.add_argument("--presets", default="default,greedy", help=f"샘플링 설정 ({', '.join(SAMPLING_PRESETS)})")
+    parser.add_argument("--dtypes", default="auto", help="쉼표로 구분 (auto, float32, bfloat16, float16)")
+    parser.add_argument("--merged", default="off", help="off, on 또는 off,on (on: merge_and_unload로 어댑터를 가중치에 병합)")
+    parser.add_argument("--batch-sizes", default="1", help="쉼표로 구분한 배치 크기")
+    parser.add_argument("--repeats", type=int, default=1, help="프롬프트 셋 반복 횟수")
+    parser.add_argument("--max-prompts", type=int, default=0, help="0이면 전체 프롬프트 사용")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="결과 JSON 경로 (기본: benchmarks/lora_generation_<시각>.json)")
+    args = parser.parse_args()
+
+    presets = args.presets.split(",")
+    unknown = [name for name in presets if name not in SAMPLING_PRESETS]
+    if unknown:
+        parser.error(f"알 수 없는 샘플링 설정: {unknown}")
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    prompts = load_prompts(args.max_prompts)
+    print(f"📏 벤치마크 시작: 프롬프트 {len(prompts)}개 × {args.repeats}회")
+
+    results = []
+    for dtype in args.dtypes.split(","):
+        config = DiaryGenerationConfig()
+        config.TORCH_DTYPE = dtype
+        base_sampling = dict(config.SAMPLING_PARAMS)
+
+        generator = DiaryGenerator(config)
+        load_start = time.perf_counter()
+        generator.load()
+        load_time = time.perf_counter() - load_start
+        if generator.model is None:
+            print(f"❌ 모델 로드 실패 (dtype={dtype}): {generator.load_error}")
+            continue
+        if not generator.is_loaded:
+            print(f"⚠️ 어댑터 없이 베이스 모델로 측정합니다: {generator.load_error}")
+        generator.warmup()
+
+        for merged in args.merged.split(","):
+            if merged == "on":
+                if not isinstance(generator.model, PeftModel):
+                    print("⚠️ 병합할 어댑터가 없어 merged=on을 건너뜁니다.")
+                    continue
+                generator.model = generator.model.merge_and_unload()
+                generator.warmup()
+
+            for preset in presets:
+                config.SAMPLING_PARAMS = {**base_sampling, **SAMPLING_PRESETS[preset]}
+                for batch_size in batch_sizes:
+                    label = f"dtype={dtype} merged={merged} preset={preset} batch={batch_size}"
+                    print(f"▶️ {label}")
+                    metrics = run_config(generator, prompts, batch_size, args.repeats, args.seed)
+                    print(f"   ttft p50={metrics['ttft_sec']['p50']}s, {metrics['tokens_per_sec']} tokens/sec, "
+                          f"latency p95={metrics['batch_latency_sec']['p95']}s, rss={metrics['peak_rss_mb']}MB, "
+                          f"fallback={metrics['quality']['fallback_rate']}")
+                    results.append({
+                        "dtype": dtype,
+                        "model_dtype": str(next(generator.model.parameters()).dtype),
+                        "merged": merged == "on",
+                        "adapter_loaded": generator.is_loaded,
+                        "preset": preset,
+                        "sampling_params": config.SAMPLING_PARAMS,
+                        "batch_size": batch_size,
+                        "load_time_sec": round(load_time, 3),
+                        **metrics,
+                    })
+
+        del generator
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_commit": git_commit(),
+            "base_model": DiaryGenerationConfig.BASE_MODEL_NAME,
+            "adapter_version": DiaryGenerationConfig.ADAPTER_VERSION,
+            "prompts": len(prompts),
+            "repeats": args.repeats,
+            "seed": args.seed,
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "device": "cuda" if torch.cuda.is_available() else "cpu",
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join("benchmarks", f"lora_generation_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 벤치마크 결과 저장: {output} ({len(results)}개 조합)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+RL 레이아웃 정책 오프라인 벤치마크 스크립트 (가상 사용자 시뮬레이터 사용)
+
+rl_core/simulator.py의 가상 사용자로 다음을 측정하고 JSON으로 저장합니다.
+- 시뮬레이션 처리량: 카드 셋 생성 + 무작위 레이아웃 + 피드백/보상 계산 (episodes/sec)
+- 학습 처리량: 정책 롤아웃(predict_layouts + layout_trajectories)과 PPO 업데이트 (transitions/sec)
+- 수렴: 반복마다 평균 보상, save/regenerate 비율, 선호 레이아웃과의 평균 차이,
+  마지막에 greedy 정책과 무작위 레이아웃 기준선 비교
+
+실행 예시 (back/ 디렉토리에서):
+    python scripts/benchmark_rl_simulator.py
+    python scripts/benchmark_rl_simulator.py --sim-episodes 5000000 --iterations 50 --batch-episodes 8192 \\
+        --output benchmarks/rl_simulator.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+
+from rl_core.rl_env import RLConfig, VectorizedRLEnvironment
+from rl_core.rl_model import PPOConfig, PPOModel, compute_gae
+from rl_core.simulator import SimulatedUsers, random_layouts
+
+
+def pad_cells(layouts, width: int) -> np.ndarray:
+    cells = np.full((len(layouts), width), -1, dtype=np.int64)
+    for i, layout in enumerate(layouts):
+        cells[i, :len(layout)] = layout
+    return cells
+
+
+def summarize(result) -> dict:
+    feedback = result["feedback"]
+    return {
+        "mean_reward": round(float(result["rewards"].mean()), 3),
+        "save_rate": round(float((feedback == 0).mean()), 4),
+        "modify_rate": round(float((feedback == 1).mean()), 4),
+        "regenerate_rate": round(float((feedback == 2).mean()), 4),
+    }
+
+
+def benchmark_simulation(users: SimulatedUsers, total: int, chunk: int, rng) -> dict:
+    """피드백까지 포함한 에피소드 생성 처리량 (정책 없이 무작위 레이아웃)."""
+    start_time = time.perf_counter()
+    generated = 0
+    rewards_sum = 0.0
+    while generated < total:
+        n = min(chunk, total - generated)
+        episodes = users.sample_episodes(n)
+        cells = random_layouts(episodes["num_cards"], users.config.ACTION_SPACE_SIZE, rng)
+        result = users.feedback(episodes, cells)
+        rewards_sum += float(result["rewards"].sum())
+        generated += n
+    elapsed = time.perf_counter() - start_time
+    return {
+        "episodes": generated,
+        "elapsed_sec": round(elapsed, 3),
+        "episodes_per_sec": round(generated / elapsed, 1),
+        "random_layout_mean_reward": round(rewards_sum / generated, 3),
+    }
+
+
+def evaluate(model: PPOModel, users: SimulatedUsers, num_episodes: int, mode: str, rng) -> dict:
+    config = users.config
+    episodes = users.sample_episodes(num_episodes)
+    if mode == "random":
+        cells = random_layouts(episodes["num_cards"], config.ACTION_SPACE_SIZE, rng)
+    else:
+        env = VectorizedRLEnvironment(config, num_episodes)
+        states = env.reset(episodes["card_features"], episodes["num_cards"], episodes["user_features"])
+        cells = pad_cells(model.predict_layouts(states, episodes["num_cards"], mode), config.MAX_CARDS_IN_LAYOUT)
+    result = users.feedback(episodes, cells)
+    stats = summarize(result)
+    stats["preferred_distance"] = round(float(users.layout_difference(cells, users.preferred_cells(episodes)).mean()), 4)
+    return stats
+
+
+def train(model: PPOModel, users: SimulatedUsers, iterations: int, batch_episodes: int) -> dict:
+    """가상 사용자 피드백으로 PPO 학습 (에피소드 보상은 마지막 스텝에만)."""
+    config, ppo_config = users.config, model.ppo_config
+    history = []
+    rollout_time = update_time = 0.0
+    transitions = 0
+    for iteration in range(iterations):
+        rollout_start = time.perf_counter()
+        episodes = users.sample_episodes(batch_episodes)
+        env = VectorizedRLEnvironment(config, batch_episodes)
+        states = env.reset(episodes["card_features"], episodes["num_cards"], episodes["user_features"])
+        layouts = model.predict_layouts(states, episodes["num_cards"], "sample")
+        trajectories = model.layout_trajectories(states, layouts)
+        result = users.feedback(episodes, pad_cells(layouts, config.MAX_CARDS_IN_LAYOUT))
+
+        lengths = torch.as_tensor([len(layout) for layout in layouts])
+        valid = torch.arange(int(lengths.max())).unsqueeze(0) < lengths.unsqueeze(1)
+        last_step = (torch.arange(len(layouts)), lengths - 1)
+        rewards = torch.zeros(valid.shape)
+        rewards[last_step] = torch.as_tensor(result["rewards"])
+        dones = torch.zeros(valid.shape)
+        dones[last_step] = 1.0
+        batch = {key: np.concatenate([t[key] for t in trajectories]) for key in trajectories[0]}
+        values = torch.zeros(valid.shape)
+        values[valid] = torch.as_tensor(batch["values"])
+        advantages, returns = compute_gae(rewards, values, dones, ppo_config.GAMMA, ppo_config.GAE_LAMBDA, valid=valid)
+        rollout_time += time.perf_counter() - rollout_start
+
+        update_start = time.perf_counter()
+        update_stats = model.update(batch["states"], batch["actions"], batch["log_probs"],
+                                    advantages[valid].numpy(), returns[valid].numpy(), batch["masks"])
+        update_time += time.perf_counter() - update_start
+        transitions += len(batch["actions"])
+
+        stats = {"iteration": iteration + 1, **summarize(result),
+                 "approx_kl": update_stats["approx_kl"], "epochs": update_stats["epochs"]}
+        history.append(stats)
+        print(f"   iter {iteration + 1}: reward={stats['mean_reward']}, save={stats['save_rate']}, "
+              f"regenerate={stats['regenerate_rate']}, kl={stats['approx_kl']}")
+
+    return {
+        "iterations": iterations,
+        "batch_episodes": batch_episodes,
+        "transitions": transitions,
+        "rollout_transitions_per_sec": round(transitions / rollout_time, 1) if rollout_time else None,
+        "update_transitions_per_sec": round(transitions / update_time, 1) if update_time else None,
+        "history": history,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가상 사용자 시뮬레이터로 RL 레이아웃 정책 처리량/수렴 측정")
+    parser.add_argument("--num-users", type=int, default=1000)
+    parser.add_argument("--sim-episodes", type=int, default=1_000_000, help="시뮬레이션 처리량 측정 에피소드 수")
+    parser.add_argument("--sim-chunk", type=int, default=100_000, help="한 번에 생성할 에피소드 수")
+    parser.add_argument("--iterations", type=int, default=20, help="PPO 학습 반복 횟수")
+    parser.add_argument("--batch-episodes", type=int, default=4096, help="반복마다 롤아웃할 에피소드 수")
+    parser.add_argument("--eval-episodes", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="결과 JSON 경로 (기본: benchmarks/rl_simulator_<시각>.json)")
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+    config = RLConfig()
+    users = SimulatedUsers(config, num_users=args.num_users, seed=args.seed)
+    model = PPOModel(config.STATE_DIM, config.ACTION_SPACE_SIZE, PPOConfig())
+
+    print(f"📏 시뮬레이션 처리량 측정: {args.sim_episodes}개 에피소드")
+    simulation = benchmark_simulation(users, args.sim_episodes, args.sim_chunk, rng)
+    print(f"   {simulation['episodes_per_sec']} episodes/sec")
+
+    before = {mode: evaluate(model, users, args.eval_episodes, mode, rng) for mode in ("random", "greedy")}
+    print(f"▶️ PPO 학습: {args.iterations}회 × {args.batch_episodes}개 에피소드")
+    training = train(model, users, args.iterations, args.batch_episodes)
+    after = {mode: evaluate(model, users, args.eval_episodes, mode, rng) for mode in ("sample", "greedy")}
+    print(f"   학습 전 greedy: {before['greedy']}")
+    print(f"   학습 후 greedy: {after['greedy']}")
+    print(f"   무작위 기준선: {before['random']}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "num_users": args.num_users,
+            "seed": args.seed,
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "platform": platform.platform(),
+        },
+        "simulation": simulation,
+        "training": training,
+        "evaluation": {"before": before, "after": after},
+    }
+
+    output = args.output or os.path.join("benchmarks", f"rl_simulator_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 벤치마크 결과 저장: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,35 +10,47 @@ BASE_MODEL_NAME = "EleutherAI/polyglot-ko-1.3b"
 # 예: LORA_MODEL_DIR = "/root/lora/models/lora/checkpoint-새로운숫자"
 LORA_MODEL_DIR = "/root/lora/models/lora/checkpoint-5" # 학습 후 실제 경로로 변경 필요!
 
-print(f"--- 모델 로딩 시작: {BASE_MODEL_NAME} ---")
-
-tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL_NAME)
-# Polyglot-ko의 경우 EOS 토큰이 이미 잘 설정되어 있을 수 있습니다.
-# 확실하게 설정하되, 모델의 기본 설정을 존중합니다.
-if tokenizer.eos_token_id is None: # eos_token_id가 없다면 pad_token을 eos로 설정
-    tokenizer.pad_token = tokenizer.eos_token
-    tokenizer.pad_token_id = tokenizer.eos_token_id # pad_token_id도 명시적으로 설정
-elif tokenizer.pad_token is None: # eos_token_id는 있는데 pad_token이 없다면 pad_token을 eos로
-    tokenizer.pad_token = tokenizer.eos_token
-    tokenizer.pad_token_id = tokenizer.eos_token_id
-
-tokenizer.padding_side = "right"
-
-base_model = AutoModelForCausalLM.from_pretrained(
-    BASE_MODEL_NAME,
-    torch_dtype=torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16,
-    load_in_4bit=True,
-    device_map="auto"
-)
-
-# LoRA 가중치 로드 및 병합
-model = PeftModel.from_pretrained(base_model, LORA_MODEL_DIR, is_local_path=True)
-print("--- LoRA 가중치 병합 중 ---")
-model = model.merge_and_unload()
-print("--- LoRA 가중치 병합 완료! ---")
-model.eval()
-
-print(f"--- 모델 로딩 및 병합 완료! ({LORA_MODEL_DIR} 적용) ---\n")
+tokenizer = None
+model = None
+
+def load_model(lora_model_dir: str = LORA_MODEL_DIR, load_in_4bit: bool = True):
+    """
+    베이스 모델에 LoRA 가중치를 병합해 (tokenizer, model)을 반환합니다.
+    GPU가 없으면 4비트 양자화 없이 CPU에서 float32로 로드합니다.
+    """
+    print(f"--- 모델 로딩 시작: {BASE_MODEL_NAME} ---")
+
+    tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL_NAME)
+    # Polyglot-ko의 경우 EOS 토큰이 이미 잘 설정되어 있을 수 있습니다.
+    # 확실하게 설정하되, 모델의 기본 설정을 존중합니다.
+    if tokenizer.eos_token_id is None: # eos_token_id가 없다면 pad_token을 eos로 설정
+        tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.pad_token_id = tokenizer.eos_token_id # pad_token_id도 명시적으로 설정
+    elif tokenizer.pad_token is None: # eos_token_id는 있는데 pad_token이 없다면 pad_token을 eos로
+        tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+
+    tokenizer.padding_side = "right"
+
+    if torch.cuda.is_available():
+        base_model = AutoModelForCausalLM.from_pretrained(
+            BASE_MODEL_NAME,
+            torch_dtype=torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16,
+            load_in_4bit=load_in_4bit,
+            device_map="auto"
+        )
+    else:
+        base_model = AutoModelForCausalLM.from_pretrained(BASE_MODEL_NAME, torch_dtype=torch.float32)
+
+    # LoRA 가중치 로드 및 병합
+    model = PeftModel.from_pretrained(base_model, lora_model_dir, is_local_path=True)
+    print("--- LoRA 가중치 병합 중 ---")
+    model = model.merge_and_unload()
+    print("--- LoRA 가중치 병합 완료! ---")
+    model.eval()
+
+    print(f"--- 모델 로딩 및 병합 완료! ({lora_model_dir} 적용) ---\n")
+    return tokenizer, model
 
 # 사용자별 스타일 정보
 USER_STYLES = {
@@ -48,6 +60,53 @@ USER_STYLES = {
     "user_D": "철학적이고 깊이 있는 스타일"
 }
 
+# 생성 파라미터 조정 - 더 자연스러운 일기 생성을 위해
+SAMPLING_PARAMS = {
+    "do_sample": True,
+    "top_k": 50,        # 더 다양한 선택을 위해 증가
+    "top_p": 0.9,       # 더 자연스러운 생성을 위해 증가
+    "temperature": 0.7, # 적당한 창의성
+    "no_repeat_ngram_size": 3,  # 반복 방지
+    "repetition_penalty": 1.1   # 반복 패널티
+}
+
+# 프롬프트 생성 - 사용자별 말투로 일기 작성
+def build_diary_prompt(user_id: str, diary_input: str) -> str:
+    style = USER_STYLES.get(user_id, "일반적인 스타일")
+    return f"다음 일기를 {user_id}의 말투로 다시 작성해줘. {style}로 5-10줄의 일기를 작성해줘.\n\n입력 일기: {diary_input}\n\n{user_id}의 말투로 작성:"
+
+# 생성 결과 후처리 - 프롬프트/특수 토큰 제거 후 5-10줄로 정리
+def format_generated_diary(user_id: str, generated_text: str) -> str:
+    # 프롬프트 부분 잘라내기
+    if f"{user_id}의 말투로 작성:" in generated_text:
+        generated_text = generated_text.split(f"{user_id}의 말투로 작성:")[1].strip()
+    
+    # 특수 토큰들 제거
+    special_tokens = ["</s>", "<s>", "[INST]", "[/INST]", "[INGLMENTS]", "[/INGLMENTS]", "[INMESSAYS]", "[/INMESSAYS]", "[IMNSTATER]", "[/IMNSTATER]", "[IMNST", "[/IMNST"]
+    for token in special_tokens:
+        generated_text = generated_text.replace(token, "")
+    
+    # 5-10줄로 조정
+    lines = generated_text.split('.')
+    lines = [line.strip() for line in lines if line.strip()]
+    
+    if len(lines) > 10:
+        lines = lines[:10]
+    elif len(lines) < 5:
+        # 짧으면 문장을 더 추가
+        additional_sentences = [
+            "하루를 마무리하며 감사한 마음을 가졌다.",
+            "내일도 좋은 하루가 되길 바란다.",
+            "이런 순간들이 소중하다고 생각한다.",
+            "시간이 흘러도 이 기억은 남을 것 같다."
+        ]
+        lines.extend(additional_sentences[:5-len(lines)])
+    
+    # 줄글 형태로 재구성
+    formatted_diary = '. '.join(lines) + '.'
+    
+    return formatted_diary.strip()
+
 # 텍스트 생성 함수
 def generate_diary_text(user_id: str, diary_input: str, max_new_tokens: int = 150):
     """
@@ -58,10 +117,7 @@ def generate_diary_text(user_id: str, diary_input: str, max_new_tokens: int = 15
         diary_input: 사용자가 입력한 일기 텍스트
         max_new_tokens: 생성할 최대 토큰 수
     """
-    style = USER_STYLES.get(user_id, "일반적인 스타일")
-    
-    # 프롬프트 생성 - 사용자별 말투로 일기 작성
-    prompt = f"다음 일기를 {user_id}의 말투로 다시 작성해줘. {style}로 5-10줄의 일기를 작성해줘.\n\n입력 일기: {diary_input}\n\n{user_id}의 말투로 작성:"
+    prompt = build_diary_prompt(user_id, diary_input)
 
     # 토큰화 시 attention_mask 명시적 설정
     inputs = tokenizer(
@@ -76,55 +132,22 @@ def generate_diary_text(user_id: str, diary_input: str, max_new_tokens: int = 15
     input_ids = inputs.input_ids.to(model.device)
     attention_mask = inputs.attention_mask.to(model.device)
 
-    # 생성 파라미터 조정 - 더 자연스러운 일기 생성을 위해
     generated_ids = model.generate(
         input_ids,
         attention_mask=attention_mask,
-        do_sample=True,
-        top_k=50,        # 더 다양한 선택을 위해 증가
-        top_p=0.9,       # 더 자연스러운 생성을 위해 증가
-        temperature=0.7, # 적당한 창의성
         max_new_tokens=max_new_tokens,
         pad_token_id=tokenizer.pad_token_id,
         eos_token_id=tokenizer.eos_token_id,
-        no_repeat_ngram_size=3,  # 반복 방지
-        repetition_penalty=1.1   # 반복 패널티
+        **SAMPLING_PARAMS
     )
 
     generated_text = tokenizer.decode(generated_ids[0], skip_special_tokens=True)
-    
-    # 프롬프트 부분 잘라내기
-    if f"{user_id}의 말투로 작성:" in generated_text:
-        generated_text = generated_text.split(f"{user_id}의 말투로 작성:")[1].strip()
-    
-    # 특수 토큰들 제거
-    special_tokens = ["</s>", "<s>", "[INST]", "[/INST]", "[INGLMENTS]", "[/INGLMENTS]", "[INMESSAYS]", "[/INMESSAYS]", "[IMNSTATER]", "[/IMNSTATER]", "[IMNST", "[/IMNST"]
-    for token in special_tokens:
-        generated_text = generated_text.replace(token, "")
-    
-    # 5-10줄로 조정
-    lines = generated_text.split('.')
-    lines = [line.strip() for line in lines if line.strip()]
-    
-    if len(lines) > 10:
-        lines = lines[:10]
-    elif len(lines) < 5:
-        # 짧으면 문장을 더 추가
-        additional_sentences = [
-            "하루를 마무리하며 감사한 마음을 가졌다.",
-            "내일도 좋은 하루가 되길 바란다.",
-            "이런 순간들이 소중하다고 생각한다.",
-            "시간이 흘러도 이 기억은 남을 것 같다."
-        ]
-        lines.extend(additional_sentences[:5-len(lines)])
-    
-    # 줄글 형태로 재구성
-    formatted_diary = '. '.join(lines) + '.'
-    
-    return formatted_diary.strip()
+    return format_generated_diary(user_id, generated_text)
 
 # 사용자 입력 및 생성 실행
 if __name__ == "__main__":
+    tokenizer, model = load_model()
+
     print("--- 사용자별 말투 일기 생성기 ---")
     print("종료하려면 'exit'을 입력하세요.")
     print("\n사용 가능한 사용자:")
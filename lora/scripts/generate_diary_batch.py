@@ -0,0 +1,135 @@
+# scripts/generate_diary_batch.py
+# JSONL 파일의 (user_id, text) 목록으로 일기 초안을 배치 생성합니다 (야간 일괄 생성용).
+#
+# 입력 예시 (한 줄에 하나):
+#   {"id": "diary-1", "user_id": "user_A", "text": "오늘은 비가 왔다."}
+# 실행 예시 (lora/ 디렉토리에서):
+#   python scripts/generate_diary_batch.py --input data/batch_prompts.jsonl --output data/batch_outputs.jsonl
+#
+# 결과는 배치마다 바로 출력 파일에 추가되며, 다시 실행하면 이미 생성된 id는 건너뜁니다.
+import argparse
+import json
+import os
+import time
+
+import torch
+
+from generate_diary import LORA_MODEL_DIR, SAMPLING_PARAMS, load_model, build_diary_prompt, format_generated_diary
+
+
+def read_prompts(input_path: str):
+    """입력 JSONL을 읽습니다. id가 없으면 줄 번호를 id로 사용합니다."""
+    prompts = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if not row.get("user_id") or not row.get("text"):
+                print(f"경고: user_id 또는 text가 없는 줄을 건너뜀 (line {line_no + 1})")
+                continue
+            row["id"] = str(row.get("id", line_no))
+            prompts.append(row)
+    return prompts
+
+
+def read_completed_ids(output_path: str):
+    """이미 생성되어 출력 파일에 기록된 id 목록 (재시작 시 건너뛰기 위함)."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                completed.add(str(json.loads(line)["id"]))
+            except (json.JSONDecodeError, KeyError):
+                continue  # 중간에 끊긴 마지막 줄 등
+    return completed
+
+
+def generate_batch(tokenizer, model, rows, max_new_tokens: int):
+    """왼쪽 패딩된 배치 하나를 생성하고 (결과 텍스트 목록, 생성 토큰 수 목록)을 반환합니다."""
+    prompts = [build_diary_prompt(row["user_id"], row["text"]) for row in rows]
+    inputs = tokenizer(
+        prompts,
+        return_tensors="pt",
+        truncation=True,
+        max_length=512,
+        padding=True,
+        return_attention_mask=True
+    )
+    input_ids = inputs.input_ids.to(model.device)
+    attention_mask = inputs.attention_mask.to(model.device)
+
+    with torch.no_grad():
+        generated_ids = model.generate(
+            input_ids,
+            attention_mask=attention_mask,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            **SAMPLING_PARAMS
+        )
+
+    new_ids = generated_ids[:, input_ids.shape[1]:]
+    new_token_counts = (new_ids != tokenizer.pad_token_id).sum(dim=1).tolist()
+    texts = tokenizer.batch_decode(new_ids, skip_special_tokens=True)
+    return [format_generated_diary(row["user_id"], text) for row, text in zip(rows, texts)], new_token_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL 입력으로 사용자별 말투 일기를 배치 생성합니다.")
+    parser.add_argument("--input", required=True, help="입력 JSONL 경로 (user_id, text, 선택적으로 id)")
+    parser.add_argument("--output", required=True, help="결과 JSONL 경로 (이어쓰기)")
+    parser.add_argument("--lora-model-dir", default=LORA_MODEL_DIR, help="LoRA 체크포인트 경로")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=150)
+    parser.add_argument("--no-4bit", action="store_true", help="GPU에서도 4비트 양자화를 사용하지 않음")
+    args = parser.parse_args()
+
+    prompts = read_prompts(args.input)
+    completed = read_completed_ids(args.output)
+    pending = [row for row in prompts if row["id"] not in completed]
+    print(f"--- 총 {len(prompts)}개 중 {len(completed & {row['id'] for row in prompts})}개 완료됨, {len(pending)}개 생성 예정 ---")
+    if not pending:
+        return
+
+    tokenizer, model = load_model(args.lora_model_dir, load_in_4bit=not args.no_4bit)
+    tokenizer.padding_side = "left"  # 배치 생성은 왼쪽 패딩이어야 프롬프트 끝에서 바로 이어서 생성됨
+
+    # 길이가 비슷한 프롬프트끼리 묶어 패딩 낭비를 줄임
+    pending.sort(key=lambda row: len(tokenizer(build_diary_prompt(row["user_id"], row["text"]))["input_ids"]))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    total_tokens = 0
+    start_time = time.perf_counter()
+
+    with open(args.output, "a", encoding="utf-8") as out:
+        for batch_start in range(0, len(pending), args.batch_size):
+            rows = pending[batch_start:batch_start + args.batch_size]
+            batch_start_time = time.perf_counter()
+            texts, token_counts = generate_batch(tokenizer, model, rows, args.max_new_tokens)
+            batch_elapsed = time.perf_counter() - batch_start_time
+
+            for row, text, token_count in zip(rows, texts, token_counts):
+                out.write(json.dumps({
+                    "id": row["id"],
+                    "user_id": row["user_id"],
+                    "text": row["text"],
+                    "generated_text": text,
+                    "new_tokens": token_count
+                }, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())  # 중간에 중단되어도 여기까지의 결과는 보존
+
+            total_tokens += sum(token_counts)
+            done = batch_start + len(rows)
+            print(f"[{done}/{len(pending)}] 배치 {len(rows)}개, {sum(token_counts) / batch_elapsed:.1f} tokens/sec")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"--- 생성 완료: {len(pending)}개, {total_tokens} 토큰, {elapsed:.1f}초, {total_tokens / elapsed:.1f} tokens/sec ---")
+
+
+if __name__ == "__main__":
+    main()
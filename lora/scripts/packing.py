@@ -0,0 +1,123 @@
+# scripts/packing.py
+# LoRA 학습 데이터의 패딩 낭비를 줄이기 위한 유틸리티
+# - pack_examples: 짧은 예시 여러 개를 block_size 길이의 시퀀스 하나로 묶음 (예시는 쪼개지 않음)
+# - PackedDataCollator: 묶인 예시끼리 서로 attend하지 않도록 블록 대각 causal mask를 만듦
+# - ThroughputCallback: 에포크 시간과 (패딩 제외) tokens/sec 출력
+import bisect
+import time
+from typing import Dict, List
+
+import torch
+from transformers import TrainerCallback
+
+
+def tokenize_examples(tokenizer, texts: List[str], max_length: int) -> List[List[int]]:
+    """패딩 없이 토큰화하고, 각 예시 끝에 EOS를 붙여 생성 종료를 학습하도록 합니다."""
+    token_lists = []
+    for ids in tokenizer(list(texts), truncation=True, max_length=max_length - 1)["input_ids"]:
+        token_lists.append(ids + [tokenizer.eos_token_id])
+    return token_lists
+
+
+def pack_examples(token_lists: List[List[int]], block_size: int) -> List[Dict[str, List[int]]]:
+    """
+    Best-fit decreasing 방식으로 예시들을 block_size 이하의 블록에 채워 넣습니다.
+    블록을 남은 토큰 수별로 모아 두고(남은 토큰 수 목록은 정렬 유지), 예시가 들어가는 가장 빡빡한 블록을
+    bisect로 찾으므로 O(n log n)입니다 (남은 토큰 수의 종류는 block_size + 1개 이하).
+    각 블록은 input_ids, labels, position_ids, sequence_ids(같은 예시 = 같은 번호)를 가집니다.
+    예시가 바뀌는 첫 토큰은 이전 예시로부터 예측하지 않도록 labels를 -100으로 둡니다.
+    """
+    bins: List[List[List[int]]] = []
+    bins_by_space: Dict[int, List[int]] = {} # 남은 토큰 수 -> 블록 번호들
+    spaces: List[int] = [] # bins_by_space의 키 (오름차순)
+
+    def put(space: int, i: int):
+        if space not in bins_by_space:
+            bins_by_space[space] = []
+            bisect.insort(spaces, space)
+        bins_by_space[space].append(i)
+
+    for ids in sorted((ids[:block_size] for ids in token_lists), key=len, reverse=True):
+        pos = bisect.bisect_left(spaces, len(ids))
+        if pos < len(spaces):
+            space = spaces[pos]
+            i = bins_by_space[space].pop()
+            if not bins_by_space[space]:
+                del bins_by_space[space]
+                del spaces[pos]
+            bins[i].append(ids)
+        else:
+            space = block_size
+            i = len(bins)
+            bins.append([ids])
+        put(space - len(ids), i)
+
+    blocks = []
+    for examples in bins:
+        block = {"input_ids": [], "labels": [], "position_ids": [], "sequence_ids": []}
+        for seq_id, ids in enumerate(examples):
+            block["input_ids"].extend(ids)
+            block["labels"].extend([-100] + ids[1:])
+            block["position_ids"].extend(range(len(ids)))
+            block["sequence_ids"].extend([seq_id] * len(ids))
+        blocks.append(block)
+    return blocks
+
+
+class PackedDataCollator:
+    """
+    pack_examples로 만든 블록을 배치로 묶습니다.
+    attention_mask는 (batch, 1, L, L) 형태의 additive mask로, 같은 예시 안에서만 causal attention을 허용합니다.
+    (transformers는 4D mask를 그대로 사용하므로 sdpa/eager 모두에서 동작합니다.)
+    """
+    def __init__(self, pad_token_id: int, mask_dtype: torch.dtype = torch.float32):
+        self.pad_token_id = pad_token_id
+        self.mask_dtype = mask_dtype
+
+    def __call__(self, features: List[Dict[str, List[int]]]) -> Dict[str, torch.Tensor]:
+        max_len = max(len(f["input_ids"]) for f in features)
+        input_ids, labels, position_ids, sequence_ids = [], [], [], []
+        for f in features:
+            pad = max_len - len(f["input_ids"])
+            input_ids.append(f["input_ids"] + [self.pad_token_id] * pad)
+            labels.append(f["labels"] + [-100] * pad)
+            position_ids.append(f["position_ids"] + [0] * pad)
+            # 패딩 토큰은 각자 다른 시퀀스 번호를 주어 어떤 예시와도 섞이지 않게 함
+            sequence_ids.append(f["sequence_ids"] + [-1 - i for i in range(pad)])
+
+        seq = torch.tensor(sequence_ids)
+        causal = torch.tril(torch.ones(max_len, max_len, dtype=torch.bool))
+        allowed = (seq[:, :, None] == seq[:, None, :]) & causal
+        attention_mask = torch.zeros(len(features), 1, max_len, max_len, dtype=self.mask_dtype)
+        attention_mask.masked_fill_(~allowed[:, None], torch.finfo(self.mask_dtype).min)
+
+        return {
+            "input_ids": torch.tensor(input_ids),
+            "labels": torch.tensor(labels),
+            "position_ids": torch.tensor(position_ids),
+            "attention_mask": attention_mask,
+        }
+
+
+class ThroughputCallback(TrainerCallback):
+    """에포크마다 소요 시간과 실제(패딩 제외) 학습 토큰 처리량을 출력합니다."""
+    def __init__(self, real_tokens_per_epoch: int, padded_tokens_per_epoch: int):
+        self.real_tokens_per_epoch = real_tokens_per_epoch
+        self.padded_tokens_per_epoch = padded_tokens_per_epoch
+        self.epoch_times: List[float] = []
+        self._epoch_start = None
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._epoch_start = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        elapsed = time.perf_counter() - self._epoch_start
+        self.epoch_times.append(elapsed)
+        print(f"⏱️ epoch {len(self.epoch_times)}: {elapsed:.1f}초, "
+              f"{self.real_tokens_per_epoch / elapsed:.1f} tokens/sec (패딩 제외), "
+              f"패딩 비율 {1 - self.real_tokens_per_epoch / max(self.padded_tokens_per_epoch, 1):.1%}")
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if self.epoch_times:
+            avg = sum(self.epoch_times) / len(self.epoch_times)
+            print(f"⏱️ 평균 epoch 시간 {avg:.1f}초, 평균 {self.real_tokens_per_epoch / avg:.1f} tokens/sec")
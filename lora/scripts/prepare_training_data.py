@@ -1,13 +1,33 @@
-# DB 연결하기 전의 테스트 코드입니다.
-
 # scripts/prepare_training_data.py
+# 카드 데이터를 LoRA 학습용 JSONL로 변환합니다.
+# DB(또는 더미 데이터)에서 카드를 페이지 단위로 스트리밍하여 중복을 제거한 뒤 샤드 파일에 이어씁니다.
+# 메모리 사용량은 페이지 크기에만 비례하고, 다시 실행하면 마지막 커서 이후의 카드만 처리합니다.
+#
+# 결과 (lora/ 디렉토리 기준):
+#   data/shards/part-00000.jsonl ...   {"text": ...} 한 줄에 하나
+#   data/shards/manifest.json          샤드 목록/행 수/바이트 수, 다음 실행 커서 (seen.sqlite 내용의 사본)
+#   data/shards/seen.sqlite            이미 기록한 학습 텍스트의 해시 (중복 제거용) + manifest 원본
+#
+# 실행 예시 (lora/ 디렉토리에서):
+#   python scripts/prepare_training_data.py              # DB
+#   python scripts/prepare_training_data.py --source dummy
+#   python scripts/train_lora.py              # 기본 --data-files가 "data/shards/*.jsonl"
+import argparse
+import hashlib
 import json
 import os
+import sqlite3
+import sys
+import time
 from datetime import datetime, timedelta
 import random # 더미 데이터 생성에 필요
 
-# 학습 데이터를 저장할 파일 경로
-OUTPUT_FILE_PATH = "data/user_diaries.jsonl"
+# 학습 데이터를 저장할 경로
+SHARD_DIR = "data/shards"
+MANIFEST_FILE = "manifest.json"
+SEEN_DB_FILE = "seen.sqlite"
+PAGE_SIZE = 1000
+SHARD_MAX_ROWS = 100_000  # 샤드 하나에 담을 최대 행 수
 
 # --- 더미 데이터 불러오기 함수 ---
 def get_user_cards_from_dummy_data():
@@ -68,33 +88,180 @@ def format_data_for_lora(cards_data):
     
     return formatted_entries
 
-# --- 메인 실행 로직 ---
-def prepare_training_data():
+# --- 카드 스트리밍 ---
+def iter_cards_from_dummy_data(cursor=None, page_size=PAGE_SIZE):
+    """더미 카드를 DB와 같은 (페이지 목록, 다음 커서) 형태로 돌려줍니다."""
+    cards = get_user_cards_from_dummy_data()
+    start = cursor["offset"] if cursor else 0
+    for offset in range(start, len(cards), page_size):
+        page = cards[offset:offset + page_size]
+        yield page, {"offset": offset + len(page)}
+
+
+def iter_cards_from_db(cursor=None, page_size=PAGE_SIZE):
     """
-    더미 데이터를 불러와 전처리하고 파일로 저장하는 전체 프로세스를 실행합니다.
+    cards 테이블을 (created_at, id) 순서의 keyset 페이지네이션으로 읽습니다.
+    offset 방식과 달리 뒤쪽 페이지도 느려지지 않고, 마지막 커서부터 이어서 읽을 수 있습니다.
     """
-    print(f"--- 학습 데이터 준비 시작 (더미 데이터 사용) ---")
+    # back/ 의 DB 클라이언트 사용 (더미 모드에서는 필요 없으므로 여기서 임포트)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "back"))
+    from db.connect import supabase
 
-    try:
-        cards_data = get_user_cards_from_dummy_data()
-
-        if not cards_data:
-            print("학습할 더미 카드 데이터가 없습니다. 스크립트를 종료합니다.")
+    while True:
+        query = supabase.table('cards') \
+            .select('id, category, content, text_final, created_at') \
+            .not_.is_('text_final', 'null')
+        if cursor:
+            query = query.or_(
+                f"created_at.gt.{cursor['created_at']},"
+                f"and(created_at.eq.{cursor['created_at']},id.gt.{cursor['id']})"
+            )
+        page = query.order('created_at').order('id').limit(page_size).execute().data
+        if not page:
+            return
+        cursor = {"created_at": page[-1]["created_at"], "id": page[-1]["id"]}
+        yield page, cursor
+        if len(page) < page_size:
             return
 
-        formatted_entries = format_data_for_lora(cards_data)
 
-        # data 폴더가 없으면 생성
-        os.makedirs(os.path.dirname(OUTPUT_FILE_PATH), exist_ok=True)
+# --- 샤드 기록 ---
+def _write_manifest(shard_dir, manifest):
+    """임시 파일에 쓴 뒤 교체하여 중간에 중단되어도 manifest가 깨지지 않게 합니다."""
+    path = os.path.join(shard_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
-        with open(OUTPUT_FILE_PATH, "w", encoding="utf-8") as f:
-            for entry in formatted_entries:
-                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-        
-        print(f"총 {len(formatted_entries)}개의 학습 데이터가 '{OUTPUT_FILE_PATH}'에 성공적으로 저장되었습니다.")
 
-    except Exception as e:
-        print(f"학습 데이터 준비 중 오류 발생: {e}")
+def load_manifest(shard_dir):
+    path = os.path.join(shard_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"source": None, "cursor": None, "total_rows": 0, "duplicates": 0, "shards": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ShardWriter:
+    """
+    학습 예시를 샤드 JSONL 파일에 이어씁니다.
+    - seen.sqlite에 텍스트 해시를 기록하여 다시 실행해도 같은 예시가 두 번 들어가지 않음
+    - 페이지마다 샤드를 fsync한 뒤, 해시와 manifest(커서, 샤드별 바이트 수)를 seen.sqlite의 한 트랜잭션으로 확정
+      → 해시와 커서는 항상 함께 반영되거나 함께 빠짐. manifest.json은 확정 후에 쓰는 사본
+    - 재시작 시 확정된 manifest의 바이트 수 이후(중단된 실행의 흔적)는 잘라냄
+    """
+    def __init__(self, shard_dir, source, shard_max_rows=SHARD_MAX_ROWS):
+        os.makedirs(shard_dir, exist_ok=True)
+        self.shard_dir = shard_dir
+        self.shard_max_rows = shard_max_rows
+
+        self.seen = sqlite3.connect(os.path.join(shard_dir, SEEN_DB_FILE))
+        self.seen.execute("CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY)")
+        self.seen.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self.seen.execute("SELECT value FROM state WHERE key = 'manifest'").fetchone()
+        # state가 없으면 이전 형식(manifest.json만 있는 디렉토리)
+        self.manifest = json.loads(row[0]) if row else load_manifest(shard_dir)
+        if self.manifest["source"] not in (None, source):
+            self.seen.close()
+            raise ValueError(f"'{shard_dir}'는 {self.manifest['source']} 데이터로 만들어졌습니다. 다른 경로를 사용하세요.")
+        self.manifest["source"] = source
+
+        # 마지막으로 확정된 지점 이후에 쓰인 내용(중단된 실행의 흔적)은 버림
+        for shard in self.manifest["shards"]:
+            path = os.path.join(shard_dir, shard["file"])
+            if os.path.exists(path) and os.path.getsize(path) > shard["bytes"]:
+                with open(path, "r+b") as f:
+                    f.truncate(shard["bytes"])
+        _write_manifest(shard_dir, self.manifest)  # 사본이 확정 전 상태로 남아 있을 수 있음
+        self._file = None
+
+    @property
+    def cursor(self):
+        return self.manifest["cursor"]
+
+    def _current_shard(self):
+        shards = self.manifest["shards"]
+        if not shards or shards[-1]["rows"] >= self.shard_max_rows:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            shards.append({"file": f"part-{len(shards):05d}.jsonl", "rows": 0, "bytes": 0})
+        if self._file is None:
+            self._file = open(os.path.join(self.shard_dir, shards[-1]["file"]), "ab")
+        return shards[-1]
+
+    def write_page(self, entries, cursor):
+        """한 페이지 분량의 예시를 기록하고 커서를 확정합니다. (추가된 수, 중복 수)를 반환합니다."""
+        written, duplicates = 0, 0
+        for entry in entries:
+            digest = hashlib.sha256(entry["text"].encode("utf-8")).digest()
+            if self.seen.execute("INSERT OR IGNORE INTO seen (hash) VALUES (?)", (digest,)).rowcount == 0:
+                duplicates += 1
+                continue
+            shard = self._current_shard()
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+            self._file.write(line)
+            shard["rows"] += 1
+            shard["bytes"] += len(line)
+            written += 1
+
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.manifest["cursor"] = cursor
+        self.manifest["total_rows"] += written
+        self.manifest["duplicates"] += duplicates
+        self.manifest["updated_at"] = datetime.now().isoformat()
+        self.seen.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('manifest', ?)",
+                          (json.dumps(self.manifest, ensure_ascii=False),))
+        self.seen.commit()
+        _write_manifest(self.shard_dir, self.manifest)
+        return written, duplicates
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self.seen.close()
+
+
+# --- 메인 실행 로직 ---
+def prepare_training_data(source="db", shard_dir=SHARD_DIR, page_size=PAGE_SIZE, shard_max_rows=SHARD_MAX_ROWS):
+    """
+    카드를 페이지 단위로 읽어 학습 예시로 변환하고, 중복을 제거하여 샤드 파일에 이어씁니다.
+    이전 실행의 manifest가 있으면 그 커서 이후의 카드만 처리합니다.
+    """
+    print(f"--- 학습 데이터 준비 시작 (source={source}, 저장 위치 '{shard_dir}') ---")
+
+    writer = ShardWriter(shard_dir, source, shard_max_rows)
+    iter_cards = iter_cards_from_db if source == "db" else iter_cards_from_dummy_data
+    if writer.cursor:
+        print(f"이전 실행 이어서 처리: cursor={writer.cursor}")
+
+    start_time = time.perf_counter()
+    total_cards, total_written, total_duplicates = 0, 0, 0
+    try:
+        for page, cursor in iter_cards(writer.cursor, page_size):
+            written, duplicates = writer.write_page(format_data_for_lora(page), cursor)
+            total_cards += len(page)
+            total_written += written
+            total_duplicates += duplicates
+            elapsed = time.perf_counter() - start_time
+            print(f"카드 {total_cards}개 처리 ({total_cards / elapsed:.0f}개/초): 추가 {total_written}, 중복 {total_duplicates}")
+    finally:
+        writer.close()
+
+    print(f"총 {total_written}개의 학습 데이터가 추가되었습니다 (중복 {total_duplicates}개 제외). "
+          f"전체 {writer.manifest['total_rows']}개, 샤드 {len(writer.manifest['shards'])}개.")
+
 
 if __name__ == "__main__":
-    prepare_training_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="카드 데이터를 LoRA 학습용 샤드 JSONL로 변환합니다.")
+    parser.add_argument("--source", choices=["db", "dummy"], default="db")
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--shard-max-rows", type=int, default=SHARD_MAX_ROWS)
+    args = parser.parse_args()
+    prepare_training_data(args.source, args.shard_dir, args.page_size, args.shard_max_rows)
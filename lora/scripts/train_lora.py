@@ -1,9 +1,23 @@
 # scripts/train_lora.py
 from peft import LoraConfig, get_peft_model
 from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments, DataCollatorForSeq2Seq
-from datasets import load_dataset
+from datasets import load_dataset, Dataset
+import argparse
 import torch
 
+from packing import tokenize_examples, pack_examples, PackedDataCollator, ThroughputCallback
+
+# 데이터 구성 방식
+#   packing   : 짧은 예시들을 block_size 길이로 묶어 학습 (기본값, 패딩 거의 없음)
+#   dynamic   : 배치 내 최장 길이까지만 패딩 + 길이가 비슷한 예시끼리 배치 구성
+#   max_length: 기존 방식 (모든 예시를 2048 토큰으로 패딩) - 비교용
+parser = argparse.ArgumentParser(description="Polyglot-ko LoRA 학습")
+parser.add_argument("--mode", choices=["packing", "dynamic", "max_length"], default="packing")
+parser.add_argument("--block-size", type=int, default=512, help="packing 모드에서 시퀀스 하나의 길이")
+parser.add_argument("--data-files", default="data/shards/*.jsonl",
+                    help="학습 JSONL 경로 또는 glob (기본: prepare_training_data.py가 만드는 샤드)")
+args = parser.parse_args()
+
 # 모델 및 토크나이저 불러오기
 model_name = "EleutherAI/polyglot-ko-1.3b" # 이 부분은 이미 수정하셨을 겁니다.
 tokenizer = AutoTokenizer.from_pretrained(model_name)
@@ -38,20 +52,42 @@ model.print_trainable_parameters()
 print("---------------------------\n")
 
 # 데이터셋 불러오기
-dataset = load_dataset("json", data_files="data/user_diaries.jsonl")["train"]
+dataset = load_dataset("json", data_files=args.data_files)["train"]
+
+MAX_LENGTH = 2048
+
+if args.mode == "max_length":
+    # 데이터 전처리 함수: 텍스트를 토큰화하고 레이블 설정
+    def preprocess_function(examples):
+        tokenized_input = tokenizer(
+            examples["text"],
+            max_length=MAX_LENGTH, 
+            truncation=True,
+            padding="max_length" 
+        )
+        tokenized_input["labels"] = tokenized_input["input_ids"].copy() 
+        return tokenized_input
 
-# 데이터 전처리 함수: 텍스트를 토큰화하고 레이블 설정
-def preprocess_function(examples):
-    tokenized_input = tokenizer(
-        examples["text"],
-        max_length=2048, 
-        truncation=True,
-        padding="max_length" 
-    )
-    tokenized_input["labels"] = tokenized_input["input_ids"].copy() 
-    return tokenized_input
+    tokenized_dataset = dataset.map(preprocess_function, batched=True, remove_columns=["text"]) # 데이터셋 전처리
+    data_collator = DataCollatorForSeq2Seq(tokenizer, model=model, padding="longest", label_pad_token_id=tokenizer.pad_token_id)
+    real_tokens = sum(sum(mask) for mask in tokenized_dataset["attention_mask"])
+    padded_tokens = len(tokenized_dataset) * MAX_LENGTH
+else:
+    token_lists = tokenize_examples(tokenizer, dataset["text"], MAX_LENGTH)
+    real_tokens = sum(len(ids) for ids in token_lists)
 
-tokenized_dataset = dataset.map(preprocess_function, batched=True, remove_columns=["text"]) # 데이터셋 전처리
+    if args.mode == "packing":
+        blocks = pack_examples(token_lists, args.block_size)
+        tokenized_dataset = Dataset.from_list(blocks)
+        data_collator = PackedDataCollator(tokenizer.pad_token_id, mask_dtype=model.dtype)
+        real_tokens = sum(len(block["input_ids"]) for block in blocks)  # block_size보다 긴 예시는 잘림
+        padded_tokens = len(blocks) * args.block_size  # 배치 패딩 전 기준 상한
+        print(f"📦 {len(token_lists)}개 예시를 {len(blocks)}개 블록({args.block_size} 토큰)으로 패킹")
+    else:
+        # 패딩 위치는 loss에서 제외 (-100)
+        tokenized_dataset = Dataset.from_dict({"input_ids": token_lists, "labels": token_lists})
+        data_collator = DataCollatorForSeq2Seq(tokenizer, model=model, padding="longest", label_pad_token_id=-100)
+        padded_tokens = real_tokens  # 길이 그룹핑으로 배치 내 패딩은 최소화됨
 
 # 학습 인자 설정
 training_args = TrainingArguments(
@@ -64,6 +100,8 @@ training_args = TrainingArguments(
     save_steps=50, #저장 간격
     save_total_limit=1, #저장 최대 개수
     fp16=True, # 혼합 정밀도 학습 활성화
+    group_by_length=(args.mode == "dynamic"), # 길이가 비슷한 예시끼리 배치 구성
+    remove_unused_columns=(args.mode != "packing"), # packing 모드는 sequence_ids를 collator에서 사용
 )
 
 # Trainer 초기화 및 학습 시작
@@ -72,7 +110,8 @@ trainer = Trainer(
     args=training_args,
     train_dataset=tokenized_dataset,
     tokenizer=tokenizer,
-    data_collator=DataCollatorForSeq2Seq(tokenizer, model=model, padding="longest", label_pad_token_id=tokenizer.pad_token_id),
+    data_collator=data_collator,
+    callbacks=[ThroughputCallback(real_tokens, padded_tokens)],
 )
 
 trainer.train() # 학습 실행
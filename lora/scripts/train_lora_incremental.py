@@ -0,0 +1,247 @@
+# scripts/train_lora_incremental.py
+# 사용자별 증분 LoRA 학습
+#   1. text_final이 있는 사용자 카드 중 아직 학습하지 않은 카드만 고름 (사용자별로 학습한 카드 id를 기록)
+#      cards에는 updated_at이 없으므로 created_at 워터마크를 쓰면 나중에 text_final이 채워진 카드나
+#      created_at이 같은 카드를 놓칠 수 있어 id 집합으로 판단합니다.
+#   2. format_data_for_lora로 변환하여 학습 (이전 데이터는 소량만 섞어서 잊어버리지 않게 함)
+#   3. 마지막으로 게시된 어댑터(없으면 공용 어댑터 models/)에서 이어서 몇 step만 학습
+#   4. 새 버전으로 원자적으로 게시 → API는 재시작 없이 다음 요청부터 사용
+#   5. 새 데이터를 사용자별 데이터 파일(data/users/<user_id>.jsonl)에 이어쓰고 학습한 카드 id 기록
+# 학습 비용은 전체 데이터가 아니라 새 데이터 양에 비례합니다.
+#
+# 실행 예시 (lora/ 디렉토리에서):
+#   python scripts/train_lora_incremental.py --user-id <uuid>
+#   python scripts/train_lora_incremental.py --all-users
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+
+import torch
+from datasets import Dataset
+from peft import LoraConfig, PeftModel, get_peft_model
+from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments
+
+from packing import tokenize_examples, pack_examples, PackedDataCollator, ThroughputCallback
+from prepare_training_data import format_data_for_lora
+
+# back/ 의 DB 클라이언트와 어댑터 게시 로직을 API와 공유
+LORA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(LORA_DIR), "back"))
+
+from db.connect import supabase  # noqa: E402
+from lora_core.adapters import publish_adapter, read_current, user_adapter_dir, write_json_atomic  # noqa: E402
+
+BASE_MODEL_NAME = "EleutherAI/polyglot-ko-1.3b"
+SHARED_ADAPTER_DIR = os.path.join(LORA_DIR, "models")  # 사용자 어댑터가 없을 때 시작점
+USER_ADAPTER_ROOT = os.getenv("LORA_USER_ADAPTER_ROOT", os.path.join(LORA_DIR, "models", "users"))  # (.gitignore)
+USER_DATA_DIR = os.getenv("LORA_USER_DATA_DIR", os.path.join(LORA_DIR, "data", "users"))  # 사용자 일기 원문 (.gitignore)
+STATE_FILE = "state.json"
+PAGE_SIZE = 500
+
+
+# --- 학습 상태 ---
+def load_state(user_id: str) -> dict:
+    path = os.path.join(user_adapter_dir(USER_ADAPTER_ROOT, user_id), STATE_FILE)
+    if not os.path.exists(path):
+        return {"trained_ids": [], "total_examples": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("trained_ids", [])
+    return state
+
+
+def save_state(user_id: str, state: dict):
+    user_dir = user_adapter_dir(USER_ADAPTER_ROOT, user_id)
+    os.makedirs(user_dir, exist_ok=True)
+    write_json_atomic(os.path.join(user_dir, STATE_FILE), state)
+
+
+# --- 데이터 ---
+def fetch_new_cards(user_id: str, state: dict):
+    """
+    text_final이 있는 사용자의 카드 중 아직 학습하지 않은 카드를 (created_at, id) 순으로 페이지 단위로 가져옵니다.
+    """
+    trained_ids = set(state["trained_ids"])
+    start = 0
+    while True:
+        rows = supabase.table('cards') \
+            .select('id, category, content, text_final, created_at, diaries!inner(user_id)') \
+            .eq('diaries.user_id', user_id) \
+            .not_.is_('text_final', 'null') \
+            .order('created_at').order('id').range(start, start + PAGE_SIZE - 1).execute().data
+        for row in rows:
+            if str(row['id']) not in trained_ids:
+                yield row
+        if len(rows) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+
+def fetch_all_user_ids():
+    start = 0
+    while True:
+        rows = supabase.table('users').select('id').order('id').range(start, start + PAGE_SIZE - 1).execute().data
+        for row in rows:
+            yield str(row['id'])
+        if len(rows) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+
+def sample_replay(data_path: str, k: int, rng: random.Random):
+    """이전 학습 데이터에서 k개를 reservoir sampling으로 뽑습니다 (파일 전체를 메모리에 올리지 않음)."""
+    reservoir = []
+    if k <= 0 or not os.path.exists(data_path):
+        return reservoir
+    with open(data_path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if i < k:
+                reservoir.append(json.loads(line))
+            else:
+                j = rng.randint(0, i)
+                if j < k:
+                    reservoir[j] = json.loads(line)
+    return reservoir
+
+
+def append_entries(data_path: str, entries):
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    with open(data_path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# --- 학습 ---
+def has_adapter_weights(path: str) -> bool:
+    return os.path.exists(os.path.join(path, "adapter_config.json")) and any(
+        os.path.exists(os.path.join(path, name)) for name in ("adapter_model.safetensors", "adapter_model.bin")
+    )
+
+
+def attach_adapter(base_model, user_id: str):
+    """마지막 게시 버전 → 공용 어댑터 → 새 LoRA 순서로 학습 시작점을 정합니다."""
+    current = read_current(USER_ADAPTER_ROOT, user_id)
+    if current is not None:
+        return PeftModel.from_pretrained(base_model, current["path"], is_trainable=True), current["version"]
+    if has_adapter_weights(SHARED_ADAPTER_DIR):
+        return PeftModel.from_pretrained(base_model, SHARED_ADAPTER_DIR, is_trainable=True), "shared"
+
+    # 공용 어댑터(models/adapter_config.json)와 같은 구성이어야 API에서 그대로 로드됨
+    lora_config = LoraConfig(
+        r=8,
+        lora_alpha=32,
+        target_modules=["query_key_value", "dense", "dense_h_to_4h", "dense_4h_to_h"],
+        lora_dropout=0.05,
+        bias="none",
+        task_type="CAUSAL_LM"
+    )
+    return get_peft_model(base_model, lora_config), None
+
+
+def train_user(user_id: str, base_model, tokenizer, args, rng: random.Random):
+    """
+    사용자 한 명을 증분 학습합니다. 새 데이터가 없으면 아무것도 하지 않습니다.
+    Returns:
+        LoRA를 떼어낸 베이스 모델 (다음 사용자 학습에 재사용)
+    """
+    state = load_state(user_id)
+    rows = list(fetch_new_cards(user_id, state))
+    entries = format_data_for_lora(rows)
+    if not entries:
+        print(f"--- user={user_id}: 새 데이터 없음 (학습한 카드 {len(state['trained_ids'])}개) ---")
+        return base_model
+
+    data_path = os.path.join(USER_DATA_DIR, f"{user_id}.jsonl")
+    replay = sample_replay(data_path, min(args.replay, len(entries)), rng)
+    token_lists = tokenize_examples(tokenizer, [e["text"] for e in entries + replay], args.block_size)
+    blocks = pack_examples(token_lists, args.block_size)
+
+    # 새 데이터 양에 비례한 step 수 (상한 args.max_steps)
+    steps_per_epoch = math.ceil(len(blocks) / args.batch_size)
+    max_steps = min(args.max_steps, steps_per_epoch * args.epochs)
+
+    model, resumed_from = attach_adapter(base_model, user_id)
+    print(f"--- user={user_id}: 새 예시 {len(entries)}개 + 이전 예시 {len(replay)}개, "
+          f"{len(blocks)}개 블록, {max_steps} step (시작점: {resumed_from or '새 LoRA'}) ---")
+
+    real_tokens = sum(len(block["input_ids"]) for block in blocks)
+    with tempfile.TemporaryDirectory() as output_dir:
+        trainer = Trainer(
+            model=model,
+            args=TrainingArguments(
+                output_dir=output_dir,
+                per_device_train_batch_size=args.batch_size,
+                max_steps=max_steps,
+                learning_rate=args.learning_rate,
+                logging_steps=max(1, max_steps // 5),
+                save_strategy="no",  # 체크포인트 대신 학습이 끝난 어댑터만 게시
+                report_to=[],
+                bf16=torch.cuda.is_available() and torch.cuda.is_bf16_supported(),
+                remove_unused_columns=False,
+            ),
+            train_dataset=Dataset.from_list(blocks),
+            data_collator=PackedDataCollator(tokenizer.pad_token_id, mask_dtype=model.dtype),
+            callbacks=[ThroughputCallback(real_tokens, len(blocks) * args.block_size)],
+        )
+        trainer.train()
+
+    version = publish_adapter(USER_ADAPTER_ROOT, user_id, model, metadata={
+        "resumed_from": resumed_from,
+        "new_examples": len(entries),
+        "steps": max_steps,
+    })
+
+    # 게시가 끝난 뒤에 데이터와 학습한 카드 id를 갱신 (중간에 실패하면 다음 실행에서 같은 데이터로 다시 학습)
+    append_entries(data_path, entries)
+    save_state(user_id, {
+        "trained_ids": sorted(set(state["trained_ids"]) | {str(row["id"]) for row in rows}),
+        "total_examples": state["total_examples"] + len(entries),
+        "version": version,
+    })
+    print(f"✅ user={user_id}: 어댑터 {version} 게시 완료")
+
+    # 다음 사용자를 위해 LoRA 레이어를 떼어내고 베이스 모델만 반환 (가중치는 병합하지 않음)
+    return model.unload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="새 일기만으로 사용자별 LoRA 어댑터를 증분 학습합니다.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", action="append", help="학습할 사용자 id (여러 번 지정 가능)")
+    target.add_argument("--all-users", action="store_true", help="users 테이블의 모든 사용자")
+    parser.add_argument("--base-model", default=BASE_MODEL_NAME)
+    parser.add_argument("--epochs", type=int, default=2, help="새 데이터를 몇 번 반복할지")
+    parser.add_argument("--max-steps", type=int, default=50, help="사용자당 최대 step 수")
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--replay", type=int, default=8, help="함께 학습할 이전 예시 수 (새 예시 수 이하)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.base_model)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    # 증분 학습은 데이터가 적으므로 양자화 없이 로드 (CPU에서도 동작)
+    base_model = AutoModelForCausalLM.from_pretrained(args.base_model, torch_dtype=torch.float32)
+    if torch.cuda.is_available():
+        base_model = base_model.to("cuda")
+
+    rng = random.Random(args.seed)
+    user_ids = fetch_all_user_ids() if args.all_users else args.user_id
+    for user_id in user_ids:
+        if user_adapter_dir(USER_ADAPTER_ROOT, user_id) is None:
+            print(f"경고: 잘못된 user_id를 건너뜀: {user_id!r}")
+            continue
+        base_model = train_user(user_id, base_model, tokenizer, args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,101 @@
 # scripts/train_lora_minimal.py
-# CPU 환경에서 적은 데이터로 LoRA 학습
+# CPU 환경에서 LoRA 학습 (GPU 없는 서버에서 야간 어댑터 갱신용)
+# - CPU가 bf16을 지원하면(AVX512-BF16/AMX) bf16 autocast, 아니면 fp32
+# - gradient checkpointing으로 활성값 메모리 절약
+# - Polyglot-ko(GPT-NeoX) 모듈 이름(query_key_value 등)을 대상으로, 필요하면 일부 레이어만 학습
+# - 배치 내 최장 길이까지만 패딩 + 길이가 비슷한 예시끼리 배치 구성
+# - 데이터 로딩 워커 프로세스 + 연산 스레드 수 제한
+#
+# 실행 예시 (lora/scripts 디렉토리에서):
+#   python train_lora_minimal.py
+#   python train_lora_minimal.py --layers 16-23 --threads 16 --dataloader-workers 2
+#   python train_lora_minimal.py --benchmark-steps 20      # 고정 step 수 시간 측정 (저장 안 함)
 from peft import LoraConfig, get_peft_model
-from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments, DataCollatorForSeq2Seq
-from datasets import load_dataset
+from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments, DataCollatorForSeq2Seq, TrainerCallback
+from datasets import load_dataset, Dataset
+import argparse
+import statistics
+import time
 import torch
 import os
 
-print("🚀 LoRA 최소 학습 시작 (CPU 환경)")
+from packing import tokenize_examples
+
+
+def cpu_supports_bf16() -> bool:
+    """CPU에 bf16 연산 명령(AVX512-BF16 또는 AMX)이 있는지 확인합니다. 없으면 bf16이 오히려 느립니다."""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return torch.backends.mkldnn.is_available() and ("avx512_bf16" in flags or "amx_bf16" in flags)
+
+
+def parse_layers(spec):
+    """"16-23" 또는 "0,4,8" 형식을 레이어 번호 목록으로 변환합니다."""
+    if not spec:
+        return None
+    layers = []
+    for part in spec.split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            layers.extend(range(int(start), int(end) + 1))
+        else:
+            layers.append(int(part))
+    return layers
+
+
+class StepTimerCallback(TrainerCallback):
+    """step별 소요 시간을 재서 (첫 warmup step 제외) 중앙값과 처리량을 출력합니다."""
+    def __init__(self, tokens_per_step: float, warmup_steps: int = 1):
+        self.tokens_per_step = tokens_per_step
+        self.warmup_steps = warmup_steps
+        self.step_times = []
+        self._step_start = None
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self._step_start = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        self.step_times.append(time.perf_counter() - self._step_start)
+
+    def summary(self):
+        measured = self.step_times[self.warmup_steps:] or self.step_times
+        median = statistics.median(measured)
+        return {
+            "steps": len(measured),
+            "median_sec_per_step": round(median, 3),
+            "mean_sec_per_step": round(statistics.mean(measured), 3),
+            "approx_tokens_per_sec": round(self.tokens_per_step / median, 1),
+        }
+
+
+parser = argparse.ArgumentParser(description="CPU 환경 Polyglot-ko LoRA 학습")
+parser.add_argument("--data-files", default="../data/shards/*.jsonl",
+                    help="학습 JSONL 경로 또는 glob (기본: prepare_training_data.py가 만드는 샤드)")
+parser.add_argument("--output-dir", default="./models/lora_minimal")
+parser.add_argument("--max-length", type=int, default=512)
+parser.add_argument("--target-modules", default="query_key_value",
+                    help="쉼표로 구분한 LoRA 대상 모듈 (query_key_value, dense, dense_h_to_4h, dense_4h_to_h)")
+parser.add_argument("--layers", default=None, help="LoRA를 적용할 레이어 (예: 16-23). 지정하지 않으면 전체")
+parser.add_argument("--r", type=int, default=4)
+parser.add_argument("--batch-size", type=int, default=4)
+parser.add_argument("--gradient-accumulation-steps", type=int, default=1)
+parser.add_argument("--epochs", type=int, default=1)
+parser.add_argument("--bf16", choices=["auto", "on", "off"], default="auto", help="auto: CPU가 지원할 때만 bf16 autocast")
+parser.add_argument("--no-gradient-checkpointing", action="store_true")
+parser.add_argument("--threads", type=int, default=None, help="연산 스레드 수 (기본: 물리 코어 수에서 로딩 워커 수를 뺀 값)")
+parser.add_argument("--dataloader-workers", type=int, default=1)
+parser.add_argument("--benchmark-steps", type=int, default=0, help="0보다 크면 이 step 수만 학습하고 시간만 측정")
+args = parser.parse_args()
+
+# 스레드 수 제한: 데이터 로딩 워커 프로세스는 DataLoader가 각자 1스레드로 돌리므로 연산 스레드와 겹치지 않게 나눔
+num_threads = args.threads or max(1, (os.cpu_count() or 1) - args.dataloader_workers)
+torch.set_num_threads(num_threads)
+use_bf16 = args.bf16 == "on" or (args.bf16 == "auto" and cpu_supports_bf16())
+print(f"🚀 LoRA 학습 시작 (CPU 환경, threads={num_threads}, bf16={use_bf16}, "
+      f"gradient_checkpointing={not args.no_gradient_checkpointing})")
 
 # 모델 및 토크나이저 불러오기
 model_name = "EleutherAI/polyglot-ko-1.3b"
@@ -15,21 +104,23 @@ tokenizer = AutoTokenizer.from_pretrained(model_name)
 # 패딩 토큰 설정
 if tokenizer.pad_token is None:
     tokenizer.pad_token = tokenizer.eos_token
-tokenizer.padding_side = "right" 
+tokenizer.padding_side = "right"
 
 print("📥 모델 로딩 중...")
-# CPU 환경에 맞는 설정
+# 가중치는 float32로 두고, bf16은 autocast로만 사용 (LoRA 가중치 업데이트 정밀도 유지)
 model = AutoModelForCausalLM.from_pretrained(
     model_name,
-    torch_dtype=torch.float32,  # CPU에서는 float32
+    torch_dtype=torch.float32,
     device_map=None  # CPU 사용
 )
 
-# LoRA 설정 (최소 설정)
+# LoRA 설정: GPT-NeoX의 attention은 q/k/v가 합쳐진 query_key_value 하나
 lora_config = LoraConfig(
-    r=4,  # 랭크를 더 작게 설정
-    lora_alpha=16,  # 알파값도 줄임
-    target_modules=["q_proj", "v_proj"],  # 더 적은 모듈만 학습
+    r=args.r,
+    lora_alpha=4 * args.r,
+    target_modules=args.target_modules.split(","),
+    layers_to_transform=parse_layers(args.layers),
+    layers_pattern="layers" if args.layers else None,  # gpt_neox.layers.<n>
     lora_dropout=0.1,
     bias="none",
     task_type="CAUSAL_LM"
@@ -45,36 +136,41 @@ print("---------------------------\n")
 
 # 데이터셋 불러오기
 print("📊 데이터셋 로딩 중...")
-dataset = load_dataset("json", data_files="../data/user_diaries.jsonl")["train"]
+dataset = load_dataset("json", data_files=args.data_files)["train"]
 print(f"📈 총 {len(dataset)}개 데이터 로드됨")
 
-# 데이터 전처리 함수
-def preprocess_function(examples):
-    tokenized_input = tokenizer(
-        examples["text"],
-        max_length=512,  # 더 짧게 설정
-        truncation=True,
-        padding="max_length" 
-    )
-    tokenized_input["labels"] = tokenized_input["input_ids"].copy() 
-    return tokenized_input
-
-tokenized_dataset = dataset.map(preprocess_function, batched=True, remove_columns=["text"])
-print("✅ 데이터 전처리 완료")
-
-# 최소 학습 인자 설정
+# 패딩 없이 토큰화 (배치를 만들 때 배치 내 최장 길이까지만 패딩)
+token_lists = tokenize_examples(tokenizer, dataset["text"], args.max_length)
+tokenized_dataset = Dataset.from_dict({"input_ids": token_lists, "labels": token_lists})
+avg_tokens = sum(len(ids) for ids in token_lists) / max(len(token_lists), 1)
+print(f"✅ 데이터 전처리 완료 (평균 {avg_tokens:.0f} 토큰)")
+
+benchmark = args.benchmark_steps > 0
+step_timer = StepTimerCallback(tokens_per_step=avg_tokens * args.batch_size * args.gradient_accumulation_steps)
+
 training_args = TrainingArguments(
-    output_dir="./models/lora_minimal",
-    per_device_train_batch_size=1,  # 배치 크기 1
-    gradient_accumulation_steps=4,  # 그래디언트 누적
-    num_train_epochs=1,  # 1 에포크만
-    learning_rate=1e-4,  # 낮은 학습률
-    logging_steps=5,  # 더 자주 로깅
-    save_steps=25,  # 더 자주 저장
+    output_dir=args.output_dir,
+    use_cpu=True,
+    per_device_train_batch_size=args.batch_size,
+    gradient_accumulation_steps=args.gradient_accumulation_steps,
+    num_train_epochs=args.epochs,
+    max_steps=args.benchmark_steps if benchmark else -1,
+    learning_rate=1e-4,
+    logging_steps=5,
+    save_strategy="no" if benchmark else "steps",
+    save_steps=25,
     save_total_limit=1,
-    fp16=False,  # CPU에서는 fp16 비활성화
+    bf16=use_bf16,  # CPU에서는 torch.autocast("cpu", bfloat16)로 적용됨
+    fp16=False,
+    gradient_checkpointing=not args.no_gradient_checkpointing,
+    gradient_checkpointing_kwargs={"use_reentrant": False},  # 입력에 requires_grad가 없어도 LoRA 그래디언트 전달
+    group_by_length=True,  # 길이가 비슷한 예시끼리 배치 구성 → 패딩 최소화
+    dataloader_num_workers=args.dataloader_workers,
+    dataloader_persistent_workers=args.dataloader_workers > 0,
+    dataloader_pin_memory=False,
     remove_unused_columns=False,
-    warmup_steps=10,  # 워밍업 추가
+    warmup_steps=0 if benchmark else 10,
+    report_to=[],
 )
 
 print("🎯 학습 시작...")
@@ -84,11 +180,20 @@ trainer = Trainer(
     args=training_args,
     train_dataset=tokenized_dataset,
     tokenizer=tokenizer,
-    data_collator=DataCollatorForSeq2Seq(tokenizer, model=model, padding="longest", label_pad_token_id=tokenizer.pad_token_id),
+    data_collator=DataCollatorForSeq2Seq(tokenizer, model=model, padding="longest", label_pad_token_id=-100),
+    callbacks=[step_timer],
 )
 
+start_time = time.perf_counter()
 trainer.train()
+elapsed = time.perf_counter() - start_time
 
-print("\n🎉 LoRA 최소 학습 완료!")
-print("📁 모델이 ./models/lora_minimal 에 저장되었습니다.")
-print("💡 이제 generate_diary.py에서 이 모델을 사용할 수 있습니다.") 
\ No newline at end of file
+print(f"\n⏱️ 학습 시간 {elapsed:.1f}초, {step_timer.summary()}")
+if benchmark:
+    print(f"📏 벤치마크 완료: {args.benchmark_steps} step (threads={num_threads}, bf16={use_bf16}, "
+          f"layers={args.layers or 'all'}, targets={args.target_modules})")
+else:
+    model.save_pretrained(args.output_dir)
+    print("\n🎉 LoRA 학습 완료!")
+    print(f"📁 모델이 {args.output_dir} 에 저장되었습니다.")
+    print("💡 이제 generate_diary.py에서 이 모델을 사용할 수 있습니다.")